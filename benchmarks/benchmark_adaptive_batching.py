@@ -0,0 +1,97 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+"""
+Benchmark of length-bucketed, memory-budgeted batching in `convert_texts_to_vector` against the fixed batches of 1000
+texts in arrival order that it used before, in tokens per second on mixed-length instrument text: the questions of the
+example instruments shuffled together with runs of several questions joined into long texts.
+
+Run from the repository root:
+
+    HARMONY_NO_PARSING=1 HARMONY_NO_MATCHING=1 python benchmarks/benchmark_adaptive_batching.py --repeats 5
+
+Set HARMONY_ENCODE_MEMORY_BUDGET_MB to try other memory budgets.
+"""
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("src")
+
+from harmony.examples import example_instruments
+from harmony.matching.default_matcher import convert_texts_to_vector, get_model, get_token_lengths
+
+
+def convert_texts_to_vector_in_fixed_batches(texts, batch_size=1000):
+    model = get_model()
+    embeddings = []
+    for i in range(0, len(texts), batch_size):
+        embeddings.append(model.encode(sentences=texts[i:i + batch_size], convert_to_numpy=True))
+    return np.concatenate(embeddings, axis=0)
+
+
+def get_mixed_length_texts(num_texts: int, seed: int = 42) -> list:
+    random_state = random.Random(seed)
+    questions = [question.question_text for instrument in example_instruments.values() for question in
+                 instrument.questions]
+    texts = []
+    while len(texts) < num_texts:
+        start = random_state.randrange(len(questions))
+        texts.append(" ".join(questions[start:start + random_state.choice([1, 1, 1, 2, 4, 8])]))
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_texts", type=int, default=5000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    texts = get_mixed_length_texts(args.num_texts)
+    num_tokens = int(np.sum(get_token_lengths(get_model(), texts)))
+
+    print(f"{len(texts)} texts, {num_tokens} tokens, {args.repeats} repeats")
+    print(f"{'batching':>20} {'tokens/s':>10} {'max |diff|':>11}")
+    reference_vectors = None
+    for name, function in [("fixed, arrival order", convert_texts_to_vector_in_fixed_batches),
+                           ("length-bucketed", convert_texts_to_vector)]:
+        # Warm up
+        vectors = function(texts)
+        if reference_vectors is None:
+            reference_vectors = vectors
+
+        start_time = time.perf_counter()
+        for _ in range(args.repeats):
+            function(texts)
+        tokens_per_second = num_tokens * args.repeats / (time.perf_counter() - start_time)
+
+        print(f"{name:>20} {tokens_per_second:>10.0f} {np.max(np.abs(vectors - reference_vectors)):>11.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+"""
+Benchmark of the embedding backends for the default sentence transformer: encoding throughput on CPU and agreement
+of the embeddings with the PyTorch backend, on the questions of the example instruments.
+
+Run from the repository root (the ONNX backends need pip install harmonydata[onnx]):
+
+    HARMONY_NO_PARSING=1 HARMONY_NO_MATCHING=1 python benchmarks/benchmark_embedding_backend.py --repeats 20
+
+(The environment variables only skip loading the default model at import time; the benchmark loads each backend
+itself.)
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("src")
+
+from harmony.examples import example_instruments
+from harmony.matching.embedding_backend import load_sentence_transformer
+from harmony.schemas.enums.embedding_backend import EmbeddingBackend
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentence_transformer_path", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    parser.add_argument("--backends", nargs="+", default=[backend.value for backend in EmbeddingBackend])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--batch_size", type=int, default=32)
+    args = parser.parse_args()
+
+    texts = [question.question_text for instrument in example_instruments.values() for question in
+             instrument.questions]
+
+    # The PyTorch embeddings, to compare the other backends with
+    torch_vectors = load_sentence_transformer(args.sentence_transformer_path, EmbeddingBackend.torch).encode(
+        texts, batch_size=args.batch_size, convert_to_numpy=True)
+
+    print(f"{len(texts)} texts, {args.repeats} repeats")
+    print(f"{'backend':>10} {'load s':>8} {'texts/s':>9} {'min cos':>8} {'mean cos':>9}")
+    for backend in args.backends:
+        start_time = time.perf_counter()
+        model = load_sentence_transformer(args.sentence_transformer_path, backend)
+        load_seconds = time.perf_counter() - start_time
+
+        # Warm up
+        vectors = model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+
+        start_time = time.perf_counter()
+        for _ in range(args.repeats):
+            model.encode(texts, batch_size=args.batch_size, convert_to_numpy=True)
+        texts_per_second = len(texts) * args.repeats / (time.perf_counter() - start_time)
+
+        cosine_similarities = np.sum(torch_vectors * vectors, axis=1) / (
+                np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(vectors, axis=1))
+        print(f"{backend:>10} {load_seconds:>8.1f} {texts_per_second:>9.1f} {np.min(cosine_similarities):>8.4f} "
+              f"{np.mean(cosine_similarities):>9.4f}")
+
+
+if __name__ == "__main__":
+    main()
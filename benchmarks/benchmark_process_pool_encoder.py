@@ -0,0 +1,88 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+"""
+Scaling benchmark of `ProcessPoolEncoder`: texts per second encoding mixed-length instrument text with the default
+sentence transformer on 1, 2, 4, ... worker processes, each with `--threads_per_worker` threads, compared with
+`convert_texts_to_vector` in this process.
+
+Run from the repository root:
+
+    HARMONY_NO_PARSING=1 HARMONY_NO_MATCHING=1 python benchmarks/benchmark_process_pool_encoder.py --max_workers 16
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("src")
+sys.path.append("benchmarks")
+
+from benchmark_adaptive_batching import get_mixed_length_texts
+from harmony.matching.default_matcher import convert_texts_to_vector
+from harmony.matching.process_pool_encoder import ProcessPoolEncoder
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_texts", type=int, default=20000)
+    parser.add_argument("--threads_per_worker", type=int, default=4)
+    parser.add_argument("--max_workers", type=int, default=None)
+    parser.add_argument("--shard_size", type=int, default=1000)
+    args = parser.parse_args()
+
+    max_workers = args.max_workers or max(1, (os.cpu_count() or 1) // args.threads_per_worker)
+    texts = get_mixed_length_texts(args.num_texts)
+
+    # Warm up
+    reference_vectors = convert_texts_to_vector(texts[:1000])
+    start_time = time.perf_counter()
+    convert_texts_to_vector(texts)
+    single_process_texts_per_second = len(texts) / (time.perf_counter() - start_time)
+
+    print(f"{len(texts)} texts, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'threads':>8} {'texts/s':>9} {'speedup':>8} {'max |diff|':>11}")
+    print(f"{'-':>8} {'all':>8} {single_process_texts_per_second:>9.1f} {1:>8.2f} {0:>11.2e}")
+    num_workers = 1
+    while num_workers <= max_workers:
+        with ProcessPoolEncoder(num_workers=num_workers, threads_per_worker=args.threads_per_worker,
+                                shard_size=args.shard_size) as encoder:
+            # Warm up: load the model in every worker
+            encoder(texts[:args.shard_size * num_workers])
+
+            start_time = time.perf_counter()
+            vectors = encoder(texts)
+            texts_per_second = len(texts) / (time.perf_counter() - start_time)
+
+        print(f"{num_workers:>8} {args.threads_per_worker:>8} {texts_per_second:>9.1f} "
+              f"{texts_per_second / single_process_texts_per_second:>8.2f} "
+              f"{np.max(np.abs(vectors[:1000] - reference_vectors)):>11.2e}")
+        num_workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+"""
+Benchmark of quantised catalogue embeddings against the float32 baseline: memory, search latency and recall@k of
+the exact top-k search on synthetic clustered embeddings.
+
+Run from the repository root:
+
+    HARMONY_NO_PARSING=1 HARMONY_NO_MATCHING=1 python benchmarks/benchmark_quantisation.py --num_vectors 200000
+
+(The environment variables only skip loading models at import time, which the benchmark does not need.)
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+sys.path.append("src")
+
+from harmony.matching.catalogue_index import CatalogueIndex
+
+
+def make_embeddings(num_vectors: int, dimensions: int, num_queries: int, random_state: int = 1):
+    random_state = np.random.RandomState(random_state)
+    centres = random_state.normal(size=(max(1, num_vectors // 100), dimensions))
+    embeddings = centres[random_state.randint(0, len(centres), size=num_vectors)] + 0.5 * random_state.normal(
+        size=(num_vectors, dimensions))
+    queries = embeddings[random_state.choice(num_vectors, num_queries, replace=False)] + 0.3 * random_state.normal(
+        size=(num_queries, dimensions))
+    return embeddings.astype(np.float32), queries.astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num_vectors", type=int, default=100000)
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--num_queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    embeddings, queries = make_embeddings(args.num_vectors, args.dimensions, args.num_queries)
+    num_catalogue_instruments = max(1, args.num_vectors // 10)
+    instrument_idx_to_question_idx = np.array_split(np.arange(args.num_vectors), num_catalogue_instruments)
+
+    exact_idxs = None
+    print(f"{'quantisation':>12} {'MB':>8} {'ms/query':>9} {'recall@' + str(args.k):>10}")
+    for quantisation in ["float32", "float16", "int8"]:
+        catalogue_index = CatalogueIndex(
+            all_questions=[""] * args.num_vectors,
+            all_instruments=[{"instrument_name": "", "metadata": {}}] * num_catalogue_instruments,
+            instrument_idx_to_question_idx=[list(question_idxs) for question_idxs in instrument_idx_to_question_idx],
+            embeddings=embeddings,
+            quantisation=quantisation,
+        )
+        start_time = time.perf_counter()
+        idxs, _ = catalogue_index.search(queries, args.k)
+        ms_per_query = (time.perf_counter() - start_time) * 1000 / args.num_queries
+        if exact_idxs is None:
+            exact_idxs = idxs
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(exact_idxs, idxs)])
+        print(f"{quantisation:>12} {catalogue_index.embeddings.nbytes / 1e6:>8.1f} {ms_per_query:>9.2f} "
+              f"{recall:>10.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,6 @@ __version__ = "1.0.7"
 # TODO: make these configurable at package level
 import os
 import warnings
-from .examples import example_instruments
 from .schemas import *
 from .util.instrument_helper import create_instrument_from_list, import_instrument_into_harmony_web
 from .util.model_downloader import download_models
@@ -53,11 +52,22 @@ if os.environ.get("HARMONY_NO_PARSING") is None or os.environ.get("HARMONY_NO_PA
     from .util.file_helper import load_instruments_from_local_file
 if os.environ.get("HARMONY_NO_MATCHING") is None or os.environ.get("HARMONY_NO_MATCHING") == "":
     from .matching.matcher import match_instruments_with_function
+    from .matching.async_matcher import amatch_instruments_with_function
+    from .matching.incremental_matcher import update_match_result_with_function, get_updated_instruments
+    from .matching.catalogue_index import CatalogueIndex
+    from .matching.mhc_index import MhcIndex
+    from .matching.response_options_similarity import ResponseOptionsSimilarity
+    from .matching.similarity_matrix import ValidatedSimilarityMatrix, to_match_response
+    from .matching.embedding_cache import EmbeddingCache, LruEmbeddingCache, SqliteEmbeddingCache
+    from .matching.coalescing_encoder import CoalescingEncoder
+    from .matching.process_pool_encoder import ProcessPoolEncoder
     from .matching.generate_crosswalk_table import generate_crosswalk_table
     from .matching.deterministic_clustering import find_clusters_deterministic
     from .matching.cluster import cluster_questions
+    from .matching.sparse_affinity_propagation_clustering import SparseAffinityPropagation, \
+        cluster_questions_sparse_affinity_propagation
     try:
-        from .matching.default_matcher import match_instruments
+        from .matching.default_matcher import match_instruments, update_match_result
     except ModuleNotFoundError:
         warnings.warn(
             "transformers not available. To use transformers, run "
@@ -65,3 +75,11 @@ if os.environ.get("HARMONY_NO_MATCHING") is None or os.environ.get("HARMONY_NO_M
             ImportWarning,
             stacklevel=2,
         )
+
+
+def __getattr__(name):
+    # The example instruments are only built when they are first used, not when Harmony is imported
+    if name == "example_instruments":
+        from .examples import get_example_instruments
+        return get_example_instruments()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
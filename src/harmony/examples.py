@@ -25,6 +25,8 @@ SOFTWARE.
 
 '''
 
+import functools
+
 from harmony.schemas.requests.text import Instrument
 
 '''
@@ -33,7 +35,24 @@ To update this list from the JSON file in the API, go to the API repo and run:
 sed "s/\bnull\b/None/g" example_questionnaires.json | sed '$!s/$/,/' >> ../harmony/src/harmony/examples.py
 '''
 
-example_instruments = dict([(i["instrument_name"], Instrument.model_validate(i)) for i in [
+
+@functools.lru_cache(maxsize=None)
+def get_example_instruments() -> dict:
+    """
+    Get the example instruments, validated the first time they are needed rather than when Harmony is imported.
+
+    :return: A dict from instrument name to Instrument.
+    """
+    return dict([(i["instrument_name"], Instrument.model_validate(i)) for i in example_instruments_data])
+
+
+def __getattr__(name):
+    if name == "example_instruments":
+        return get_example_instruments()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+example_instruments_data = [
 {"file_id": "83a12170a5a74809885affc0c381dd41", "instrument_id": "b45b7169e711414582768b8c8431027c", "instrument_name": "CES_D English", "file_name": "CES_D English.pdf", "file_type": "pdf", "file_section": None, "study": None, "sweep": None, "metadata": None, "language": "en", "questions": [{"question_no": "1", "question_intro": None, "question_text": "I was bothered by things that usually don’t bother me.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "2", "question_intro": None, "question_text": "I did not feel like eating; my appetite was poor.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "3", "question_intro": None, "question_text": "I felt that I could not shake off the blues even with help from my family or friends.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "4", "question_intro": None, "question_text": "I felt I was just as good as other people.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "5", "question_intro": None, "question_text": "I had trouble keeping my mind on what I was doing.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "6", "question_intro": None, "question_text": "I felt depressed.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "7", "question_intro": None, "question_text": "I felt that everything I did was an effort.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "8", "question_intro": None, "question_text": "I felt hopeful about the future.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "9", "question_intro": None, "question_text": "I thought my life had been a failure.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "10", "question_intro": None, "question_text": "I felt fearful.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "11", "question_intro": None, "question_text": "My sleep was restless.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "12", "question_intro": None, "question_text": "I was happy.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "13", "question_intro": None, "question_text": "I talked less than usual.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "14", "question_intro": None, "question_text": "I felt lonely.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "15", "question_intro": None, "question_text": "People were unfriendly.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "16", "question_intro": None, "question_text": "I enjoyed life.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "17", "question_intro": None, "question_text": "I had crying spells.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "18", "question_intro": None, "question_text": "I felt sad.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "19", "question_intro": None, "question_text": "I felt that people dislike me.", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "20", "question_intro": None, "question_text": "I could not get “going.”", "options": ["Rarely or none of the time (less than 1 day)", "Some or a little of the time (1-2 days)", "Occasionally or a moderate amount of time (3-4 days)", "Most or all of the time (5-7 days)"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}]},
 {"file_id": "614b672c9dfb41c386fbbd4e44ff38b4", "instrument_id": "65c0c54c3f2d4288b232f2df3c1db889", "instrument_name": "SCARED English (adult)", "file_name": "SCARED English (adult).pdf", "file_type": "pdf", "file_section": None, "study": None, "sweep": None, "metadata": None, "language": "en", "questions": [{"question_no": "1", "question_intro": None, "question_text": "When I feel frightened, it is hard for me to breathe", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "2", "question_intro": None, "question_text": "I get headaches when I am at school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "3", "question_intro": None, "question_text": "I don’t like to be with people I don’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "4", "question_intro": None, "question_text": "I get scared if I sleep away from home", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "5", "question_intro": None, "question_text": "I worry about other people liking me", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "6", "question_intro": None, "question_text": "When I get frightened, I feel like passing out", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "7", "question_intro": None, "question_text": "I am nervous", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "8", "question_intro": None, "question_text": "I follow my mother or father wherever they go", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "9", "question_intro": None, "question_text": "People tell me that I look nervous", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "10", "question_intro": None, "question_text": "I feel nervous with people I don’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "11", "question_intro": None, "question_text": "My I get stomachaches at school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "12", "question_intro": None, "question_text": "When I get frightened, I feel like I am going crazy", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "13", "question_intro": None, "question_text": "I worry about sleeping alone", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "14", "question_intro": None, "question_text": "I worry about being as good as other kids", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "15", "question_intro": None, "question_text": "When I get frightened, I feel like things are not real", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "16", "question_intro": None, "question_text": "I have nightmares about something bad happening to my parents", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "17", "question_intro": None, "question_text": "I worry about going to school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "18", "question_intro": None, "question_text": "When I get frightened, my heart beats fast", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "19", "question_intro": None, "question_text": "I get shaky", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "20", "question_intro": None, "question_text": "I have nightmares about something bad happening to me", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "21", "question_intro": None, "question_text": "I worry about things working out for me", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "22", "question_intro": None, "question_text": "When I get frightened, I sweat a lot", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "23", "question_intro": None, "question_text": "I am a worrier", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "24", "question_intro": None, "question_text": "I get really frightened for no reason at all", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "25", "question_intro": None, "question_text": "I am afraid to be alone in the house", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "26", "question_intro": None, "question_text": "It is hard for me to talk with people I don’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "27", "question_intro": None, "question_text": "When I get frightened, I feel like I am choking", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "28", "question_intro": None, "question_text": "People tell me that I worry too much", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "29", "question_intro": None, "question_text": "I don’t like to be away from my family", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "30", "question_intro": None, "question_text": "I am afraid of having anxiety (or panic) attacks", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "31", "question_intro": None, "question_text": "I worry that something bad might happen to my parents", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "32", "question_intro": None, "question_text": "I feel shy with people I don’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "33", "question_intro": None, "question_text": "I worry about what is going to happen in the future", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "34", "question_intro": None, "question_text": "When I get frightened, I feel like throwing up", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "35", "question_intro": None, "question_text": "I worry about how well I do things", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "36", "question_intro": None, "question_text": "I am scared to go to school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "37", "question_intro": None, "question_text": "I worry about things that have already happened", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "38", "question_intro": None, "question_text": "When I get frightened, I feel dizzy", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "39", "question_intro": None, "question_text": "I feel nervous when I am with other children or adults and I have to do something while they watch me (for example: read aloud, speak, play a game, play a sport)", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "40", "question_intro": None, "question_text": "I feel nervous when I am going to parties, dances, or any place where there will be people that I don’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "41", "question_intro": None, "question_text": "I am shy", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}]},
 {"file_id": "2643b44e8bb94556b37cab134e5c0afe", "instrument_id": "a2ebc5ef638e46cd94ad1d99fbfdaeae", "instrument_name": "SCARED English (child)", "file_name": "SCARED English (child).pdf", "file_type": "pdf", "file_section": None, "study": None, "sweep": None, "metadata": None, "language": "en", "questions": [{"question_no": "1", "question_intro": None, "question_text": "When my child feels frightened, it is hard for him/her to breathe", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "2", "question_intro": None, "question_text": "My child gets headaches when he/she is at school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "3", "question_intro": None, "question_text": "My child doesn’t like to be with people he/she doesn’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "4", "question_intro": None, "question_text": "My child gets scared if he/she sleeps away from home", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "5", "question_intro": None, "question_text": "My child worries about other people liking him/her", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "6", "question_intro": None, "question_text": "When my child gets frightened, he/she feels like passing out", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "7", "question_intro": None, "question_text": "My child is nervous", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "8", "question_intro": None, "question_text": "My child follows me wherever I go", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "9", "question_intro": None, "question_text": "People tell me that my child looks nervous", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "10", "question_intro": None, "question_text": "My child feels nervous with people he/she doesn’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "11", "question_intro": None, "question_text": "My child gets stomachaches at school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "12", "question_intro": None, "question_text": "When my child gets frightened, he/she feels like he/she is going crazy", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "13", "question_intro": None, "question_text": "My child worries about sleeping alone", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "14", "question_intro": None, "question_text": "My child worries about being as good as other kids", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "15", "question_intro": None, "question_text": "When he/she gets frightened, he/she feels like things are not real", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "16", "question_intro": None, "question_text": "My child has nightmares about something bad happening to his/her parents", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "17", "question_intro": None, "question_text": "My child worries about going to school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "18", "question_intro": None, "question_text": "When my child gets frightened, his/her heart beats fast", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "19", "question_intro": None, "question_text": "He/she gets shaky", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "20", "question_intro": None, "question_text": "My child has nightmares about something bad happening to him/her", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "21", "question_intro": None, "question_text": "My child worries about things working out for him/her", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "22", "question_intro": None, "question_text": "When my child gets frightened, he/she sweats a lot", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "23", "question_intro": None, "question_text": "My child is a worrier", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "24", "question_intro": None, "question_text": "My child gets really frightened for no reason at all", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "25", "question_intro": None, "question_text": "My child is afraid to be alone in the house", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "26", "question_intro": None, "question_text": "It is hard for my child to talk with people he/she doesn’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "27", "question_intro": None, "question_text": "When my child gets frightened, he/she feels like he/she is choking", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "28", "question_intro": None, "question_text": "People tell me that my child worries too much", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "29", "question_intro": None, "question_text": "My child doesn’t like to be away from his/her family", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "30", "question_intro": None, "question_text": "My child is afraid of having anxiety (or panic) attacks", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "31", "question_intro": None, "question_text": "My child worries that something bad might happen to his/her parents", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "32", "question_intro": None, "question_text": "My child feels shy with people he/she doesn’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "33", "question_intro": None, "question_text": "My child worries about what is going to happen in the future", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "34", "question_intro": None, "question_text": "When my child gets frightened, he/she feels like throwing up", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "35", "question_intro": None, "question_text": "My child worries about how well he/she does things", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "36", "question_intro": None, "question_text": "My child is scared to go to school", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "37", "question_intro": None, "question_text": "My child worries about things that have already happened", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "38", "question_intro": None, "question_text": "When my child gets frightened, he/she feels dizzy", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "39", "question_intro": None, "question_text": "My child feels nervous when he/she is with other children or adults and he/she has to do something while they watch him/her (for example: read aloud, speak, play a game, play a sport)", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "40", "question_intro": None, "question_text": "My child feels nervous when he/she is going to parties, dances, or any place where there will be people that he/she doesn’t know well", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "41", "question_intro": None, "question_text": "My child is shy", "options": ["Not True or Hardly Ever True", "Somewhat True or Sometimes True", "Very True or Often True"], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}]},
@@ -56,4 +75,4 @@ example_instruments = dict([(i["instrument_name"], Instrument.model_validate(i))
 {"file_id": "7942abf019dd43ef9435f357bb9bd258", "instrument_id": "37f2fc5847b44439a122dc32e69ebcaa", "instrument_name": "GAD-7 Kannada", "file_name": "GAD-7 Kannada.pdf", "file_type": None, "file_section": None, "study": None, "sweep": None, "metadata": None, "language": "en", "questions": [{"question_no": "1", "question_intro": None, "question_text": "ತಳಮಳ, ಆತಂಕ ಅಥ ಾ ಬಹಳ ΅ಾತರದ ಅನುಭವ", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "2", "question_intro": None, "question_text": "‷ಂ⁀ಸುವ⁳ದನುΊ ⁄⁌ῤಸಲು ಅಥ ಾ ⁄ಯಂ⁀ῢಸಲು ಧῡ ಾಗ⁂ರುವ⁳ದು", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "3", "question_intro": None, "question_text": "⁧ೕ⁫ ⁧ೕ⁫ ⁎ಷಯಗಳ ಬ⁕Ὴ ಅ⁀ ಾ‵ ‷ಂ⁀ಸುವ⁳ದು", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "4", "question_intro": None, "question_text": "⁄ ಾಳ ಾ‵ರಲು ⁠ೂಂದ⁫", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "5", "question_intro": None, "question_text": "ಒಂದು ಕ⁝ ⁑Ῐರ ಾ‵ ಕು⁍ತು⁓ೂಳῥಲೂ ಆಗದಷುῒ ಚಡಪ‽ಸುವ⁳ದು", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "6", "question_intro": None, "question_text": "ಸುಲಭ ಾ‵ ⁓ೂೕಪ⁕ೂಳುῥವ⁳ದು ಅಥ ಾ ″⁋″⁋ ಾಗುವ⁳ದು", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "7", "question_intro": None, "question_text": "ಏ῿ಾದರೂ ಅ῿ಾಹುತ ಸಂಭ⁎ಸುತῗ⁢ ಎಂದು ⁲ದರುವ⁳ದು", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}]},
 {"file_id": "266ab87970b54d20ae274586ef353378", "instrument_id": "10c21c991bbe4887a90953670f04394c", "instrument_name": "GAD-7 Hebrew", "file_name": "GAD-7 Hebrew.pdf", "file_type": None, "file_section": None, "study": None, "sweep": None, "metadata": None, "language": "en", "questions": [{"question_no": "1", "question_intro": None, "question_text": "הרגשתי עצבני, חרד או מתוח מאוד", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "2", "question_intro": None, "question_text": "לא הייתי מסוגל להפסיק לדאוג או לשלוט בדאגה", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "3", "question_intro": None, "question_text": "הייתי מודאג יותר מידי בנוגע לדברים שונים", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "4", "question_intro": None, "question_text": "התקשיתי להירגע", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "5", "question_intro": None, "question_text": "הייתי כל כך חסר מנוחה שהיה לי קשה לשבת מבלי לנוע", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "6", "question_intro": None, "question_text": "הייתי מתעצבן או מתרגז בקלות", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "7", "question_intro": None, "question_text": "פחדתי כאילו משהו נורא עלול לקרות", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}]},
 {"file_id": "ecdfd265f8f540e194038706561cc3b1", "instrument_id": "994f4dbb04af4aedb139f1100728a400", "instrument_name": "GAD-7 Norwegian", "file_name": "GAD-7 Norwegian.pdf", "file_type": None, "file_section": None, "study": None, "sweep": None, "metadata": None, "language": "en", "questions": [{"question_no": "1", "question_intro": None, "question_text": "Følt deg nervøs, engstelig eller veldig stresset", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "2", "question_intro": None, "question_text": "Ikke klart å slutte å bekymre deg eller kontrolleren bekymringene dine", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "3", "question_intro": None, "question_text": "Bekymret deg for mye om ulike ting", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "4", "question_intro": None, "question_text": "Vansker med å slappe av", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "5", "question_intro": None, "question_text": "Vært så rastløs at det har vært vanskelig å sitte stille", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "6", "question_intro": None, "question_text": "Blitt lett sint eller irritert", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}, {"question_no": "7", "question_intro": None, "question_text": "Følt deg redd som om noe forferdelig kunne komme til å skje", "options": [], "source_page": 0, "instrument_id": None, "instrument_name": None, "topics_auto": None, "nearest_match_from_mhc_auto": None}]},
-]])
\ No newline at end of file
+]
@@ -0,0 +1,144 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import sys
+from typing import Callable, List
+
+import numpy as np
+from numpy import ndarray
+
+DEFAULT_ENCODE_MEMORY_BUDGET_MB = 1024
+
+BYTES_PER_FLOAT = 4
+
+
+def get_encode_memory_budget() -> int:
+    """
+    Get the memory in bytes that the activations of one forward pass of the encoder may take, from the environment
+    variable HARMONY_ENCODE_MEMORY_BUDGET_MB, defaulting to 1 GB.
+    """
+    try:
+        return int(float(os.getenv("HARMONY_ENCODE_MEMORY_BUDGET_MB", DEFAULT_ENCODE_MEMORY_BUDGET_MB)) * 1024 * 1024)
+    except (ValueError, TypeError):
+        return DEFAULT_ENCODE_MEMORY_BUDGET_MB * 1024 * 1024
+
+
+def estimate_bytes_per_sequence(length: int, hidden_size: int = 384, num_attention_heads: int = 12) -> int:
+    """
+    Estimate the float32 activations of one transformer layer for one sequence padded to `length` tokens: about
+    12 hidden-size vectors per token (query, key, value, attention output, the 4x wide feed-forward layer and the
+    residuals) plus an attention score for each head and pair of tokens (before and after the softmax).
+
+    :param length: The padded length of the sequence in tokens.
+    :param hidden_size: The hidden size of the transformer.
+    :param num_attention_heads: The number of attention heads.
+    :return: The estimated number of bytes.
+    """
+    return BYTES_PER_FLOAT * length * (12 * hidden_size + 2 * num_attention_heads * length)
+
+
+def get_batch_end(sorted_lengths: ndarray, start: int, memory_budget: int, max_batch_size: int = 0,
+                  hidden_size: int = 384, num_attention_heads: int = 12) -> int:
+    """
+    Get the end of the largest batch starting at `start` of texts sorted by length that fits in the memory budget,
+    given that every text in the batch is padded to the length of the longest (i.e. the last) one.
+
+    :param sorted_lengths: The lengths of the texts, in ascending order.
+    :param start: The index of the first text of the batch.
+    :param memory_budget: The memory budget of a batch in bytes.
+    :param max_batch_size: The maximum number of texts in a batch, or 0 for no limit.
+    :param hidden_size: The hidden size of the transformer.
+    :param num_attention_heads: The number of attention heads.
+    :return: The index after the last text of the batch. The batch always contains at least one text.
+    """
+    end = start + 1
+    while end < len(sorted_lengths) and (max_batch_size == 0 or end - start < max_batch_size) and \
+            (end - start + 1) * estimate_bytes_per_sequence(int(sorted_lengths[end]), hidden_size,
+                                                            num_attention_heads) <= memory_budget:
+        end += 1
+    return end
+
+
+def is_out_of_memory_error(error: BaseException) -> bool:
+    """
+    Check whether an exception means that a batch ran out of memory: a MemoryError, PyTorch's CUDA OutOfMemoryError,
+    or the RuntimeError that PyTorch raises when it cannot allocate CPU memory.
+
+    :param error: The exception.
+    :return: Whether it is an out of memory error.
+    """
+    if isinstance(error, MemoryError):
+        return True
+    # PyTorch is not imported here unless the encoder has already imported it
+    torch = sys.modules.get("torch")
+    out_of_memory_error = getattr(getattr(torch, "cuda", None), "OutOfMemoryError", None)
+    if out_of_memory_error is not None and isinstance(error, out_of_memory_error):
+        return True
+    if isinstance(error, RuntimeError):
+        message = str(error).lower()
+        return "out of memory" in message or "can't allocate memory" in message
+    return False
+
+
+def encode_in_length_sorted_batches(texts: List[str], encode_batch: Callable[[List[str]], ndarray],
+                                    lengths: ndarray, memory_budget: int, max_batch_size: int = 0,
+                                    hidden_size: int = 384, num_attention_heads: int = 12) -> ndarray:
+    """
+    Encode texts in batches of texts of similar length, so that little computation is spent on padding, with as many
+    texts in each batch as fit in the memory budget. If a batch runs out of memory (see `is_out_of_memory_error`), the
+    budget is halved for the rest of the texts and the batch is tried again, smaller. The vectors are returned in the order of the texts.
+
+    :param texts: The texts.
+    :param encode_batch: A function to encode a batch of texts in one forward pass.
+    :param lengths: The length of each text in tokens.
+    :param memory_budget: The memory budget of a batch in bytes.
+    :param max_batch_size: The maximum number of texts in a batch, or 0 for no limit.
+    :param hidden_size: The hidden size of the transformer.
+    :param num_attention_heads: The number of attention heads.
+    :return: A 2D array with the vector of each text.
+    """
+    sorted_idxs = np.argsort(np.asarray(lengths), kind="stable")
+    sorted_lengths = np.asarray(lengths)[sorted_idxs]
+
+    vectors = None
+    start = 0
+    while start < len(texts):
+        end = get_batch_end(sorted_lengths, start, memory_budget, max_batch_size, hidden_size, num_attention_heads)
+        batch_idxs = sorted_idxs[start:end]
+        try:
+            batch_vectors = np.asarray(encode_batch([texts[idx] for idx in batch_idxs]))
+        except Exception as error:
+            if end - start == 1 or not is_out_of_memory_error(error):
+                raise
+            memory_budget = min(memory_budget, (end - start) * estimate_bytes_per_sequence(
+                int(sorted_lengths[end - 1]), hidden_size, num_attention_heads)) // 2
+            continue
+        if vectors is None:
+            vectors = np.empty((len(texts),) + batch_vectors.shape[1:], dtype=batch_vectors.dtype)
+        vectors[batch_idxs] = batch_vectors
+        start = end
+
+    return vectors
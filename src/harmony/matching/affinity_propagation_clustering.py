@@ -27,6 +27,7 @@ from typing import List
 
 import numpy as np
 from harmony.matching.generate_cluster_topics import generate_cluster_topics
+from harmony.matching.similarity_matrix import get_validated_similarity_matrix, iter_row_blocks
 from harmony.schemas.requests.text import Question
 from harmony.schemas.responses.text import HarmonyCluster
 from sklearn.cluster import AffinityPropagation
@@ -34,7 +35,8 @@ from sklearn.cluster import AffinityPropagation
 
 def cluster_questions_affinity_propagation(
         questions: List[Question],
-        item_to_item_similarity_matrix: np.ndarray
+        item_to_item_similarity_matrix: np.ndarray,
+        validate: bool = True
 ) -> List[HarmonyCluster]:
     """
     Affinity Propagation Clustering using the cosine similarity matrix.
@@ -47,12 +49,19 @@ def cluster_questions_affinity_propagation(
     item_to_item_similarity_matrix : np.ndarray
         The cosine similarity matrix for the questions.
 
+    validate : bool, optional
+        Set to False to skip checking the similarity matrix when it is known
+        to be valid. A ValidatedSimilarityMatrix is never checked again.
+        Default is True.
+
     Returns
     -------
     List[HarmonyCluster]
         A list of HarmonyCluster objects representing the clusters.
     """
 
+    item_to_item_similarity_matrix = get_validated_similarity_matrix(item_to_item_similarity_matrix, validate)
+
     # assert that the number of questions is greater than 0
     assert len(questions) > 0
 
@@ -65,29 +74,14 @@ def cluster_questions_affinity_propagation(
     # assert that the number of questions is equal to the number of columns in the similarity matrix
     assert len(questions) == item_to_item_similarity_matrix.shape[1]
 
-    # assert that the number of questions is equal to the number of rows and columns in the similarity matrix
-    assert len(questions) == item_to_item_similarity_matrix.shape[0]
-    assert len(questions) == item_to_item_similarity_matrix.shape[1]
-
-    # assert that the similarity matrix is square
-    assert item_to_item_similarity_matrix.shape[0] == item_to_item_similarity_matrix.shape[1]
-
-    # assert that the similarity matrix is symmetric
-    assert np.allclose(item_to_item_similarity_matrix, item_to_item_similarity_matrix.T)
-
-    # assert that the similarity matrix is -1 <= x <= 1
-    assert np.all(np.round(item_to_item_similarity_matrix, 3) >= -1.)
-    assert np.all(np.round(item_to_item_similarity_matrix, 3) <= 1.)
-
-    # assert that the similarity matrix has 1s on its diagonals
-    assert np.allclose(np.diag(item_to_item_similarity_matrix), 1.)
-
-    # ensure that the entries of the similarity matrix are floats
-    if item_to_item_similarity_matrix.dtype != np.float64:
-        item_to_item_similarity_matrix = item_to_item_similarity_matrix.astype(np.float64)
+    # Affinity propagation needs the whole matrix in memory, so fill a single float64 copy of its absolute values
+    # block by block rather than making separate copies for the dtype conversion and the absolute value.
+    abs_similarities = np.empty(item_to_item_similarity_matrix.shape, dtype=np.float64)
+    for start, end, block in iter_row_blocks(item_to_item_similarity_matrix):
+        np.abs(block, out=abs_similarities[start:end])
 
     affinity_propagation = AffinityPropagation(affinity='precomputed', random_state=1, max_iter=10, convergence_iter=5)
-    affinity_propagation.fit(np.abs(item_to_item_similarity_matrix))
+    affinity_propagation.fit(abs_similarities)
 
     exemplars = affinity_propagation.cluster_centers_indices_
     labels = affinity_propagation.labels_
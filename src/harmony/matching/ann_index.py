@@ -0,0 +1,135 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from typing import Optional
+
+import numpy as np
+from numpy import ndarray
+from sklearn.cluster import MiniBatchKMeans
+
+
+def get_top_k_idxs(similarities: ndarray, k: int) -> ndarray:
+    """
+    Get the idxs of the k largest values of each row of a 2D array, best first, using a partial sort.
+    Ties are broken by the lower idx, so every returned idx is distinct.
+
+    :param similarities: A 2D array of shape (number of queries, number of items).
+    :param k: The number of idxs to return per row.
+    :return: A 2D array of shape (number of queries, min(k, number of items)).
+    """
+    num_items = similarities.shape[1]
+    k = min(k, num_items)
+    if k <= 0:
+        return np.zeros((similarities.shape[0], 0), dtype=np.int64)
+    if k < num_items:
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(num_items), (similarities.shape[0], 1))
+    candidate_similarities = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.lexsort((candidates, -candidate_similarities), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+class IvfIndex:
+    """
+    An inverted file (IVF) approximate nearest neighbour index over L2-normalised vectors.
+
+    The vectors are partitioned into lists by k-means on the unit sphere. A search only scores the vectors in the
+    `n_probe` lists whose centroids are closest to the query, so with around sqrt(N) lists the cost of a search grows
+    with sqrt(N) rather than N. A larger `n_probe` gives better recall at the cost of latency; probing every list is
+    exact.
+    """
+
+    def __init__(self, centroids: ndarray, list_indptr: ndarray, list_vector_idxs: ndarray):
+        """
+        :param centroids: The normalised centroids of the lists, shape (number of lists, dimensions).
+        :param list_indptr: The CSR pointers of the lists, so list `l` is `list_vector_idxs[indptr[l]:indptr[l + 1]]`.
+        :param list_vector_idxs: The idxs of the vectors in each list.
+        """
+        self.centroids = centroids
+        self.list_indptr = list_indptr
+        self.list_vector_idxs = list_vector_idxs
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: ndarray, n_lists: Optional[int] = None, random_state: int = 1) -> "IvfIndex":
+        """
+        Build an index by clustering the vectors.
+
+        :param vectors: The L2-normalised vectors to index, shape (number of vectors, dimensions).
+        :param n_lists: The number of lists (k-means clusters). Defaults to sqrt(number of vectors).
+        :param random_state: The random state for k-means.
+        :return: The index.
+        """
+        if n_lists is None:
+            n_lists = int(np.ceil(np.sqrt(len(vectors))))
+        n_lists = max(1, min(n_lists, len(vectors)))
+
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=random_state, n_init=3,
+                                 batch_size=max(1024, 4 * n_lists))
+        labels = kmeans.fit_predict(vectors)
+
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        centroids /= norms
+
+        list_vector_idxs = np.argsort(labels, kind="stable")
+        list_indptr = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_indptr[1:])
+
+        return cls(centroids, list_indptr, list_vector_idxs)
+
+    def search(self, vectors: ndarray, query_vectors: ndarray, k: int, n_probe: int = 8) -> tuple[ndarray, ndarray]:
+        """
+        Find the approximate k nearest neighbours of each query by cosine similarity.
+
+        :param vectors: The L2-normalised vectors which were indexed.
+        :param query_vectors: The L2-normalised query vectors, shape (number of queries, dimensions).
+        :param k: The number of neighbours to return per query.
+        :param n_probe: The number of lists to search per query.
+        :return: A tuple (idxs, similarities), each a list with one 1D array per query, best match first.
+            A query can get fewer than k results if the probed lists contain fewer than k vectors.
+        """
+        n_probe = max(1, min(n_probe, self.n_lists))
+        probed_lists = get_top_k_idxs(query_vectors @ self.centroids.T, n_probe)
+
+        all_idxs = []
+        all_similarities = []
+        for query_vector, lists in zip(query_vectors, probed_lists):
+            # Sorting the candidates makes ties resolve to the lower vector idx, as in an exact search
+            candidate_idxs = np.sort(np.concatenate(
+                [self.list_vector_idxs[self.list_indptr[list_idx]:self.list_indptr[list_idx + 1]] for list_idx in lists]
+            ))
+            candidate_similarities = vectors[candidate_idxs] @ query_vector
+            top = get_top_k_idxs(candidate_similarities[np.newaxis, :], k)[0]
+            all_idxs.append(candidate_idxs[top])
+            all_similarities.append(candidate_similarities[top])
+
+        return all_idxs, all_similarities
@@ -0,0 +1,200 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+import numpy as np
+from numpy import ndarray
+
+from harmony.matching.embedding_cache import EmbeddingCache
+from harmony.matching.matcher import match_instruments_with_function, process_questions, get_cached_vectors
+from harmony.matching.mhc_index import MhcIndex
+from harmony.matching.response_options_similarity import normalise_response_options
+from harmony.schemas.enums.clustering_algorithms import ClusteringAlgorithm
+from harmony.schemas.enums.similarity_output import SimilarityOutput
+from harmony.schemas.requests.text import Instrument
+from harmony.schemas.responses.text import MatchResult
+
+DEFAULT_ASYNC_BATCH_SIZE = 64
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+class ConcurrentVectoriser:
+    """
+    Wraps an async vectorisation function so that the synchronous match pipeline can use it from a worker thread.
+
+    Texts are encoded in batches of `batch_size`, with up to `max_concurrency` batches in flight at once. Texts can
+    be prefetched, i.e. their batches started before they are needed, and each text is only ever sent to the
+    vectorisation function once. Calling the object with a list of texts (from a thread other than the event loop's)
+    waits for their vectors, starting batches for any text that has not been prefetched.
+    """
+
+    def __init__(self, async_vectorisation_function: Callable[[List[str]], Awaitable],
+                 loop: asyncio.AbstractEventLoop, batch_size: int = DEFAULT_ASYNC_BATCH_SIZE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        """
+        :param async_vectorisation_function: An async function to vectorise a list of texts.
+        :param loop: The event loop to run the vectorisation function on.
+        :param batch_size: The number of texts sent to the vectorisation function at once.
+        :param max_concurrency: The maximum number of batches being encoded at once.
+        """
+        self.async_vectorisation_function = async_vectorisation_function
+        self.loop = loop
+        self.batch_size = max(1, batch_size)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        # Text -> (task encoding the batch containing it, position of the text in the batch)
+        self.text_to_batch: Dict[str, tuple[asyncio.Task, int]] = {}
+
+    async def encode_batch(self, texts: List[str]) -> ndarray:
+        async with self.semaphore:
+            return np.asarray(await self.async_vectorisation_function(texts))
+
+    def prefetch(self, texts: List[str]):
+        """
+        Start encoding the texts which are not being encoded yet. Must be called on the event loop.
+
+        :param texts: The texts.
+        """
+        new_texts = [text for text in dict.fromkeys(texts) if text not in self.text_to_batch]
+        for start in range(0, len(new_texts), self.batch_size):
+            batch = new_texts[start:start + self.batch_size]
+            task = self.loop.create_task(self.encode_batch(batch))
+            for position, text in enumerate(batch):
+                self.text_to_batch[text] = (task, position)
+
+    async def get_vectors(self, texts: List[str]) -> ndarray:
+        """
+        :param texts: The texts.
+        :return: A 2D array with the vector of each text.
+        """
+        self.prefetch(texts)
+        batches = [self.text_to_batch[text] for text in texts]
+        await asyncio.gather(*dict.fromkeys(task for task, _ in batches))
+        return np.array([task.result()[position] for task, position in batches])
+
+    def __call__(self, texts: List[str]) -> ndarray:
+        return asyncio.run_coroutine_threadsafe(self.get_vectors(list(texts)), self.loop).result()
+
+    def cancel(self):
+        """
+        Cancel the batches which are still being encoded.
+        """
+        for task, _ in self.text_to_batch.values():
+            task.cancel()
+
+
+def get_texts_to_prefetch(instruments: List[Instrument], query: Optional[str],
+                          texts_cached_vectors: Union[dict, EmbeddingCache], is_negate: bool) -> List[str]:
+    """
+    Get the texts that the match pipeline will need to encode, as far as they can be known before it runs: the
+    questions, the negated questions and the query which are not cached, and the distinct response options.
+
+    :param instruments: The instruments.
+    :param query: The query.
+    :param texts_cached_vectors: A dictionary of already cached text vectors (text to vector), or an EmbeddingCache.
+    :param is_negate: Whether the questions will be negated.
+    :return: The texts, questions first and response options last.
+    """
+    questions = [question for instrument in instruments for question in instrument.questions]
+    text_vectors = process_questions([question.question_text for question in questions], {}, is_negate=is_negate)
+    texts = [text_vector.text for text_vector in text_vectors if text_vector.vector is not None]
+    if query:
+        texts.append(query)
+    texts = list(dict.fromkeys(texts))
+    texts = [text for text, vector in zip(texts, get_cached_vectors(texts, texts_cached_vectors)) if vector is None]
+
+    options = [normalise_response_options(question.options) for question in questions if question.options]
+    return texts + list(dict.fromkeys(options))
+
+
+async def amatch_instruments_with_function(
+        instruments: List[Instrument],
+        query: str,
+        vectorisation_function: Callable[[List[str]], Awaitable],
+        topics: List = [],
+        mhc_questions: List = [],
+        mhc_all_metadatas: List = [],
+        mhc_embeddings: np.ndarray = np.zeros((0, 0)),
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache] = {},
+        is_negate: bool = True,
+        clustering_algorithm: ClusteringAlgorithm = ClusteringAlgorithm.affinity_propagation,
+        num_clusters_for_kmeans: int = None,
+        mhc_min_similarity: float = 0.0,
+        similarity_memmap_path: str = None,
+        similarity_output: SimilarityOutput = SimilarityOutput.dense,
+        similarity_top_k: int = 20,
+        similarity_threshold: float = 0.5,
+        mhc_index: MhcIndex = None,
+        compact_response_options: bool = False,
+        batch_size: int = DEFAULT_ASYNC_BATCH_SIZE,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> MatchResult:
+    """
+    The asyncio version of `match_instruments_with_function`, for an async vectorisation function such as a call to
+    a remote model. It gives the same MatchResult.
+
+    All the texts known up front (questions, negated questions, query and response options) are sent to the
+    vectorisation function straight away, in batches of `batch_size` with at most `max_concurrency` batches in flight.
+    The rest of the pipeline runs in a worker thread as soon as it is started, so its CPU work (similarity matrix,
+    MHC matching, clustering) overlaps with the encoding still in progress and the event loop is never blocked.
+
+    :param vectorisation_function: An async function to vectorise a list of texts.
+    :param batch_size: The number of texts sent to the vectorisation function at once.
+    :param max_concurrency: The maximum number of calls to the vectorisation function in flight at once.
+    :return: The match result.
+
+    See `match_instruments_with_function` for the other parameters.
+    """
+    concurrent_vectoriser = ConcurrentVectoriser(vectorisation_function, asyncio.get_running_loop(),
+                                                 batch_size=batch_size, max_concurrency=max_concurrency)
+    try:
+        concurrent_vectoriser.prefetch(
+            await asyncio.to_thread(get_texts_to_prefetch, instruments, query, texts_cached_vectors, is_negate)
+        )
+        return await asyncio.to_thread(
+            match_instruments_with_function,
+            instruments=instruments,
+            query=query,
+            vectorisation_function=concurrent_vectoriser,
+            topics=topics,
+            mhc_questions=mhc_questions,
+            mhc_all_metadatas=mhc_all_metadatas,
+            mhc_embeddings=mhc_embeddings,
+            texts_cached_vectors=texts_cached_vectors,
+            is_negate=is_negate,
+            clustering_algorithm=clustering_algorithm,
+            num_clusters_for_kmeans=num_clusters_for_kmeans,
+            mhc_min_similarity=mhc_min_similarity,
+            similarity_memmap_path=similarity_memmap_path,
+            similarity_output=similarity_output,
+            similarity_top_k=similarity_top_k,
+            similarity_threshold=similarity_threshold,
+            mhc_index=mhc_index,
+            compact_response_options=compact_response_options
+        )
+    finally:
+        concurrent_vectoriser.cancel()
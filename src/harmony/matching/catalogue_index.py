@@ -0,0 +1,364 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+from numpy import ndarray
+
+from harmony.matching.ann_index import IvfIndex, get_top_k_idxs
+from harmony.matching.quantisation import FLOAT32, QuantisedVectors, check_quantisation
+
+EMBEDDINGS_FILE_NAME = "embeddings.npy"
+EMBEDDING_SCALES_FILE_NAME = "embedding_scales.npy"
+INDPTR_FILE_NAME = "question_idx_to_instrument_idxs_indptr.npy"
+INDICES_FILE_NAME = "question_idx_to_instrument_idxs.npy"
+METADATA_FILE_NAME = "catalogue.json"
+IVF_CENTROIDS_FILE_NAME = "ivf_centroids.npy"
+IVF_LIST_INDPTR_FILE_NAME = "ivf_list_indptr.npy"
+IVF_LIST_VECTOR_IDXS_FILE_NAME = "ivf_list_vector_idxs.npy"
+
+# The keys of a catalogue data dict that its index is built from
+CATALOGUE_DATA_KEYS = ("all_questions", "all_instruments", "instrument_idx_to_question_idx",
+                       "all_embeddings_concatenated")
+
+# The number of catalogue indexes built by get_catalogue_index to keep, least recently used first
+CATALOGUE_INDEX_CACHE_SIZE = 4
+catalogue_index_cache: OrderedDict = OrderedDict()
+catalogue_index_cache_lock = threading.Lock()
+
+
+def normalise_vectors(vectors: ndarray, dtype=np.float32) -> ndarray:
+    """
+    L2-normalise each row of a 2D array. Rows with a norm of zero are left as zeros.
+
+    :param vectors: A 2D array of vectors, one per row.
+    :param dtype: The dtype of the returned array.
+    :return: The normalised vectors.
+    """
+    vectors = np.asarray(vectors, dtype=dtype)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def build_question_idx_to_instrument_idxs(instrument_idx_to_question_idx: List[List[int]],
+                                          num_catalogue_questions: int) -> tuple[ndarray, ndarray]:
+    """
+    Invert the catalogue's instrument -> questions mapping into a question -> instruments mapping in CSR form.
+    The instrument idxs of catalogue question `q` are `indices[indptr[q]:indptr[q + 1]]`, sorted and without
+    duplicates.
+
+    :param instrument_idx_to_question_idx: For each catalogue instrument, the idxs of the catalogue questions in it.
+    :param num_catalogue_questions: The number of questions in the catalogue.
+    :return: A tuple (indptr, indices).
+    """
+    num_catalogue_instruments = len(instrument_idx_to_question_idx)
+
+    question_idxs = np.fromiter(
+        (question_idx for question_idxs in instrument_idx_to_question_idx for question_idx in question_idxs),
+        dtype=np.int64
+    )
+    instrument_idxs = np.repeat(
+        np.arange(num_catalogue_instruments, dtype=np.int64),
+        [len(question_idxs) for question_idxs in instrument_idx_to_question_idx]
+    )
+
+    # Sort by question, then instrument, dropping questions listed twice in the same instrument
+    pair_keys = np.unique(question_idxs * num_catalogue_instruments + instrument_idxs)
+    indices = pair_keys % max(num_catalogue_instruments, 1)
+    indptr = np.zeros(num_catalogue_questions + 1, dtype=np.int64)
+    np.cumsum(np.bincount(pair_keys // max(num_catalogue_instruments, 1), minlength=num_catalogue_questions),
+              out=indptr[1:])
+
+    return indptr, indices
+
+
+class CatalogueIndex:
+    """
+    A reusable, read-only index over the Harmony catalogue.
+
+    It holds the catalogue questions' embeddings L2-normalised as float32 (so a cosine similarity against the
+    catalogue is a single matrix product), the inverted question -> instruments mapping and the instrument metadata.
+
+    The index can be saved to a folder and loaded back with the embeddings memory-mapped, so that several processes
+    serving the same catalogue share one copy of it in the OS page cache.
+
+    Optionally, an approximate nearest neighbour index can be built with `build_ann_index` for faster searches, and
+    the embeddings can be stored quantised as float16 or int8 (see `QuantisedVectors`) to save memory and disk space.
+    """
+
+    def __init__(self, all_questions: List[str], all_instruments: List[dict],
+                 instrument_idx_to_question_idx: List[List[int]], embeddings: ndarray,
+                 question_idx_to_instrument_idxs: Optional[tuple[ndarray, ndarray]] = None,
+                 is_normalised: bool = False, ann_index: Optional[IvfIndex] = None, quantisation: str = FLOAT32):
+        """
+        :param all_questions: The unique question texts in the catalogue, one per row of the embeddings.
+        :param all_instruments: The catalogue instruments, each a dict with "instrument_name" and "metadata".
+        :param instrument_idx_to_question_idx: For each catalogue instrument, the idxs of the catalogue questions in it.
+        :param embeddings: The embeddings of the catalogue questions, shape (number of questions, dimensions).
+        :param question_idx_to_instrument_idxs: The inverted index (indptr, indices), if already computed.
+        :param is_normalised: Set to True if the embeddings are already L2-normalised float32 (or QuantisedVectors of
+            L2-normalised vectors), to avoid a copy.
+        :param ann_index: An approximate nearest neighbour index over the embeddings, if already built.
+        :param quantisation: How to store the embeddings: "float32" (the default), "float16" or "int8".
+        """
+        check_quantisation(quantisation)
+        self.all_questions = all_questions
+        self.all_instruments = all_instruments
+        self.instrument_idx_to_question_idx = instrument_idx_to_question_idx
+
+        if is_normalised:
+            self.embeddings = embeddings
+        elif len(embeddings) == 0:
+            self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        else:
+            self.embeddings = normalise_vectors(embeddings)
+
+        if quantisation != FLOAT32 and not isinstance(self.embeddings, QuantisedVectors) and len(self.embeddings) > 0:
+            self.embeddings = QuantisedVectors.quantise(self.embeddings, quantisation)
+
+        if question_idx_to_instrument_idxs is None:
+            question_idx_to_instrument_idxs = build_question_idx_to_instrument_idxs(instrument_idx_to_question_idx,
+                                                                                    len(all_questions))
+        self.question_idx_to_instrument_idxs_indptr, self.question_idx_to_instrument_idxs = (
+            question_idx_to_instrument_idxs
+        )
+
+        # The number of distinct questions in each catalogue instrument
+        self.instrument_idx_to_num_questions = np.bincount(self.question_idx_to_instrument_idxs,
+                                                           minlength=len(all_instruments))
+
+        self.ann_index = ann_index
+
+    def __len__(self) -> int:
+        return len(self.all_questions)
+
+    @classmethod
+    def from_catalogue_data(cls, catalogue_data: dict, quantisation: str = FLOAT32) -> "CatalogueIndex":
+        """
+        Build an index from the catalogue data dict, which contains the keys "all_questions", "all_instruments",
+        "instrument_idx_to_question_idx" and "all_embeddings_concatenated".
+
+        :param catalogue_data: The catalogue data.
+        :param quantisation: How to store the embeddings: "float32" (the default), "float16" or "int8".
+        :return: The catalogue index.
+        """
+        return cls(
+            all_questions=catalogue_data["all_questions"],
+            all_instruments=catalogue_data["all_instruments"],
+            instrument_idx_to_question_idx=catalogue_data["instrument_idx_to_question_idx"],
+            embeddings=catalogue_data["all_embeddings_concatenated"],
+            quantisation=quantisation,
+        )
+
+    @classmethod
+    def from_questions(cls, all_questions: List[str], all_instruments: List[dict],
+                       instrument_idx_to_question_idx: List[List[int]],
+                       vectorisation_function: Callable[[List[str]], ndarray],
+                       quantisation: str = FLOAT32) -> "CatalogueIndex":
+        """
+        Build an index by encoding the catalogue questions. For a large catalogue, pass a `ProcessPoolEncoder` as the
+        vectorisation function to encode the questions on several processes.
+
+        :param all_questions: The unique question texts in the catalogue.
+        :param all_instruments: The catalogue instruments, each a dict with "instrument_name" and "metadata".
+        :param instrument_idx_to_question_idx: For each catalogue instrument, the idxs of the catalogue questions in it.
+        :param vectorisation_function: A function to vectorise a list of texts.
+        :param quantisation: How to store the embeddings: "float32" (the default), "float16" or "int8".
+        :return: The catalogue index.
+        """
+        if len(all_questions) == 0:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        else:
+            embeddings = np.asarray(vectorisation_function(list(all_questions)))
+        return cls(
+            all_questions=all_questions,
+            all_instruments=all_instruments,
+            instrument_idx_to_question_idx=instrument_idx_to_question_idx,
+            embeddings=embeddings,
+            quantisation=quantisation,
+        )
+
+    def get_instrument_idxs_for_question(self, question_idx: int) -> ndarray:
+        """
+        Get the idxs of the catalogue instruments containing a catalogue question, in ascending order.
+        """
+        return self.question_idx_to_instrument_idxs[
+               self.question_idx_to_instrument_idxs_indptr[question_idx]:
+               self.question_idx_to_instrument_idxs_indptr[question_idx + 1]
+               ]
+
+    def cosine_similarities(self, vectors: ndarray) -> ndarray:
+        """
+        Get the cosine similarity of each vector with each catalogue question.
+
+        :param vectors: A 2D array of vectors, shape (number of vectors, dimensions).
+        :return: A 2D array of shape (number of vectors, number of catalogue questions).
+        """
+        if isinstance(self.embeddings, QuantisedVectors):
+            return self.embeddings.dot(normalise_vectors(vectors))
+        return normalise_vectors(vectors) @ self.embeddings.T
+
+    def build_ann_index(self, n_lists: Optional[int] = None, random_state: int = 1) -> IvfIndex:
+        """
+        Build an IVF approximate nearest neighbour index over the embeddings, used by `search` when `n_probe` is given.
+
+        :param n_lists: The number of IVF lists. Defaults to sqrt(number of catalogue questions).
+        :param random_state: The random state for the k-means clustering.
+        :return: The ANN index.
+        """
+        embeddings = self.embeddings
+        if isinstance(embeddings, QuantisedVectors):
+            embeddings = embeddings.dequantise()
+        self.ann_index = IvfIndex.build(embeddings, n_lists=n_lists, random_state=random_state)
+        return self.ann_index
+
+    def search(self, vectors: ndarray, k: int, n_probe: Optional[int] = None) -> tuple[list[ndarray], list[ndarray]]:
+        """
+        Find the k catalogue questions most similar to each vector, best match first.
+
+        :param vectors: A 2D array of vectors, shape (number of vectors, dimensions).
+        :param k: The number of catalogue questions to return per vector.
+        :param n_probe: The number of IVF lists to search, if an ANN index has been built. Higher values give better
+            recall but are slower. Leave as None for an exact search.
+        :return: A tuple (idxs, similarities), each a list with one 1D array per vector.
+        """
+        if n_probe is not None and self.ann_index is not None:
+            return self.ann_index.search(self.embeddings, normalise_vectors(vectors), k, n_probe=n_probe)
+
+        similarities = self.cosine_similarities(vectors)
+        top_idxs = get_top_k_idxs(similarities, k)
+        return list(top_idxs), list(np.take_along_axis(similarities, top_idxs, axis=1))
+
+    def save(self, folder: str):
+        """
+        Save the index to a folder, which is created if it does not exist.
+        The arrays are saved as .npy files and the questions and instruments as JSON. Quantised embeddings are saved
+        quantised, with the int8 scales in a separate file.
+
+        :param folder: The folder to write to.
+        """
+        os.makedirs(folder, exist_ok=True)
+        if isinstance(self.embeddings, QuantisedVectors):
+            np.save(os.path.join(folder, EMBEDDINGS_FILE_NAME), np.ascontiguousarray(self.embeddings.values))
+            if self.embeddings.scales is not None:
+                np.save(os.path.join(folder, EMBEDDING_SCALES_FILE_NAME), self.embeddings.scales)
+        else:
+            np.save(os.path.join(folder, EMBEDDINGS_FILE_NAME),
+                    np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        np.save(os.path.join(folder, INDPTR_FILE_NAME), self.question_idx_to_instrument_idxs_indptr)
+        np.save(os.path.join(folder, INDICES_FILE_NAME), self.question_idx_to_instrument_idxs)
+        if self.ann_index is not None:
+            np.save(os.path.join(folder, IVF_CENTROIDS_FILE_NAME), self.ann_index.centroids)
+            np.save(os.path.join(folder, IVF_LIST_INDPTR_FILE_NAME), self.ann_index.list_indptr)
+            np.save(os.path.join(folder, IVF_LIST_VECTOR_IDXS_FILE_NAME), self.ann_index.list_vector_idxs)
+        with open(os.path.join(folder, METADATA_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump({
+                "all_questions": self.all_questions,
+                "all_instruments": self.all_instruments,
+                "instrument_idx_to_question_idx": [list(map(int, question_idxs)) for question_idxs in
+                                                   self.instrument_idx_to_question_idx],
+            }, f)
+
+    @classmethod
+    def load(cls, folder: str, mmap: bool = True) -> "CatalogueIndex":
+        """
+        Load an index saved with `save`.
+
+        :param folder: The folder to read from.
+        :param mmap: If True (the default), the arrays are memory-mapped read-only rather than read into memory.
+        :return: The catalogue index.
+        """
+        mmap_mode = "r" if mmap else None
+        with open(os.path.join(folder, METADATA_FILE_NAME), "r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        ann_index = None
+        if os.path.exists(os.path.join(folder, IVF_CENTROIDS_FILE_NAME)):
+            ann_index = IvfIndex(
+                centroids=np.load(os.path.join(folder, IVF_CENTROIDS_FILE_NAME)),
+                list_indptr=np.load(os.path.join(folder, IVF_LIST_INDPTR_FILE_NAME)),
+                list_vector_idxs=np.load(os.path.join(folder, IVF_LIST_VECTOR_IDXS_FILE_NAME), mmap_mode=mmap_mode),
+            )
+        embeddings = np.load(os.path.join(folder, EMBEDDINGS_FILE_NAME), mmap_mode=mmap_mode)
+        if embeddings.dtype != np.float32:
+            scales = None
+            if os.path.exists(os.path.join(folder, EMBEDDING_SCALES_FILE_NAME)):
+                scales = np.load(os.path.join(folder, EMBEDDING_SCALES_FILE_NAME), mmap_mode=mmap_mode)
+            embeddings = QuantisedVectors(embeddings, scales)
+        return cls(
+            all_questions=metadata["all_questions"],
+            all_instruments=metadata["all_instruments"],
+            instrument_idx_to_question_idx=metadata["instrument_idx_to_question_idx"],
+            embeddings=embeddings,
+            question_idx_to_instrument_idxs=(
+                np.load(os.path.join(folder, INDPTR_FILE_NAME), mmap_mode=mmap_mode),
+                np.load(os.path.join(folder, INDICES_FILE_NAME), mmap_mode=mmap_mode),
+            ),
+            is_normalised=True,
+            ann_index=ann_index,
+        )
+
+
+def get_catalogue_data_key(catalogue_data: dict) -> tuple:
+    """
+    Get the key of a catalogue data dict in the cache of catalogue indexes: the identity of the objects the index is
+    built from and their lengths, so that replacing any of them or appending to them builds a new index.
+    """
+    return tuple((id(catalogue_data[name]), len(catalogue_data[name])) for name in CATALOGUE_DATA_KEYS)
+
+
+def get_catalogue_index(catalogue_data: Union[dict, CatalogueIndex]) -> CatalogueIndex:
+    """
+    Get a catalogue index for either a catalogue index or a catalogue data dict.
+    For a dict, the index is built once and kept in a small module-level cache, keyed by the identity of the dict's
+    questions, instruments and embeddings, so that subsequent calls with the same catalogue data are free. The dict
+    itself is not changed. To control the lifetime of the index, build it with `CatalogueIndex.from_catalogue_data`
+    and pass it instead of the dict.
+
+    :param catalogue_data: The catalogue data or catalogue index.
+    :return: The catalogue index.
+    """
+    if isinstance(catalogue_data, CatalogueIndex):
+        return catalogue_data
+
+    key = get_catalogue_data_key(catalogue_data)
+    with catalogue_index_cache_lock:
+        if key in catalogue_index_cache:
+            catalogue_index_cache.move_to_end(key)
+            return catalogue_index_cache[key][1]
+
+    catalogue_index = CatalogueIndex.from_catalogue_data(catalogue_data)
+    with catalogue_index_cache_lock:
+        # Keep the source objects alive with the index, so that their ids are not reused by other objects
+        catalogue_index_cache[key] = ([catalogue_data[name] for name in CATALOGUE_DATA_KEYS], catalogue_index)
+        while len(catalogue_index_cache) > CATALOGUE_INDEX_CACHE_SIZE:
+            catalogue_index_cache.popitem(last=False)
+    return catalogue_index
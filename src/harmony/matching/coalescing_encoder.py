@@ -0,0 +1,174 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, List, Optional
+
+import numpy as np
+from numpy import ndarray
+
+DEFAULT_MAX_BATCH_SIZE = 256
+
+DEFAULT_MAX_WAIT_SECONDS = 0.005
+
+
+class CoalescingEncoder:
+    """
+    Merges the texts sent by concurrent callers into larger batches for one encoding function, e.g. when an API
+    serves many small requests at once, each of which only needs a few texts encoded.
+
+    A background thread waits for texts to arrive. Once it has `max_batch_size` texts, or the first waiting texts have
+    waited `max_wait_seconds`, it encodes all the waiting distinct texts in one call and hands each caller its own
+    vectors. The encoder can be used wherever a `vectorisation_function` is expected:
+
+        encoder = CoalescingEncoder(convert_texts_to_vector)
+        match_instruments_with_function(instruments, None, encoder)
+    """
+
+    def __init__(self, encode_function: Optional[Callable[[List[str]], ndarray]] = None,
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS):
+        """
+        :param encode_function: The function to vectorise a list of texts. Defaults to Harmony's default
+            sentence transformer (`convert_texts_to_vector`).
+        :param max_batch_size: Encode as soon as this many texts are waiting. A single request with more texts than
+            this is encoded in one call on its own.
+        :param max_wait_seconds: The longest time texts wait for other texts to join their batch.
+        """
+        self.encode_function = encode_function
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_seconds = max_wait_seconds
+        # The waiting requests: (texts, future, time of arrival)
+        self.pending: Deque[tuple[List[str], Future, float]] = deque()
+        self.num_pending_texts = 0
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.is_closed = False
+        self.num_batches = 0
+        self.num_requests = 0
+
+    def __call__(self, texts: List[str]) -> ndarray:
+        return self.submit(texts).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, texts: List[str]) -> Future:
+        """
+        Queue texts to be encoded with texts from other callers.
+
+        :param texts: The texts.
+        :return: A future of the 2D array of the texts' vectors, in order.
+        """
+        future = Future()
+        texts = list(texts)
+        if len(texts) == 0:
+            future.set_result(np.zeros((0, 0)))
+            return future
+        with self.condition:
+            if self.is_closed:
+                raise RuntimeError("The encoder has been closed.")
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="CoalescingEncoder", daemon=True)
+                self.thread.start()
+            self.pending.append((texts, future, time.monotonic()))
+            self.num_pending_texts += len(texts)
+            self.num_requests += 1
+            self.condition.notify()
+        return future
+
+    def close(self):
+        """
+        Encode the texts which are still waiting and stop the background thread.
+        """
+        with self.condition:
+            self.is_closed = True
+            self.condition.notify()
+            thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def take_batch(self) -> Optional[List[tuple[List[str], Future, float]]]:
+        """
+        Wait until a batch is ready and take it from the waiting requests, or return None once the encoder is closed
+        and nothing is waiting.
+        """
+        with self.condition:
+            while True:
+                if self.pending:
+                    deadline = self.pending[0][2] + self.max_wait_seconds
+                    remaining_seconds = deadline - time.monotonic()
+                    if self.num_pending_texts >= self.max_batch_size or remaining_seconds <= 0 or self.is_closed:
+                        break
+                    self.condition.wait(remaining_seconds)
+                elif self.is_closed:
+                    return None
+                else:
+                    self.condition.wait()
+
+            # Take whole requests up to the batch size, and always at least one
+            batch = []
+            num_texts = 0
+            while self.pending and (not batch or num_texts + len(self.pending[0][0]) <= self.max_batch_size):
+                request = self.pending.popleft()
+                batch.append(request)
+                num_texts += len(request[0])
+            self.num_pending_texts -= num_texts
+            return batch
+
+    def run(self):
+        while True:
+            batch = self.take_batch()
+            if batch is None:
+                return
+            self.encode_batch(batch)
+
+    def encode_batch(self, batch: List[tuple[List[str], Future, float]]):
+        """
+        Encode the distinct texts of a batch of requests in one call and resolve each request's future.
+        """
+        if self.encode_function is None:
+            from harmony.matching.default_matcher import convert_texts_to_vector
+            self.encode_function = convert_texts_to_vector
+
+        text_to_idx = {}
+        request_idxs = [np.array([text_to_idx.setdefault(text, len(text_to_idx)) for text in texts], dtype=np.int64)
+                        for texts, _, _ in batch]
+        try:
+            vectors = np.asarray(self.encode_function(list(text_to_idx)))
+        except Exception as exception:
+            for _, future, _ in batch:
+                future.set_exception(exception)
+            return
+        finally:
+            self.num_batches += 1
+
+        for (_, future, _), idxs in zip(batch, request_idxs):
+            future.set_result(vectors[idxs])
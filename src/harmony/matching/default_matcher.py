@@ -25,13 +25,20 @@ SOFTWARE.
 """
 
 import os
-from typing import List
+from typing import List, Union
 
 import numpy as np
 from harmony import match_instruments_with_function
+from harmony.matching.adaptive_batching import encode_in_length_sorted_batches, get_encode_memory_budget
+from harmony.matching.embedding_backend import get_default_embedding_backend, get_sentence_transformer_size_bytes, \
+    load_sentence_transformer
+from harmony.matching.embedding_cache import EmbeddingCache
+from harmony.matching.incremental_matcher import update_match_result_with_function
+from harmony.matching.mhc_index import MhcIndex
+from harmony.models import model_registry
+from harmony.schemas.enums.embedding_backend import EmbeddingBackend
 from harmony.schemas.requests.text import Instrument
 from numpy import ndarray
-from sentence_transformers import SentenceTransformer
 
 from harmony.schemas.responses.text import MatchResult
 
@@ -45,29 +52,99 @@ else:
         "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
     )
 
-model = SentenceTransformer(sentence_transformer_path)
-
-
-def convert_texts_to_vector(texts: List, batch_size=1000, max_batches=2000) -> ndarray:
-    if batch_size == 0:
-        embeddings = model.encode(sentences=texts, convert_to_numpy=True)
-
-        return embeddings
-
-    embeddings = []
-    batch_count = 0
-
-    # Process texts in batches
-    for i in range(0, len(texts), batch_size):
-        if batch_count >= max_batches:
-            break
-        batch = texts[i:i + batch_size]
-        batch_embeddings = model.encode(sentences=batch, convert_to_numpy=True)
-        embeddings.append(batch_embeddings)
-        batch_count += 1
-
-    # Concatenate all batch embeddings into a single NumPy array
-    return np.concatenate(embeddings, axis=0)
+def get_model_name(embedding_backend: EmbeddingBackend = None) -> str:
+    """
+    Get the name in the model registry of the sentence transformer for an embedding backend, registering it.
+
+    :param embedding_backend: The embedding backend. Defaults to HARMONY_EMBEDDING_BACKEND, or torch.
+    :return: The name of the model in `harmony.models.model_registry`.
+    """
+    embedding_backend = EmbeddingBackend(embedding_backend or get_default_embedding_backend())
+    model_name = f"{sentence_transformer_path}:{embedding_backend.value}"
+    if not model_registry.is_registered(model_name):
+        model_registry.register(model_name,
+                                lambda: load_sentence_transformer(sentence_transformer_path, embedding_backend),
+                                get_sentence_transformer_size_bytes)
+    return model_name
+
+
+def get_model(embedding_backend: EmbeddingBackend = None):
+    """
+    Get the sentence transformer for an embedding backend from the model registry, loading it the first time it is
+    needed.
+
+    :param embedding_backend: The embedding backend. Defaults to HARMONY_EMBEDDING_BACKEND, or torch.
+    :return: The sentence transformer.
+    """
+    return model_registry.get(get_model_name(embedding_backend))
+
+
+# Register the default model so that it can be warmed up
+get_model_name()
+
+
+def __getattr__(name):
+    # The default model used to be loaded when this module was imported as `model`; it is now loaded on first use
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_token_lengths(model, texts: List[str]) -> ndarray:
+    """
+    Get the number of tokens that the sentence transformer will see for each text, or the number of characters if
+    the model has no tokeniser.
+    """
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return np.array([len(text) for text in texts], dtype=int)
+    input_ids = tokenizer(texts, add_special_tokens=True, truncation=True,
+                          max_length=getattr(model, "max_seq_length", None))["input_ids"]
+    return np.array([len(ids) for ids in input_ids], dtype=int)
+
+
+def get_transformer_dimensions(model) -> tuple:
+    """
+    Get the hidden size and the number of attention heads of the transformer inside a sentence transformer, for
+    estimating how much memory a batch takes.
+    """
+    try:
+        config = model[0].auto_model.config
+        return config.hidden_size, config.num_attention_heads
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return 384, 12
+
+
+def convert_texts_to_vector(texts: List, batch_size=1000, max_batches=2000,
+                            embedding_backend: EmbeddingBackend = None) -> ndarray:
+    """
+    Convert texts to vectors with the sentence transformer. The texts are sorted by token length into batches so that
+    little computation is spent on padding, and each batch holds as many texts as fit in the memory budget
+    HARMONY_ENCODE_MEMORY_BUDGET_MB, backing off if a batch runs out of memory. The vectors are returned in the order
+    of the texts.
+
+    :param texts: The texts.
+    :param batch_size: The maximum number of texts in one forward pass, or 0 for no limit besides the memory budget.
+    :param max_batches: Deprecated and ignored: all texts are always converted.
+    :param embedding_backend: The embedding backend. Defaults to HARMONY_EMBEDDING_BACKEND, or torch.
+    :return: A 2D array with the vector of each text.
+    """
+    model = get_model(embedding_backend)
+    texts = list(texts)
+    if len(texts) == 0:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    hidden_size, num_attention_heads = get_transformer_dimensions(model)
+
+    return encode_in_length_sorted_batches(
+        texts,
+        lambda batch: model.encode(sentences=batch, batch_size=len(batch), convert_to_numpy=True),
+        get_token_lengths(model, texts),
+        get_encode_memory_budget(),
+        max_batch_size=batch_size,
+        hidden_size=hidden_size,
+        num_attention_heads=num_attention_heads
+    )
 
 
 def match_instruments(
@@ -77,11 +154,18 @@ def match_instruments(
         mhc_questions: List = [],
         mhc_all_metadatas: List = [],
         mhc_embeddings: np.ndarray = np.zeros((0, 0)),
-        texts_cached_vectors: dict[str, List[float]] = {}, batch_size: int = 1000, max_batches: int = 2000,
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache] = {}, batch_size: int = 1000, max_batches: int = 2000,
         is_negate: bool = True,
         clustering_algorithm: str = "affinity_propagation",
         num_clusters_for_kmeans: int = None,
-        mhc_min_similarity: float = 0.0
+        mhc_min_similarity: float = 0.0,
+        similarity_memmap_path: str = None,
+        similarity_output: str = "dense",
+        similarity_top_k: int = 20,
+        similarity_threshold: float = 0.5,
+        mhc_index: MhcIndex = None,
+        compact_response_options: bool = False,
+        embedding_backend: str = None
 ) -> MatchResult:
     for instrument in instruments:
         for question in instrument.questions:
@@ -91,7 +175,53 @@ def match_instruments(
         instruments=instruments,
         query=query,
         vectorisation_function=lambda texts: convert_texts_to_vector(texts, batch_size=batch_size,
-                                                                     max_batches=max_batches),
+                                                                     max_batches=max_batches,
+                                                                     embedding_backend=embedding_backend),
+        topics=topics,
+        mhc_questions=mhc_questions,
+        mhc_all_metadatas=mhc_all_metadatas,
+        mhc_embeddings=mhc_embeddings,
+        texts_cached_vectors=texts_cached_vectors,
+        is_negate=is_negate,
+        clustering_algorithm=clustering_algorithm,
+        num_clusters_for_kmeans=num_clusters_for_kmeans,
+        mhc_min_similarity=mhc_min_similarity,
+        similarity_memmap_path=similarity_memmap_path,
+        similarity_output=similarity_output,
+        similarity_top_k=similarity_top_k,
+        similarity_threshold=similarity_threshold,
+        mhc_index=mhc_index,
+        compact_response_options=compact_response_options
+    )
+
+
+def update_match_result(
+        match_result: MatchResult,
+        instruments: List[Instrument],
+        added_instruments: List[Instrument] = [],
+        removed_instrument_ids: List[str] = [],
+        query: str = None,
+        topics: List = [],
+        mhc_questions: List = [],
+        mhc_all_metadatas: List = [],
+        mhc_embeddings: np.ndarray = np.zeros((0, 0)),
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache] = {}, batch_size: int = 1000, max_batches: int = 2000,
+        is_negate: bool = True,
+        clustering_algorithm: str = "affinity_propagation",
+        num_clusters_for_kmeans: int = None,
+        mhc_min_similarity: float = 0.0,
+        mhc_index: MhcIndex = None,
+        embedding_backend: str = None
+) -> MatchResult:
+    return update_match_result_with_function(
+        match_result=match_result,
+        instruments=instruments,
+        vectorisation_function=lambda texts: convert_texts_to_vector(texts, batch_size=batch_size,
+                                                                     max_batches=max_batches,
+                                                                     embedding_backend=embedding_backend),
+        added_instruments=added_instruments,
+        removed_instrument_ids=removed_instrument_ids,
+        query=query,
         topics=topics,
         mhc_questions=mhc_questions,
         mhc_all_metadatas=mhc_all_metadatas,
@@ -100,5 +230,6 @@ def match_instruments(
         is_negate=is_negate,
         clustering_algorithm=clustering_algorithm,
         num_clusters_for_kmeans=num_clusters_for_kmeans,
-        mhc_min_similarity=mhc_min_similarity
+        mhc_min_similarity=mhc_min_similarity,
+        mhc_index=mhc_index
     )
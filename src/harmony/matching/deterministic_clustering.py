@@ -24,11 +24,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from collections import Counter
 from typing import List
 
 import numpy as np
 
+from harmony.matching.similarity_matrix import get_validated_similarity_matrix, iter_lower_triangle_entries
 from harmony.schemas.requests.text import Question
 from harmony.schemas.responses.text import HarmonyCluster
 from harmony.matching.generate_cluster_topics import generate_cluster_topics
@@ -37,7 +37,8 @@ from harmony.matching.generate_cluster_topics import generate_cluster_topics
 def find_clusters_deterministic(
     questions: List[Question],
     item_to_item_similarity_matrix: np.ndarray,
-    threshold: float = 0.5
+    threshold: float = 0.5,
+    validate: bool = True
 ) -> List[HarmonyCluster]:
     """
     Deterministic clustering using Sentence Transformers for cluster keywords.
@@ -49,12 +50,20 @@ def find_clusters_deterministic(
 
     item_to_item_similarity_matrix : np.ndarray
         A cosine similarity matrix of shape (N, N) for the questions, where
-        N is the number of questions.
+        N is the number of questions. This can be a memory-mapped array,
+        which is read one block of rows at a time, or a scipy.sparse matrix,
+        in which case pairs that are not stored are never clustered together.
 
     threshold : float, optional
         The minimum similarity score required to cluster two items together.
         Default is 0.5.
 
+    validate : bool, optional
+        Set to False to skip checking that the similarity matrix is symmetric,
+        in the range -1 to 1 and has 1s on its diagonal, when it is known to
+        be valid. A ValidatedSimilarityMatrix is never checked again.
+        Default is True.
+
     Returns
     -------
     List[HarmonyCluster]
@@ -62,6 +71,8 @@ def find_clusters_deterministic(
         the specified similarity threshold.
     """
 
+    item_to_item_similarity_matrix = get_validated_similarity_matrix(item_to_item_similarity_matrix, validate)
+
     # Basic assertions to ensure valid input data
     assert len(questions) > 0, "There must be at least one question."
     assert item_to_item_similarity_matrix.size > 0, "Similarity matrix cannot be empty."
@@ -69,48 +80,47 @@ def find_clusters_deterministic(
         "Number of questions must match the similarity matrix's row count."
     assert len(questions) == item_to_item_similarity_matrix.shape[1], \
         "Number of questions must match the similarity matrix's column count."
-    assert item_to_item_similarity_matrix.shape[0] == item_to_item_similarity_matrix.shape[1], \
-        "Similarity matrix must be square."
-    assert np.allclose(item_to_item_similarity_matrix, item_to_item_similarity_matrix.T), \
-        "Similarity matrix must be symmetric."
-    assert np.all(np.round(item_to_item_similarity_matrix, 3) >= -1.), \
-        "All similarity scores must be >= -1."
-    assert np.all(np.round(item_to_item_similarity_matrix, 3) <= 1.), \
-        "All similarity scores must be <= 1."
-    assert np.allclose(np.diag(item_to_item_similarity_matrix), 1.), \
-        "Diagonal elements of similarity matrix should be 1."
-
-    # Ensure the matrix is of type float64
-    if item_to_item_similarity_matrix.dtype != np.float64:
-        item_to_item_similarity_matrix = item_to_item_similarity_matrix.astype(np.float64)
-
-    # We take the absolute value to focus on the magnitude of similarity
-    abs_similarities = np.abs(item_to_item_similarity_matrix)
-
-    # Create a dictionary mapping (row, col) -> similarity value
-    coord_to_sim = {
-        (y, x): abs_similarities[y, x]
-        for y in range(abs_similarities.shape[0])
-        for x in range(abs_similarities.shape[1])
-    }
-
-    total_score = Counter()
-    edges = set()
-    vertices = set()
-
-    # Sort all pairwise similarities in descending order and form clusters
-    for (y, x), sim in sorted(coord_to_sim.items(), key=lambda kv: kv[1], reverse=True):
-        # Only consider upper or lower triangle once (x < y) and check threshold
-        if x < y and sim >= threshold:
-            # If either node hasn't been added to the graph yet, create an edge
-            if x not in vertices or y not in vertices:
-                edges.add((x, y))
-                vertices.add(x)
-                vertices.add(y)
-                total_score[x] += sim
-                total_score[y] += sim
-
-    # Assign each question index to a group index
+
+    # Collect the pairs below the diagonal that meet the threshold, one block of rows at a time in row-major order,
+    # so that a memory-mapped similarity matrix is never loaded in full. We take the absolute value to focus on the
+    # magnitude of similarity.
+    candidate_ys = []
+    candidate_xs = []
+    candidate_sims = []
+    for ys, xs, abs_sims in iter_lower_triangle_entries(item_to_item_similarity_matrix, min_abs_similarity=threshold):
+        candidate_ys.append(ys)
+        candidate_xs.append(xs)
+        candidate_sims.append(abs_sims)
+
+    candidate_ys = np.concatenate(candidate_ys)
+    candidate_xs = np.concatenate(candidate_xs)
+    candidate_sims = np.concatenate(candidate_sims)
+
+    # Go through the pairwise similarities in descending order, adding a pair as an edge of the graph if either
+    # question isn't in the graph yet. A question enters the graph with the first pair in this order that contains it,
+    # so a pair is an edge exactly when it is the first pair of one of its questions. The sort is stable so that ties
+    # stay in row-major order.
+    order = np.argsort(-candidate_sims, kind="stable")
+    candidate_ys = candidate_ys[order]
+    candidate_xs = candidate_xs[order]
+    candidate_sims = candidate_sims[order]
+    positions = np.arange(len(order))
+    question_idx_to_first_position = np.full(len(questions), len(order))
+    np.minimum.at(question_idx_to_first_position, candidate_ys, positions)
+    np.minimum.at(question_idx_to_first_position, candidate_xs, positions)
+    is_edge = (question_idx_to_first_position[candidate_ys] == positions) | \
+              (question_idx_to_first_position[candidate_xs] == positions)
+    edge_ys = candidate_ys[is_edge]
+    edge_xs = candidate_xs[is_edge]
+    edge_sims = candidate_sims[is_edge]
+
+    # The total similarity of each question's edges, added up edge by edge in the same order
+    total_score = np.zeros(len(questions), dtype=np.float64)
+    np.add.at(total_score, np.stack([edge_xs, edge_ys], axis=1).ravel(), np.repeat(edge_sims, 2))
+
+    # Assign each question index to a group index. There is at most one edge per question, since each edge brings a
+    # new question into the graph, so this is linear in the number of questions.
+    edges = set(zip(edge_xs.tolist(), edge_ys.tolist()))
     question_idx_to_group_idx = {}
     for x, y in edges:
         # If both x and y are not in any group, create a new group for them
@@ -132,24 +142,20 @@ def find_clusters_deterministic(
         if idx not in question_idx_to_group_idx:
             question_idx_to_group_idx[idx] = idx
 
+    # Group the questions by sorting them by group index, keeping the order in which they were assigned within each
+    # group
+    question_idxs = np.fromiter(question_idx_to_group_idx.keys(), dtype=int, count=len(question_idx_to_group_idx))
+    group_idxs = np.fromiter(question_idx_to_group_idx.values(), dtype=int, count=len(question_idx_to_group_idx))
+    order = np.argsort(group_idxs, kind="stable")
+    group_starts = np.flatnonzero(np.diff(group_idxs[order]))
+
     # Build HarmonyCluster objects
     clusters_to_return = []
-    all_groups = set(question_idx_to_group_idx.values())
-
-    for group_no, group_idx in enumerate(sorted(all_groups)):
-        items = []
-        item_ids = []
-        candidate_scores = {}
-
-        # Collect all questions belonging to the current group
-        for question_idx, grp in question_idx_to_group_idx.items():
-            if grp == group_idx:
-                items.append(questions[question_idx])
-                item_ids.append(question_idx)
-                candidate_scores[question_idx] = total_score.get(question_idx, 0)
+    for group_no, item_ids in enumerate(np.split(question_idxs[order], group_starts + 1)):
+        item_ids = item_ids.tolist()
 
         # The question with the highest total_score is used as the centroid
-        best_question_idx = max(candidate_scores, key=candidate_scores.get)
+        best_question_idx = item_ids[int(np.argmax(total_score[item_ids]))]
         text_description = questions[best_question_idx].question_text
 
         # Create the HarmonyCluster object
@@ -157,7 +163,7 @@ def find_clusters_deterministic(
             cluster_id=group_no,
             centroid_id=best_question_idx,
             centroid=questions[best_question_idx],
-            items=items,
+            items=[questions[question_idx] for question_idx in item_ids],
             item_ids=item_ids,
             text_description=text_description,  # This can be updated below if needed
             keywords=[],
@@ -0,0 +1,168 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import functools
+import importlib.util
+import os
+import platform
+import re
+import warnings
+from typing import TYPE_CHECKING
+
+from harmony.models import get_model_size_bytes
+from harmony.schemas.enums.embedding_backend import EmbeddingBackend
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# sentence-transformers (and PyTorch) are only imported when a model is loaded, but fail early if they are missing
+if importlib.util.find_spec("sentence_transformers") is None:
+    raise ModuleNotFoundError("No module named 'sentence_transformers'", name="sentence_transformers")
+
+
+def get_default_embedding_backend() -> EmbeddingBackend:
+    """
+    Get the embedding backend from the environment variable HARMONY_EMBEDDING_BACKEND (torch, onnx or onnx_int8, in
+    any case), defaulting to torch. An unknown value falls back to torch with a warning.
+    """
+    embedding_backend = os.getenv("HARMONY_EMBEDDING_BACKEND", "").strip().lower()
+    if embedding_backend == "":
+        return EmbeddingBackend.torch
+    try:
+        return EmbeddingBackend(embedding_backend)
+    except ValueError:
+        warnings.warn(f"Unknown HARMONY_EMBEDDING_BACKEND {os.getenv('HARMONY_EMBEDDING_BACKEND')!r}, expected one of "
+                      f"{', '.join(backend.value for backend in EmbeddingBackend)}. Using torch.")
+        return EmbeddingBackend.torch
+
+
+ONNX_QUANTISATION_CONFIGS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+@functools.lru_cache(maxsize=None)
+def get_cpu_flags() -> frozenset:
+    """
+    Get the feature flags of the CPU, from /proc/cpuinfo on Linux, or otherwise from the optional package
+    `py-cpuinfo` if it is installed. The flags are empty if neither is available.
+    """
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return frozenset(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    if importlib.util.find_spec("cpuinfo") is not None:
+        import cpuinfo
+
+        return frozenset(cpuinfo.get_cpu_info().get("flags", []))
+    return frozenset()
+
+
+def get_onnx_quantisation_config() -> str:
+    """
+    Get the ONNX Runtime dynamic quantisation configuration for this machine: arm64 on ARM, otherwise avx512_vnni or
+    avx512 if the CPU flags show that the CPU supports them, and avx2 if not or if the flags cannot be read. It can be
+    overridden with the environment variable HARMONY_ONNX_QUANTISATION_CONFIG (one of arm64, avx2, avx512 or
+    avx512_vnni).
+
+    The configuration is part of the file name of the quantised model, so a model quantised for one configuration
+    is not reused for another.
+    """
+    quantisation_config = os.getenv("HARMONY_ONNX_QUANTISATION_CONFIG", "")
+    if quantisation_config:
+        if quantisation_config.lower() in ONNX_QUANTISATION_CONFIGS:
+            return quantisation_config.lower()
+        warnings.warn(f"Unknown HARMONY_ONNX_QUANTISATION_CONFIG {quantisation_config!r}, expected one of "
+                      f"{', '.join(ONNX_QUANTISATION_CONFIGS)}. Detecting it from the CPU.")
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return "arm64"
+    cpu_flags = get_cpu_flags()
+    # /proc/cpuinfo calls it avx512_vnni and py-cpuinfo avx512vnni on some platforms
+    if "avx512_vnni" in cpu_flags or "avx512vnni" in cpu_flags:
+        return "avx512_vnni"
+    if "avx512f" in cpu_flags:
+        return "avx512"
+    return "avx2"
+
+
+def get_onnx_model_dir(sentence_transformer_path: str) -> str:
+    """
+    Get the local folder where the ONNX export of a model is stored, under HARMONY_ONNX_PATH, defaulting to
+    HOME DIRECTORY/harmony/onnx.
+    """
+    local_path = os.getenv("HARMONY_ONNX_PATH", os.path.expanduser("~") + "/harmony/onnx")
+    return os.path.join(local_path, re.sub(r"[^A-Za-z0-9_.-]+", "_", sentence_transformer_path))
+
+
+def load_sentence_transformer(sentence_transformer_path: str,
+                              backend: EmbeddingBackend = EmbeddingBackend.torch) -> "SentenceTransformer":
+    """
+    Load a sentence transformer with the given backend. The ONNX backends need the optional dependencies
+    `optimum` and `onnxruntime` (pip install harmonydata[onnx]).
+
+    For the int8 backend, the model is exported to ONNX and dynamically quantised to int8 the first time, and the
+    quantised model is stored in `get_onnx_model_dir` together with the model's tokenizer, so that later loads reuse
+    it. The tokenizer and pooling are the same as for the PyTorch model.
+
+    :param sentence_transformer_path: The name or path of the sentence transformer.
+    :param backend: torch (PyTorch), onnx (ONNX Runtime fp32) or onnx_int8 (ONNX Runtime with int8 weights).
+    :return: The sentence transformer.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = EmbeddingBackend(backend)
+    if backend == EmbeddingBackend.torch:
+        return SentenceTransformer(sentence_transformer_path)
+    if backend == EmbeddingBackend.onnx:
+        return SentenceTransformer(sentence_transformer_path, backend="onnx")
+
+    quantisation_config = get_onnx_quantisation_config()
+    model_dir = get_onnx_model_dir(sentence_transformer_path)
+    file_name = f"onnx/model_qint8_{quantisation_config}.onnx"
+    if not os.path.isfile(os.path.join(model_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        onnx_model = SentenceTransformer(sentence_transformer_path, backend="onnx")
+        onnx_model.save(model_dir)
+        export_dynamic_quantized_onnx_model(onnx_model, quantisation_config, model_dir)
+
+    return SentenceTransformer(model_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def get_sentence_transformer_size_bytes(model: "SentenceTransformer") -> int:
+    """
+    Estimate the memory taken by a sentence transformer: the size of its PyTorch weights, or for the ONNX backends,
+    whose weights are held by ONNX Runtime, the size of the ONNX model file.
+
+    :param model: The sentence transformer.
+    :return: The estimated size in bytes.
+    """
+    size = get_model_size_bytes(model)
+    if size == 0:
+        model_path = getattr(getattr(model[0], "auto_model", None), "model_path", None)
+        if model_path is not None and os.path.isfile(model_path):
+            size = os.path.getsize(model_path)
+    return size
@@ -0,0 +1,231 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable, List, Optional
+
+from numpy import ndarray
+
+from harmony.matching.quantisation import FLOAT32, check_quantisation, vector_from_bytes, vector_to_bytes
+
+re_whitespace = re.compile(r'\s+')
+
+
+def normalise_text(text: str) -> str:
+    """
+    Normalise a text for use as a cache key: Unicode NFC, with runs of whitespace collapsed and stripped.
+    """
+    return re_whitespace.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def get_cache_key(model_name: str, text: str) -> str:
+    """
+    Get the cache key for a text embedded by a model, which is a hash of the model name and the normalised text.
+    """
+    return hashlib.sha256((model_name + "\0" + normalise_text(text)).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(ABC):
+    """
+    A cache of text embeddings for one model, which can be passed to the matching functions instead of the
+    `texts_cached_vectors` dict. Like the dict, it maps texts to vectors (`text in cache`, `cache[text]`,
+    `cache.get(text)`), but the vectors are stored as float32 and the matching functions write newly computed vectors
+    back into it.
+
+    Entries are keyed by (model name, hash of the normalised text), so one store can safely hold the embeddings of
+    several models.
+
+    The vectors can optionally be stored quantised as float16 or as int8 with a per-vector scale, which takes a half
+    or a quarter of the space. They are always returned as float32.
+    """
+
+    def __init__(self, model_name: str, quantisation: str = FLOAT32):
+        check_quantisation(quantisation)
+        self.model_name = model_name
+        self.quantisation = quantisation
+
+    @abstractmethod
+    def get_many(self, texts: List[str]) -> List[Optional[ndarray]]:
+        """
+        Look up several texts at once.
+
+        :param texts: The texts.
+        :return: For each text, its vector as a float32 array, or None if it is not cached.
+        """
+
+    @abstractmethod
+    def put_many(self, texts: List[str], vectors: Iterable):
+        """
+        Store the vectors of several texts.
+
+        :param texts: The texts.
+        :param vectors: The vectors, in the same order as the texts.
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def get(self, text: str, default=None) -> Optional[List[float]]:
+        vector = self.get_many([text])[0]
+        if vector is None:
+            return default
+        return vector.tolist()
+
+    def __getitem__(self, text: str) -> List[float]:
+        vector = self.get(text)
+        if vector is None:
+            raise KeyError(text)
+        return vector
+
+    def __setitem__(self, text: str, vector):
+        self.put_many([text], [vector])
+
+    def __contains__(self, text: str) -> bool:
+        return self.get_many([text])[0] is not None
+
+    def update(self, texts_to_vectors: dict):
+        self.put_many(list(texts_to_vectors), list(texts_to_vectors.values()))
+
+
+class LruEmbeddingCache(EmbeddingCache):
+    """
+    An in-memory embedding cache which evicts the least recently used vectors when the vectors exceed a byte budget.
+    """
+
+    def __init__(self, model_name: str, max_bytes: int = 256 * 1024 * 1024, quantisation: str = FLOAT32):
+        """
+        :param model_name: The name of the model which produced the vectors.
+        :param max_bytes: The maximum number of bytes of vector data to hold.
+        :param quantisation: How to store the vectors: "float32" (the default), "float16" or "int8".
+        """
+        super().__init__(model_name, quantisation)
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self._vectors: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, texts: List[str]) -> List[Optional[ndarray]]:
+        vectors = []
+        with self._lock:
+            for text in texts:
+                key = get_cache_key(self.model_name, text)
+                data = self._vectors.get(key)
+                if data is None:
+                    vectors.append(None)
+                    continue
+                self._vectors.move_to_end(key)
+                vectors.append(vector_from_bytes(data, self.quantisation))
+        return vectors
+
+    def put_many(self, texts: List[str], vectors: Iterable):
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                key = get_cache_key(self.model_name, text)
+                data = vector_to_bytes(vector, self.quantisation)
+                if len(data) > self.max_bytes:
+                    continue
+                if key in self._vectors:
+                    self.num_bytes -= len(self._vectors.pop(key))
+                self._vectors[key] = data
+                self.num_bytes += len(data)
+            while self.num_bytes > self.max_bytes:
+                _, evicted = self._vectors.popitem(last=False)
+                self.num_bytes -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+
+class SqliteEmbeddingCache(EmbeddingCache):
+    """
+    A persistent embedding cache in a SQLite database file, with the vectors stored as blobs.
+    Cache hits survive process restarts, and several processes can share the same file.
+    Each row records its own quantisation, so caches with different quantisations can share a file.
+    """
+
+    def __init__(self, model_name: str, path: str, quantisation: str = FLOAT32):
+        """
+        :param model_name: The name of the model which produced the vectors.
+        :param path: The path of the SQLite database file, which is created if it does not exist.
+        :param quantisation: How to store new vectors: "float32" (the default), "float16" or "int8".
+        """
+        super().__init__(model_name, quantisation)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model_name TEXT NOT NULL, "
+                "vector BLOB NOT NULL, quantisation TEXT NOT NULL DEFAULT 'float32')"
+            )
+            # Files written before quantisation was supported hold float32 vectors only
+            columns = [row[1] for row in self._connection.execute("PRAGMA table_info(embeddings)")]
+            if "quantisation" not in columns:
+                self._connection.execute(
+                    "ALTER TABLE embeddings ADD COLUMN quantisation TEXT NOT NULL DEFAULT 'float32'"
+                )
+
+    def get_many(self, texts: List[str]) -> List[Optional[ndarray]]:
+        keys = [get_cache_key(self.model_name, text) for text in texts]
+        key_to_vector = {}
+        # Stay below SQLite's limit on the number of parameters in one query
+        with self._lock:
+            for batch_start in range(0, len(keys), 500):
+                batch = keys[batch_start:batch_start + 500]
+                rows = self._connection.execute(
+                    f"SELECT key, vector, quantisation FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                for key, vector, quantisation in rows:
+                    key_to_vector[key] = vector_from_bytes(vector, quantisation)
+        return [key_to_vector.get(key) for key in keys]
+
+    def put_many(self, texts: List[str], vectors: Iterable):
+        rows = [
+            (get_cache_key(self.model_name, text), self.model_name, vector_to_bytes(vector, self.quantisation),
+             self.quantisation)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model_name, vector, quantisation) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM embeddings WHERE model_name = ?",
+                                            (self.model_name,)).fetchone()[0]
+
+    def close(self):
+        self._connection.close()
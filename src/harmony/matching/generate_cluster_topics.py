@@ -23,139 +23,194 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-import re
+from typing import Iterable, List
+
 import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import CountVectorizer
 
-from collections import Counter
-from typing import List
-from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.pipeline import make_pipeline
+from harmony.matching.topic_tagger import detect_language, load_lang_to_stopwords
 from harmony.schemas.responses.text import HarmonyCluster
-import pathlib
-from langdetect import detect, DetectorFactory
-import os
-DetectorFactory.seed = 0
-
 
-folder_containing_this_file = pathlib.Path(__file__).parent.resolve()
+# Words of at least two letters, lowercased
+TOKEN_PATTERN = r'(?u)\b[a-zA-Z][a-zA-Z]+\b'
 
-stopwords_folder = f"{folder_containing_this_file}/../stopwords/"
 
-stopwords_files = os.listdir(stopwords_folder)
+def __getattr__(name):
+    # The stopwords used to be read when this module was imported; they are now read once, on first use
+    if name == "lang_to_stopwords":
+        return load_lang_to_stopwords()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-lang_to_stopwords = {}
-for stopwords_file in stopwords_files:
-    with open(stopwords_folder + stopwords_file, "r", encoding="utf-8") as f:
-        lang_to_stopwords[stopwords_file] = set(f.read().splitlines())
 
-def generate_cluster_topics(
-        clusters: List[HarmonyCluster],
-        top_k_topics: int = 5,
-    ) -> List[List[str]]:
+def get_top_k_per_row(scores: csr_matrix, top_k: int) -> List[np.ndarray]:
     """
-    Generate representative keywords/topics for clusters.
+    Get the column indices of the largest stored values of each row of a sparse matrix.
 
     Parameters
     ----------
-    cluster_items : List[Question]
-        The list of questions in the cluster.
+    scores : csr_matrix
+        The matrix of scores.
 
-    top_k_topics: int
-        The number of topics to assign to each cluster.
+    top_k : int
+        The maximum number of columns to return for each row.
 
     Returns
     -------
-    List[List[str]]
-        A list of the top k keywords representing each cluster.
+    List[np.ndarray]
+        The column indices for each row, highest score first. Ties go to the lower column index.
+    """
+    top_columns = []
+    for row_idx in range(scores.shape[0]):
+        start, end = scores.indptr[row_idx], scores.indptr[row_idx + 1]
+        data = scores.data[start:end]
+        columns = scores.indices[start:end]
+        if top_k <= 0:
+            top_columns.append(columns[:0])
+            continue
+        if len(data) > top_k:
+            # Keep every entry tied with the k-th largest, so that the tie-break below does not depend on how
+            # argpartition happened to order them
+            kth_largest = data[np.argpartition(-data, top_k - 1)[top_k - 1]]
+            is_candidate = data >= kth_largest
+            data = data[is_candidate]
+            columns = columns[is_candidate]
+        order = np.lexsort((columns, -data))[:top_k]
+        top_columns.append(columns[order])
+    return top_columns
+
+
+class ClassTfidfKeywordExtractor:
+    """
+    Finds the keywords of each cluster with class-based TF-IDF (c-TF-IDF). The questions of each cluster are joined
+    into one document, and a word scores highly for a cluster if it makes up a large part of that cluster's text
+    and is rare in the text of all the clusters together:
+
+        score(word, cluster) = tf(word, cluster) * log(1 + average words per cluster / frequency of word overall)
+
+    where tf is the count of the word in the cluster divided by the number of words in the cluster. Everything is
+    computed on the sparse cluster-by-word count matrix, so memory grows with the number of distinct words in each
+    cluster rather than with the size of the vocabulary.
+    """
+
+    def __init__(self, stopwords: Iterable[str] = (), token_pattern: str = TOKEN_PATTERN):
+        """
+        Parameters
+        ----------
+        stopwords : Iterable[str]
+            Words which are never keywords. They are left out before the scores are computed.
+
+        token_pattern : str
+            The regular expression of a word, applied to the lowercased text.
+        """
+        self.stopwords = frozenset(stopwords)
+        self.token_pattern = token_pattern
+        self.vocabulary_ = np.array([], dtype=object)
+        self.scores_ = csr_matrix((0, 0))
+
+    def fit(self, cluster_texts: List[List[str]]) -> "ClassTfidfKeywordExtractor":
+        """
+        Compute the c-TF-IDF score of each word in each cluster.
+
+        Parameters
+        ----------
+        cluster_texts : List[List[str]]
+            The texts of the questions in each cluster.
+
+        Returns
+        -------
+        ClassTfidfKeywordExtractor
+            This extractor, with `vocabulary_` (the words, in column order) and `scores_` (a sparse matrix with a row
+            per cluster and a column per word) set.
+        """
+        documents = [" ".join(texts) for texts in cluster_texts]
+        vectoriser = CountVectorizer(lowercase=True, token_pattern=self.token_pattern,
+                                     stop_words=sorted(self.stopwords) or None)
+        try:
+            counts = vectoriser.fit_transform(documents).tocsr().astype(np.float64)
+        except ValueError:
+            # None of the clusters contains a word
+            self.vocabulary_ = np.array([], dtype=object)
+            self.scores_ = csr_matrix((len(documents), 0))
+            return self
+
+        words_per_cluster = np.asarray(counts.sum(axis=1)).ravel()
+        frequency_per_word = np.asarray(counts.sum(axis=0)).ravel()
+        average_words_per_cluster = words_per_cluster.sum() / len(documents)
+        idf = np.log(1 + average_words_per_cluster / frequency_per_word)
+
+        # Scale the stored counts in place: by the row's word count for tf, and by the column's idf
+        row_of_entry = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        counts.data *= idf[counts.indices] / words_per_cluster[row_of_entry]
+
+        self.vocabulary_ = vectoriser.get_feature_names_out().astype(object)
+        self.scores_ = counts
+        return self
+
+    def get_keywords(self, top_k: int = 5) -> List[List[str]]:
+        """
+        Get the highest scoring words of each cluster. Only words which occur in a cluster can be its keywords.
+
+        Parameters
+        ----------
+        top_k : int
+            The maximum number of keywords for each cluster.
+
+        Returns
+        -------
+        List[List[str]]
+            The keywords of each cluster, best first.
+        """
+        return [self.vocabulary_[columns].tolist() for columns in get_top_k_per_row(self.scores_, top_k)]
+
+
+def get_stopwords_of_texts(texts: Iterable[str]) -> set:
+    """
+    Get the union of the stopwords of every language which is detected in the texts.
+
+    Parameters
+    ----------
+    texts : Iterable[str]
+        The texts.
+
+    Returns
+    -------
+    set
+        The stopwords.
     """
-    # tokenise and count tokens
-    re_tokenise = re.compile(r'(?i)([a-z][a-z]+)')
-    token_counter = Counter()
-    for cluster in clusters:
-        tokens_in_cluster = set()
-        for item in cluster.items:
-            tokens = re_tokenise.findall(item.question_text.lower())
-            for token in tokens:
-                tokens_in_cluster.add(token)
-
-        for token in tokens_in_cluster:
-            token_counter[token] += 1
-
-    # find inverse document frequencies (idf) of tokens
-    num_clusters = len(clusters)
-    idf = dict()
-    for word, count in token_counter.items():
-        idf[word] = np.log(num_clusters/count)
-
-    # fit a multinomial naive bayes classifier
-    vectoriser = CountVectorizer(lowercase=True, token_pattern=r'(?u)\b[a-zA-Z][a-zA-Z]+\b')
-    transformer = TfidfTransformer()
-    nb = MultinomialNB()
-    model = make_pipeline(vectoriser, transformer, nb)
-
-    X = []
-    y = []
-    for cluster_id, cluster in enumerate(clusters):
-        for item in cluster.items:
-            X.append(item.question_text)
-            y.append(cluster_id)
-
-    model.fit(X, y)
-
-    # detect langauge of the questions
-    languages = set()
-    for cluster in clusters:
-        for item in cluster.items:
-            try:
-                lang = detect(item.question_text)
-                languages.add(lang)
-            except:
-                pass
-
-    # add the stopwords for each language
+    languages = {detect_language(text) for text in texts}
     stops = set()
+    lang_to_stopwords = load_lang_to_stopwords()
     for language in languages:
         if language in lang_to_stopwords:
             stops = stops.union(lang_to_stopwords[language])
+    return stops
 
-    # get class predictions
-    vectoriser = model.named_steps['countvectorizer']
-    transformer = model.named_steps['tfidftransformer']
-    nb = model.named_steps['multinomialnb']
-
-    fake_document = " ".join(vectoriser.vocabulary_)
-    vectorised_document = vectoriser.transform([fake_document])
-    transformed_document = transformer.transform(vectorised_document)
-
-    probas = np.zeros((transformed_document.shape[1]))
 
-    vocab_idx_to_string_lookup = [""] * transformed_document.shape[1]
-    for w, i in vectoriser.vocabulary_.items():
-        vocab_idx_to_string_lookup[i] = w
-
-    transformed_documents = np.zeros((transformed_document.shape[1], transformed_document.shape[1]))
-    for i in range(transformed_document.shape[1]):
-        transformed_documents[i, i] = transformed_document[0, i]
+def generate_cluster_topics(
+        clusters: List[HarmonyCluster],
+        top_k_topics: int = 5,
+    ) -> List[List[str]]:
+    """
+    Generate representative keywords/topics for clusters, with class-based TF-IDF (see ClassTfidfKeywordExtractor).
 
-    probas_for_vocab_and_class = nb.predict_log_proba(transformed_documents)
+    Parameters
+    ----------
+    clusters : List[HarmonyCluster]
+        The clusters.
 
-    # return the top k topics for each cluster
-    topics = []
-    for prediction_idx, label in enumerate(model.classes_):
-        probas_this_class = probas_for_vocab_and_class[:, prediction_idx]
+    top_k_topics: int
+        The number of topics to assign to each cluster.
 
-        top_vocab_idxes_this_class = np.argsort(-probas_this_class)
+    Returns
+    -------
+    List[List[str]]
+        A list of the top k keywords representing each cluster.
+    """
+    cluster_texts = [[item.question_text for item in cluster.items] for cluster in clusters]
 
-        questions_joined = ""
-        for q in clusters[prediction_idx].items:
-            questions_joined += q.question_text.lower() + " "
+    stops = get_stopwords_of_texts(text for texts in cluster_texts for text in texts)
 
-        top_topics = []
-        for ctr, j in enumerate(top_vocab_idxes_this_class[:top_k_topics]):
-            word = vocab_idx_to_string_lookup[j]
-            if word not in stops and word in questions_joined:
-                top_topics.append(word)
-        topics.append(top_topics)
+    extractor = ClassTfidfKeywordExtractor(stopwords=stops).fit(cluster_texts)
 
-    return topics
+    return extractor.get_keywords(top_k_topics)
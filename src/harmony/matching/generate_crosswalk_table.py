@@ -24,68 +24,73 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import operator
 from typing import List
 
 import numpy as np
 import pandas as pd
 
+from harmony.matching.similarity_matrix import get_validated_similarity_matrix, iter_lower_triangle_entries
 from harmony.schemas.requests.text import Instrument
 
 
 def generate_crosswalk_table(instruments: List[Instrument], item_to_item_similarity_matrix: np.ndarray,
                              threshold: float = None, is_allow_within_instrument_matches=False,
-                             is_enforce_one_to_one: bool = False) -> pd.DataFrame:
+                             is_enforce_one_to_one: bool = False, validate: bool = True) -> pd.DataFrame:
     """
     Generate a crosswalk table for a list of instruments, given the similarity matrix that came out of the match function. A crosswalk is a list of pairs of variables from different studies that can be harmonised.
     @param instruments: The original list of instruments, each containing a question. The sum of the number of questions in all instruments is the total number of questions which should equal both the width and height of the similarity matrix.
-    @param item_to_item_similarity_matrix: The cosine similarity matrix from Harmony
+    @param item_to_item_similarity_matrix: The cosine similarity matrix from Harmony. This can be a memory-mapped array, which is read one block of rows at a time, or a scipy.sparse matrix, in which case only the stored pairs are considered.
     @param threshold: The minimum threshold that we consider a match. This is applied to the absolute match value. So if a question pair has similarity 0.2 and threshold = 0.5, then that question pair will be excluded. Leave as None if you don't want to apply any thresholding.
     @param is_allow_within_instrument_matches: Defaults to False. If this is set to True, we include crosswalk items that originate from the same instrument, which would otherwise be excluded by default.
     @param is_enforce_one_to_one: Defaults to False.  If this is set to True, we force all variables in the crosswalk table to be matched with exactly one other variable.
+    @param validate: Defaults to True. Set to False to skip checking the similarity matrix when it is known to be valid. A ValidatedSimilarityMatrix is never checked again.
     @return: A crosswalk table as a DataFrame.
     """
 
-    # assert that the similarity matrix is square
-    assert item_to_item_similarity_matrix.shape[0] == item_to_item_similarity_matrix.shape[1]
-
-    # assert that the similarity matrix is symmetric
-    assert np.allclose(item_to_item_similarity_matrix, item_to_item_similarity_matrix.T)
-
-    # assert that the similarity matrix is -1 <= x <= 1
-    assert np.all(np.round(item_to_item_similarity_matrix, 3) >= -1.)
-    assert np.all(np.round(item_to_item_similarity_matrix, 3) <= 1.)
-
-    # assert that the similarity matrix has 1s on its diagonals
-    assert np.allclose(np.diag(item_to_item_similarity_matrix), 1.)
-
-    # ensure that the entries of the similarity matrix are floats
-    if item_to_item_similarity_matrix.dtype != np.float64:
-        item_to_item_similarity_matrix = item_to_item_similarity_matrix.astype(np.float64)
-
+    item_to_item_similarity_matrix = get_validated_similarity_matrix(item_to_item_similarity_matrix, validate)
 
     matching_pairs = []
 
+    question_idx_to_instrument_idx = []
     all_questions = []
     for instrument_idx, instrument in enumerate(instruments):
         for question in instrument.questions:
             all_questions.append((instrument_idx, question))
-
-    abs_similarities_between_instruments = np.abs(item_to_item_similarity_matrix)
-
-    coord_to_sim = {}
-    for question_2_idx in range(abs_similarities_between_instruments.shape[0]):
-        for question_1_idx in range(abs_similarities_between_instruments.shape[1]):
-            if question_2_idx > question_1_idx:
-                coord_to_sim[(question_2_idx, question_1_idx)] = abs_similarities_between_instruments[
-                    question_2_idx, question_1_idx]
+            question_idx_to_instrument_idx.append(instrument_idx)
+    question_idx_to_instrument_idx = np.asarray(question_idx_to_instrument_idx, dtype=int)
+
+    # Collect the candidate pairs below the diagonal one block of rows at a time, in row-major order, so that a
+    # memory-mapped similarity matrix is never loaded in full. Pairs below the threshold, and pairs from the same
+    # instrument unless allowed, can never make it into the table so they are dropped straight away. For a sparse
+    # similarity matrix, only the stored pairs are candidates.
+    candidate_question_2_idxs = []
+    candidate_question_1_idxs = []
+    candidate_sims = []
+    for question_2_idxs, question_1_idxs, sims in iter_lower_triangle_entries(item_to_item_similarity_matrix,
+                                                                               min_abs_similarity=threshold):
+        if not is_allow_within_instrument_matches:
+            is_candidate = question_idx_to_instrument_idx[question_2_idxs] != question_idx_to_instrument_idx[
+                question_1_idxs]
+            question_2_idxs = question_2_idxs[is_candidate]
+            question_1_idxs = question_1_idxs[is_candidate]
+            sims = sims[is_candidate]
+        candidate_question_2_idxs.append(question_2_idxs)
+        candidate_question_1_idxs.append(question_1_idxs)
+        candidate_sims.append(sims)
+
+    if len(candidate_sims) > 0:
+        candidate_question_2_idxs = np.concatenate(candidate_question_2_idxs)
+        candidate_question_1_idxs = np.concatenate(candidate_question_1_idxs)
+        candidate_sims = np.concatenate(candidate_sims)
+
+    # Best matches first. The sort is stable so that ties stay in row-major order.
+    order = np.argsort(-np.asarray(candidate_sims), kind="stable")
 
     is_used_x = set()
     is_used_y = set()
-    for (question_2_idx, question_1_idx), sim in sorted(coord_to_sim.items(), key=operator.itemgetter(1), reverse=True):
-        if question_1_idx not in is_used_x and question_2_idx not in is_used_y and (
-                threshold is None or abs_similarities_between_instruments[
-            (question_2_idx, question_1_idx)] >= threshold):
+    for question_2_idx, question_1_idx in zip(np.asarray(candidate_question_2_idxs)[order].tolist(),
+                                              np.asarray(candidate_question_1_idxs)[order].tolist()):
+        if question_1_idx not in is_used_x and question_2_idx not in is_used_y:
 
             instrument_1_idx, question_1 = all_questions[question_1_idx]
             instrument_2_idx, question_2 = all_questions[question_2_idx]
@@ -93,9 +98,6 @@ def generate_crosswalk_table(instruments: List[Instrument], item_to_item_similar
             instrument_1 = instruments[instrument_1_idx]
             instrument_2 = instruments[instrument_2_idx]
 
-            if not is_allow_within_instrument_matches and instrument_1_idx == instrument_2_idx:
-                continue
-
             question_1_identifier = f"{instrument_1.instrument_name}_{question_1.question_no}"
             question_2_identifier = f"{instrument_2.instrument_name}_{question_2.question_no}"
 
@@ -105,7 +107,7 @@ def generate_crosswalk_table(instruments: List[Instrument], item_to_item_similar
                 'question1_text': question_1.question_text,
                 'question2_id': question_2_identifier,
                 'question2_text': question_2.question_text,
-                'match_score': item_to_item_similarity_matrix[question_1_idx, question_2_idx]
+                'match_score': float(item_to_item_similarity_matrix[question_1_idx, question_2_idx])
             })
 
             # best_matches.add((question_1_idx,question_2_idx))
@@ -23,13 +23,35 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
-from sentence_transformers import SentenceTransformer
+from harmony.models import model_registry
 from harmony.schemas.requests.text import Question
 from typing import List
 from sklearn.metrics.pairwise import cosine_similarity
 
-# Initialize a Sentence Transformer model
-model = SentenceTransformer("all-MiniLM-L6-v2") 
+SEMANTIC_KEYWORDS_MODEL_NAME = "all-MiniLM-L6-v2"
+
+
+def load_model():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(SEMANTIC_KEYWORDS_MODEL_NAME)
+
+
+model_registry.register(SEMANTIC_KEYWORDS_MODEL_NAME, load_model)
+
+
+def get_model():
+    """
+    Get the Sentence Transformer model from the model registry, loading it the first time it is needed.
+    """
+    return model_registry.get(SEMANTIC_KEYWORDS_MODEL_NAME)
+
+
+def __getattr__(name):
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def generate_semantic_keywords(cluster_items: List[Question], top_k: int = 5) -> List[str]:
     """
@@ -52,7 +74,7 @@ def generate_semantic_keywords(cluster_items: List[Question], top_k: int = 5) ->
         return []
 
     # Generate embeddings for all texts
-    embeddings = model.encode(texts)
+    embeddings = get_model().encode(texts)
 
     # Compute average embedding for the cluster
     cluster_embedding = embeddings.mean(axis=0, keepdims=True)
@@ -0,0 +1,233 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Callable, List, Union
+
+import numpy as np
+from scipy.sparse import issparse
+
+from harmony.matching.embedding_cache import EmbeddingCache
+from harmony.matching.instrument_to_instrument_similarity import get_instrument_similarity
+from harmony.matching.matcher import create_full_text_vectors, vectors_pos_neg, cosine_similarity, \
+    tag_questions_with_mhc, get_clusters, get_vectors_with_cache
+from harmony.matching.mhc_index import MhcIndex, get_mhc_index
+from harmony.matching.polarity_similarity import get_similarity_with_polarity_between
+from harmony.matching.response_options_similarity import ResponseOptionsSimilarity, get_response_options_similarity
+from harmony.matching.topic_tagger import TopicTagger
+from harmony.schemas.enums.clustering_algorithms import ClusteringAlgorithm
+from harmony.schemas.requests.text import Instrument, Question
+from harmony.schemas.responses.text import MatchResult
+
+
+def get_updated_instruments(instruments: List[Instrument], added_instruments: List[Instrument] = [],
+                            removed_instrument_ids: List[str] = []) -> List[Instrument]:
+    """
+    Get the instruments after an update: the instruments which were not removed, in their original order, followed by
+    the added instruments. This is the order of the instruments, and of their questions, in the updated match.
+
+    :param instruments: The instruments of the earlier match.
+    :param added_instruments: The instruments to add.
+    :param removed_instrument_ids: The IDs of the instruments to remove.
+    :return: The instruments of the updated match.
+    """
+    removed_instrument_ids = set(removed_instrument_ids)
+    return [instrument for instrument in instruments if instrument.instrument_id not in removed_instrument_ids] \
+        + list(added_instruments)
+
+
+def update_match_result_with_function(
+        match_result: MatchResult,
+        instruments: List[Instrument],
+        vectorisation_function: Callable,
+        added_instruments: List[Instrument] = [],
+        removed_instrument_ids: List[str] = [],
+        query: str = None,
+        topics: List = [],
+        mhc_questions: List = [],
+        mhc_all_metadatas: List = [],
+        mhc_embeddings: np.ndarray = np.zeros((0, 0)),
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache] = {},
+        is_negate: bool = True,
+        clustering_algorithm: ClusteringAlgorithm = ClusteringAlgorithm.affinity_propagation,
+        num_clusters_for_kmeans: int = None,
+        mhc_min_similarity: float = 0.0,
+        mhc_index: MhcIndex = None
+) -> MatchResult:
+    """
+    Add instruments to and/or remove instruments from an earlier match without redoing the whole match.
+
+    Only the questions of the added instruments are encoded and tagged with topics. Only the rows and columns of the
+    similarity matrix for the added questions are computed, and the rows and columns of the removed questions are
+    dropped. Only the instrument-to-instrument similarities of pairs involving an added instrument are computed.
+    The clusters, response options similarity and query similarity are computed again over all the questions, but
+    the response options of the earlier match are not encoded again. Only the clustering is not incremental, except
+    with sparse affinity propagation, which starts from the centroids of the earlier clusters which were kept, so it
+    converges sooner. The default, dense affinity propagation, and the other algorithms cluster all the questions
+    from scratch, so pass `clustering_algorithm="sparse_affinity_propagation"` to update large matches.
+
+    The instruments of the updated match are the instruments which were not removed, in their original order,
+    followed by the added instruments (see `get_updated_instruments`).
+
+    The `new_vectors_dict` of the updated match holds the vectors of the earlier match's `new_vectors_dict` as well
+    as the newly encoded vectors.
+
+    :param match_result: The earlier match. Its question objects are reused in the updated match.
+    :param instruments: The instruments of the earlier match, in the order they were matched.
+    :param vectorisation_function: A function to vectorise a list of texts.
+    :param added_instruments: The instruments to add.
+    :param removed_instrument_ids: The IDs of the instruments to remove.
+    :param query: The query, if any, to compute the query similarity for.
+    :param topics: The topics to tag the added questions with.
+    :param mhc_questions: The MHC questions.
+    :param mhc_all_metadatas: The MHC metadatas.
+    :param mhc_embeddings: The MHC embeddings.
+    :param texts_cached_vectors: A dictionary of already cached text vectors (text to vector), or an EmbeddingCache.
+        The vectors of the earlier match (its `new_vectors_dict`) are used as well, so the questions of the earlier
+        match are not encoded again.
+    :param is_negate: Whether the questions were negated in the earlier match.
+    :param clustering_algorithm: The clustering algorithm. Only sparse affinity propagation reuses the earlier clusters.
+    :param num_clusters_for_kmeans: The number of clusters for k-means.
+    :param mhc_min_similarity: The minimum similarity for a question to be tagged with its nearest MHC question.
+    :param mhc_index: A prebuilt MHC index.
+    :return: The updated match.
+    """
+    previous_questions = match_result.questions
+    previous_similarity = match_result.similarity_with_polarity
+    if sum(len(instrument.questions) for instrument in instruments) != len(previous_questions):
+        raise ValueError("The instruments do not match the questions of the earlier match.")
+    if issparse(previous_similarity):
+        raise ValueError("Only a match with a dense similarity matrix can be updated.")
+    previous_similarity = np.asarray(previous_similarity)
+    if len(previous_questions) > 0 and previous_similarity.shape != (len(previous_questions), len(previous_questions)):
+        raise ValueError("The similarity matrix of the earlier match does not match its questions.")
+
+    added_questions: List[Question] = []
+    for instrument in added_instruments:
+        added_questions.extend(instrument.questions)
+    for question in added_questions:
+        if question.question_text is None or question.question_text == "":
+            raise ValueError("Invalid argument: you cannot send an empty question to Harmony. Please remove all null and empty questions.")
+
+    # Which instruments and questions of the earlier match are kept
+    removed_instrument_ids = set(removed_instrument_ids)
+    updated_instruments = get_updated_instruments(instruments, added_instruments, removed_instrument_ids)
+    previous_instrument_idxs = []
+    kept_question_idxs = []
+    question_start = 0
+    for instrument_idx, instrument in enumerate(instruments):
+        if instrument.instrument_id not in removed_instrument_ids:
+            previous_instrument_idxs.append(instrument_idx)
+            kept_question_idxs.extend(range(question_start, question_start + len(instrument.questions)))
+        question_start += len(instrument.questions)
+    previous_instrument_idxs.extend([None] * len(added_instruments))
+    kept_question_idxs = np.array(kept_question_idxs, dtype=np.int64)
+    all_questions = [previous_questions[idx] for idx in kept_question_idxs] + added_questions
+    num_kept = len(kept_question_idxs)
+
+    # The vectors of the earlier match are in its new_vectors_dict or in the cache, so only the added questions
+    # are encoded
+    if not isinstance(texts_cached_vectors, EmbeddingCache):
+        texts_cached_vectors = {**(match_result.new_vectors_dict or {}), **texts_cached_vectors}
+    text_vectors, new_vectors_dict = create_full_text_vectors(
+        all_questions=[q.question_text for q in all_questions],
+        query=query,
+        vectorisation_function=vectorisation_function,
+        texts_cached_vectors=texts_cached_vectors,
+        is_negate=is_negate
+    )
+    vectors_pos, vectors_neg = vectors_pos_neg(text_vectors)
+
+    # --- ✅ Query similarity ---
+    if vectors_pos.size > 0 and query and query.strip():
+        vector_query = np.array([[x.vector for x in text_vectors if x.is_query][0]])
+        query_similarity = cosine_similarity(vectors_pos, vector_query)[:, 0]
+    else:
+        query_similarity = np.array([])
+
+    # --- ✅ Pairwise similarity with polarity: keep the block of the kept questions and compute the added rows ---
+    if len(all_questions) > 0:
+        similarity_with_polarity = np.empty((len(all_questions), len(all_questions)), dtype=np.float32)
+        if num_kept > 0:
+            similarity_with_polarity[:num_kept, :num_kept] = previous_similarity[np.ix_(kept_question_idxs,
+                                                                                        kept_question_idxs)]
+        if len(added_questions) > 0:
+            added_rows = get_similarity_with_polarity_between(vectors_pos[num_kept:], vectors_neg[num_kept:],
+                                                              vectors_pos, vectors_neg)
+            similarity_with_polarity[num_kept:] = added_rows
+            similarity_with_polarity[:num_kept, num_kept:] = added_rows[:, :num_kept].T
+    else:
+        similarity_with_polarity = np.array([])
+
+    # --- ✅ Work out similarity with MHC, for the added questions only ---
+    mhc_index = get_mhc_index(mhc_questions, mhc_all_metadatas, mhc_embeddings, mhc_index)
+    tag_questions_with_mhc(added_questions, vectors_pos[num_kept:], mhc_index, mhc_min_similarity)
+
+    # --- ✅ Instrument-to-instrument similarities, for the pairs involving an added instrument only ---
+    instrument_to_instrument_similarities = get_instrument_similarity(
+        updated_instruments, similarity_with_polarity, previous_instrument_idxs,
+        match_result.instrument_to_instrument_similarities
+    )
+
+    # --- ✅ Clustering, starting sparse affinity propagation from the centroids of the earlier clusters ---
+    previous_idx_to_idx = {int(previous_idx): idx for idx, previous_idx in enumerate(kept_question_idxs)}
+    initial_exemplars = [previous_idx_to_idx[cluster.centroid_id] for cluster in match_result.clusters or []
+                         if cluster.centroid_id in previous_idx_to_idx]
+    clusters = get_clusters(all_questions, similarity_with_polarity, vectors_pos, clustering_algorithm,
+                            num_clusters_for_kmeans, initial_exemplars)
+
+    # --- ✅ Response options similarity ---
+    # The response options are looked up in the cache like the questions, and the new ones are returned with them
+    response_options_similarity = get_response_options_similarity(
+        all_questions,
+        lambda texts: get_vectors_with_cache(texts, vectorisation_function, texts_cached_vectors, new_vectors_dict)
+    )
+    if len(response_options_similarity) == 0:
+        response_options_similarity = np.array([])
+    elif not isinstance(match_result.response_options_similarity, ResponseOptionsSimilarity):
+        response_options_similarity = response_options_similarity.to_dense()
+
+    # --- ✅ Topic tagging, for the added questions only ---
+    if topics and added_questions:
+        topic_tagger = TopicTagger(
+            topics,
+            lambda texts: get_vectors_with_cache(texts, vectorisation_function, texts_cached_vectors),
+            threshold=0.7
+        )
+        for question, question_topics in zip(added_questions, topic_tagger.tag(added_questions)):
+            question.topics = question_topics
+
+    # The vectors of the earlier match are returned as well, so that the updated match can be updated in turn
+    # without encoding its questions again
+    new_vectors_dict = {**(match_result.new_vectors_dict or {}), **new_vectors_dict}
+
+    return MatchResult(
+        questions=all_questions,
+        similarity_with_polarity=similarity_with_polarity,
+        response_options_similarity=response_options_similarity,
+        query_similarity=query_similarity,
+        new_vectors_dict=new_vectors_dict,
+        instrument_to_instrument_similarities=instrument_to_instrument_similarities,
+        clusters=clusters
+    )
@@ -1,6 +1,10 @@
 import operator
+from typing import List
 
 import numpy as np
+from scipy.sparse import issparse
+
+from harmony.matching.similarity_matrix import to_dense
 
 from harmony.schemas.responses.text import InstrumentToInstrumentSimilarity
 
@@ -31,7 +35,7 @@ def get_precision_recall_f1(item_to_item_similarity_matrix: np.ndarray) -> tuple
     return precision, recall, f1
 
 
-def get_instrument_similarity(instruments, similarity_with_polarity):
+def get_instrument_start_and_end_positions(instruments) -> tuple[list, list]:
     instrument_start_pos = []
     instrument_end_pos = []
     cur_start = 0
@@ -39,15 +43,52 @@ def get_instrument_similarity(instruments, similarity_with_polarity):
         instrument_start_pos.append(cur_start)
         instrument_end_pos.append(cur_start + len(instruments[instr_idx].questions))
         cur_start += len(instruments[instr_idx].questions)
+    return instrument_start_pos, instrument_end_pos
+
+
+def get_instrument_similarity(instruments, similarity_with_polarity, previous_instrument_idxs: list = None,
+                              previous_similarities: List[InstrumentToInstrumentSimilarity] = None):
+    """
+    Get the precision, recall and F1 between every pair of instruments.
+
+    :param instruments: The instruments, in the order of the rows of the similarity matrix.
+    :param similarity_with_polarity: The similarity with polarity matrix of all the questions.
+    :param previous_instrument_idxs: Optionally, for each instrument, its index in an earlier match, or None if it is
+        new. The similarities of pairs of instruments which were both in the earlier match are then taken from
+        `previous_similarities` instead of being computed again.
+    :param previous_similarities: The instrument-to-instrument similarities of the earlier match.
+    :return: The similarities of every pair of instruments.
+    """
+    instrument_start_pos, instrument_end_pos = get_instrument_start_and_end_positions(instruments)
+
+    previous_pair_to_similarity = {}
+    if previous_instrument_idxs is not None and previous_similarities is not None:
+        previous_pair_to_similarity = {(s.instrument_1_idx, s.instrument_2_idx): s for s in previous_similarities}
 
     instrument_to_instrument_similarities = []
 
     for i in range(len(instruments)):
         instrument_1 = instruments[i]
+        instrument_1_rows = None
         for j in range(i + 1, len(instruments)):
             instrument_2 = instruments[j]
-            item_to_item_similarity_matrix = similarity_with_polarity[instrument_start_pos[i]:instrument_end_pos[i],
-                                             instrument_start_pos[j]:instrument_end_pos[j]]
+
+            if previous_pair_to_similarity:
+                previous_similarity = previous_pair_to_similarity.get(
+                    (previous_instrument_idxs[i], previous_instrument_idxs[j]))
+                if previous_similarity is not None:
+                    instrument_to_instrument_similarities.append(
+                        previous_similarity.model_copy(update={"instrument_1_idx": i, "instrument_2_idx": j})
+                    )
+                    continue
+
+            # Read the rows of this instrument once, so that a memory-mapped matrix is only loaded one block at a time
+            if instrument_1_rows is None:
+                instrument_1_rows = similarity_with_polarity[instrument_start_pos[i]:instrument_end_pos[i]]
+                if not issparse(instrument_1_rows):
+                    instrument_1_rows = np.asarray(instrument_1_rows)
+            item_to_item_similarity_matrix = to_dense(
+                instrument_1_rows[:, instrument_start_pos[j]:instrument_end_pos[j]])
 
             precision, recall, f1 = get_precision_recall_f1(item_to_item_similarity_matrix)
 
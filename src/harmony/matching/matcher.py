@@ -24,37 +24,41 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-import heapq
 import os
-import pathlib
-import statistics
-from collections import Counter, OrderedDict
+from collections import OrderedDict
 from typing import List, Callable, Optional, Union
 
 import numpy as np
-from numpy import dot, matmul, ndarray, matrix
+from numpy import dot, ndarray
 from numpy.linalg import norm
 
 from harmony.matching.deterministic_clustering import find_clusters_deterministic
+from harmony.matching.embedding_cache import EmbeddingCache
 from harmony.matching.affinity_propagation_clustering import cluster_questions_affinity_propagation
+from harmony.matching.sparse_affinity_propagation_clustering import cluster_questions_sparse_affinity_propagation
+from harmony.matching.catalogue_index import CatalogueIndex, get_catalogue_index
 from harmony.matching.hdbscan_clustering import cluster_questions_hdbscan_from_embeddings
 from harmony.matching.instrument_to_instrument_similarity import get_instrument_similarity
-from harmony.matching.negator import negate
+from harmony.matching.mhc_index import MhcIndex, get_mhc_index
+from harmony.matching.response_options_similarity import get_response_options_similarity
+from harmony.matching.negator import negate_many
+from harmony.matching.polarity_similarity import get_similarity_with_polarity, get_sparse_similarity_with_polarity
+from harmony.matching.similarity_matrix import ValidatedSimilarityMatrix, create_similarity_memmap, \
+    validate_similarity_matrix
+from harmony.matching.topic_tagger import TopicTagger
 from harmony.schemas.catalogue_instrument import CatalogueInstrument
 from harmony.schemas.catalogue_question import CatalogueQuestion
 from harmony.schemas.requests.text import (
     Instrument,
     Question,
 )
-from harmony.schemas.responses.text import MatchResult
+from harmony.schemas.responses.text import HarmonyCluster, MatchResult
 from harmony.schemas.text_vector import TextVector
 
 from harmony.matching.kmeans_clustering import cluster_questions_kmeans_from_embeddings
 
 from harmony.schemas.enums.clustering_algorithms import ClusteringAlgorithm
-from langdetect import detect, DetectorFactory
-
-DetectorFactory.seed = 0
+from harmony.schemas.enums.similarity_output import SimilarityOutput
 
 
 # This has been tested on 16 GB RAM production server, 1000 seems a safe number (TW, 15 Dec 2024)
@@ -89,21 +93,21 @@ def process_items_in_batches(items, llm_function):
 
 def cosine_similarity(vec1: ndarray, vec2: ndarray) -> ndarray:
     dp = dot(vec1, vec2.T)
-    m1 = matrix(norm(vec1, axis=1))
-    m2 = matrix(norm(vec2.T, axis=0))
+    m1 = norm(vec1, axis=1)
+    m2 = norm(vec2, axis=1)
 
-    return np.asarray(dp / matmul(m1.T, m2))
+    return np.asarray(dp / np.outer(m1, m2))
 
 
 def add_text_to_vec(text, texts_cached_vectors, text_vectors, is_negated_, is_query_) -> list[TextVector]:
-    if text not in texts_cached_vectors:
+    vector = texts_cached_vectors.get(text)
+    if vector is None:
         text_vectors.append(
             TextVector(
                 text=text, vector=[], is_negated=is_negated_, is_query=is_query_
             )
         )
     else:
-        vector = texts_cached_vectors[text]
         text_vectors.append(
             TextVector(
                 text=text,
@@ -115,8 +119,17 @@ def add_text_to_vec(text, texts_cached_vectors, text_vectors, is_negated_, is_qu
     return text_vectors
 
 
-def process_questions(questions: list, texts_cached_vectors: dict, is_negate: bool) -> list[TextVector]:
+def process_questions(questions: list, texts_cached_vectors: Union[dict, EmbeddingCache],
+                      is_negate: bool) -> list[TextVector]:
     text_vectors: List[TextVector] = []
+
+    # Negate all the questions in one go. A negation that leaves a text unchanged gives the same text as the
+    # question, so it shares the question's vector rather than being encoded separately.
+    if is_negate:
+        non_empty_questions = [question_text for question_text in questions
+                               if question_text is not None and str(question_text).strip() != ""]
+        question_to_negated_text = dict(zip(non_empty_questions, negate_many(non_empty_questions, 'en')[0]))
+
     for question_text in questions:
         # Skip None or whitespace-only texts
         if question_text is None or str(question_text).strip() == "":
@@ -134,17 +147,84 @@ def process_questions(questions: list, texts_cached_vectors: dict, is_negate: bo
         text_vectors = add_text_to_vec(question_text, texts_cached_vectors, text_vectors, False, False)
 
         if is_negate:
-            negated_text = negate(question_text, 'en')
+            negated_text = question_to_negated_text[question_text]
         else:
             negated_text = question_text
         text_vectors = add_text_to_vec(negated_text, texts_cached_vectors, text_vectors, True, False)
 
     return text_vectors
 
+
+def get_cached_vectors(texts: List[str], texts_cached_vectors: Union[dict, EmbeddingCache]) -> list:
+    """
+    Look up several texts in the cache at once.
+
+    :param texts: The texts.
+    :param texts_cached_vectors: A dictionary of already cached text vectors (text to vector), or an EmbeddingCache.
+    :return: For each text, its cached vector as a list, or None if it is not cached.
+    """
+    if isinstance(texts_cached_vectors, EmbeddingCache):
+        vectors = texts_cached_vectors.get_many(texts)
+    else:
+        vectors = [texts_cached_vectors.get(text) for text in texts]
+
+    cached_vectors = []
+    for vector in vectors:
+        # An empty cached vector counts as not cached
+        if vector is None or len(vector) == 0:
+            cached_vectors.append(None)
+        else:
+            cached_vectors.append(vector if isinstance(vector, list) else np.asarray(vector).tolist())
+    return cached_vectors
+
+
+def vectorise_unique_texts(texts: List[str], vectorisation_function: Callable) -> dict:
+    """
+    Vectorise a list of texts, encoding each distinct text only once, in batches.
+
+    :param texts: The texts, which may contain duplicates.
+    :param vectorisation_function: A function to vectorize a list of texts.
+    :return: A dictionary of text to vector, with the vectors as returned by the vectorisation function.
+    """
+    unique_texts = list(dict.fromkeys(texts))
+    if not unique_texts:
+        return {}
+    return dict(zip(unique_texts, process_items_in_batches(unique_texts, vectorisation_function)))
+
+
+def get_vectors_with_cache(texts: List[str], vectorisation_function: Callable,
+                           texts_cached_vectors: Union[dict, EmbeddingCache],
+                           new_vectors_dict: dict = None) -> ndarray:
+    """
+    Get the vectors of several texts, looking them all up in the cache at once and encoding the distinct missing
+    texts in batches. Newly encoded vectors are stored if the cache is an EmbeddingCache.
+
+    :param texts: The texts.
+    :param vectorisation_function: A function to vectorize a list of texts.
+    :param texts_cached_vectors: A dictionary of already cached text vectors (text to vector), or an EmbeddingCache.
+    :param new_vectors_dict: If given, the newly encoded vectors are added to this dictionary (text to vector).
+    :return: A 2D array with the vector of each text.
+    """
+    cached_vectors = get_cached_vectors(texts, texts_cached_vectors)
+    new_vectors = vectorise_unique_texts([text for text, vector in zip(texts, cached_vectors) if vector is None],
+                                         vectorisation_function)
+    if new_vectors and isinstance(texts_cached_vectors, EmbeddingCache):
+        texts_cached_vectors.put_many(list(new_vectors), list(new_vectors.values()))
+    if new_vectors_dict is not None:
+        new_vectors_dict.update(new_vectors)
+    return np.array([vector if vector is not None else np.asarray(new_vectors[text])
+                     for text, vector in zip(texts, cached_vectors)], dtype=np.float64)
+
+
 def vectorise_texts(text_vectors, vectorisation_function):
-    for index, text_dict in enumerate(text_vectors):
+    texts_not_vectorised = [text_dict.text for text_dict in text_vectors if not text_dict.vector]
+    text_to_vector = {
+        text: np.asarray(vector).tolist()
+        for text, vector in vectorise_unique_texts(texts_not_vectorised, vectorisation_function).items()
+    }
+    for text_dict in text_vectors:
         if not text_dict.vector:
-            text_vectors[index].vector = vectorisation_function([text_dict.text]).tolist()[0]
+            text_dict.vector = text_to_vector[text_dict.text]
     return text_vectors
 
 
@@ -172,58 +252,68 @@ def create_full_text_vectors(
         all_questions: List[str],
         query: Optional[str],
         vectorisation_function: Callable,
-        texts_cached_vectors: dict[str, list[float]],
+        texts_cached_vectors: Union[dict[str, list[float]], EmbeddingCache],
         is_negate: bool
 ) -> tuple[List[TextVector], dict]:
     """
     Create full text vectors.
+    Every distinct text (question, negated question or query) is looked up in the cache and encoded at most once,
+    and the results are scattered back to all the text vectors with that text.
+    If the cache is an EmbeddingCache, the new vectors are also stored in it.
     """
 
-    # Create a list of text vectors
-    text_vectors = process_questions(all_questions, texts_cached_vectors, is_negate=is_negate)
+    # Create a list of text vectors for the questions and the query, with no vectors yet
+    text_vectors = process_questions(all_questions, {}, is_negate=is_negate)
 
     # Add query
     if query:
-        text_vectors = add_text_to_vec(query, texts_cached_vectors, text_vectors, False, True)
+        text_vectors = add_text_to_vec(query, {}, text_vectors, False, True)
+
+    # Look up every distinct text in the cache once (null and empty questions have no vector)
+    unique_texts = list(dict.fromkeys(x.text for x in text_vectors if x.vector is not None))
+    cached_vectors = get_cached_vectors(unique_texts, texts_cached_vectors)
+    text_to_vector = {text: vector for text, vector in zip(unique_texts, cached_vectors) if vector is not None}
 
     # Texts with no cached vector
-    texts_not_cached = [x.text for x in text_vectors if not x.vector]
+    texts_not_cached = [text for text, vector in zip(unique_texts, cached_vectors) if vector is None]
 
-    # Get vectors for all texts not cached
-    new_vectors_list: List = process_items_in_batches(texts_not_cached, vectorisation_function)
+    # Get vectors for all texts not cached, each encoded once
+    new_vectors_dict = vectorise_unique_texts(texts_not_cached, vectorisation_function)
 
-    # Create a dictionary with new vectors
-    new_vectors_dict = {}
-    for vector, text in zip(new_vectors_list, texts_not_cached):
-        new_vectors_dict[text] = vector
+    if isinstance(texts_cached_vectors, EmbeddingCache):
+        texts_cached_vectors.update(new_vectors_dict)
 
     # Add new vectors to all_texts
-    for index, text_dict in enumerate(text_vectors):
-        if not text_dict.vector:
-            new_vector: ndarray = new_vectors_list.pop(0)
-            text_vectors[index].vector = new_vector.tolist()
+    for text, new_vector in new_vectors_dict.items():
+        text_to_vector[text] = new_vector.tolist()
+    for text_dict in text_vectors:
+        if text_dict.vector is not None:
+            text_dict.vector = text_to_vector[text_dict.text]
 
     return text_vectors, new_vectors_dict
 
 
 def match_instruments_with_catalogue_instruments(
         instruments: List[Instrument],
-        catalogue_data: dict,
+        catalogue_data: Union[dict, CatalogueIndex],
         vectorisation_function: Callable,
-        texts_cached_vectors: dict[str, List[float]],
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache],
         is_negate: bool = True
 ) -> tuple[List[Instrument], List[CatalogueInstrument]]:
     """
     Match instruments with catalogue instruments.
 
     :param instruments: The instruments.
-    :param catalogue_data: The catalogue data.
+    :param catalogue_data: The catalogue data, or a CatalogueIndex built from it.
     :param vectorisation_function: A function to vectorize a text.
-    :param texts_cached_vectors: A dictionary of already cached vectors from texts (key is the text and value is the vector).
+    :param texts_cached_vectors: A dictionary of already cached vectors from texts (key is the text and value is the vector),
+        or an EmbeddingCache.
     :return: Index 0 in the tuple contains the list of instruments that now each contain the best instrument matches from the catalog.
         Index 1 in the tuple contains a list of closest instrument matches from the catalog for all the instruments.
     """
 
+    catalogue_index = get_catalogue_index(catalogue_data)
+
     # Gather all questions
     all_questions: List[str] = []
     for instrument in instruments:
@@ -244,7 +334,7 @@ def match_instruments_with_catalogue_instruments(
         instrument.closest_catalogue_instrument_matches = (
             match_questions_with_catalogue_instruments(
                 questions=instrument.questions,
-                catalogue_data=catalogue_data,
+                catalogue_data=catalogue_index,
                 all_instruments_text_vectors=all_instruments_text_vectors,
                 questions_are_from_one_instrument=True,
             )
@@ -256,7 +346,7 @@ def match_instruments_with_catalogue_instruments(
         all_instrument_questions.extend(instrument.questions)
     closest_catalogue_instrument_matches = match_questions_with_catalogue_instruments(
         questions=all_instrument_questions,
-        catalogue_data=catalogue_data,
+        catalogue_data=catalogue_index,
         all_instruments_text_vectors=all_instruments_text_vectors,
         questions_are_from_one_instrument=False,
     )
@@ -266,7 +356,7 @@ def match_instruments_with_catalogue_instruments(
 
 def match_questions_with_catalogue_instruments(
         questions: List[Question],
-        catalogue_data: dict,
+        catalogue_data: Union[dict, CatalogueIndex],
         all_instruments_text_vectors: List[TextVector],
         questions_are_from_one_instrument: bool,
 ) -> List[CatalogueInstrument]:
@@ -276,7 +366,7 @@ def match_questions_with_catalogue_instruments(
     The closest instrument match for all questions is returned as a result of this function.
 
     :param questions: The questions.
-    :param catalogue_data: The catalogue data.
+    :param catalogue_data: The catalogue data, or a CatalogueIndex built from it.
     :param all_instruments_text_vectors: A list of text vectors of all questions found in all the instruments uploaded.
     :param questions_are_from_one_instrument: If the questions provided are coming from one instrument only.
 
@@ -284,17 +374,12 @@ def match_questions_with_catalogue_instruments(
     """
 
     # Catalogue data
-    catalogue_instrument_idx_to_catalogue_questions_idx: List[List[int]] = catalogue_data[
-        "instrument_idx_to_question_idx"
-    ]
-    all_catalogue_questions_embeddings_concatenated: np.ndarray = catalogue_data[
-        "all_embeddings_concatenated"
-    ]
-    all_catalogue_instruments: List[dict] = catalogue_data["all_instruments"]
-    all_catalogue_questions: List[str] = catalogue_data["all_questions"]
+    catalogue_index = get_catalogue_index(catalogue_data)
+    all_catalogue_instruments: List[dict] = catalogue_index.all_instruments
+    all_catalogue_questions: List[str] = catalogue_index.all_questions
 
     # No embeddings = nothing to find
-    if len(all_catalogue_questions_embeddings_concatenated) == 0:
+    if len(catalogue_index.embeddings) == 0:
         return []
 
     # All instruments text vectors to dict
@@ -314,9 +399,7 @@ def match_questions_with_catalogue_instruments(
     # Get a 2D array of (number of input questions) x (number of questions in catalogue).
     # E.g. index 0 (matches for the first input question) will contain a list of matches for each question in the
     # catalogue. So the best match for the first input question is the highest similarity found in index 0.
-    catalogue_similarities = cosine_similarity(
-        vectors, all_catalogue_questions_embeddings_concatenated
-    )
+    catalogue_similarities = catalogue_index.cosine_similarities(vectors)
 
     # Get a 1D array of length (number of input questions).
     # For each input question, this is the index of the single closest matching question text in our catalogues.
@@ -324,66 +407,42 @@ def match_questions_with_catalogue_instruments(
     # find out which instrument(s) it occurs in.
     idxs_of_top_questions_matched_in_catalogue = np.argmax(catalogue_similarities, axis=1)
 
-    # Get a set of all the top matching question text indices in our catalogue.
-    # idxs_of_top_questions_matched_in_catalogue_set = set(idxs_of_top_questions_matched_in_catalogue)
-
-    # This keeps track of each instrument matches how many question items in the query
-    # e.g. if the first instrument in our catalogue (instrument 0) matches 4 items, then this dictionary will
-    # contain {0: 4}.
-    # instrument_idx_to_num_matching_items_with_query = {}
-
-    # This dictionary will contain the index of the instrument and the cosine similarities to the top matched questions
-    # in that instrument e.g. {50: [ ... ]}
-    instrument_idx_to_cosine_similarities_top_match: dict[int, list[float]] = {}
+    # The inverted index (catalogue question idx -> catalogue instrument idxs) in CSR form.
+    question_idx_to_instrument_idxs_indptr = catalogue_index.question_idx_to_instrument_idxs_indptr
+    question_idx_to_instrument_idxs = catalogue_index.question_idx_to_instrument_idxs
 
     # This keeps track of how many question items in total are contained in each instrument, irrespective of the
     # number of matches.
     # This is needed for stats such as precision and recall.
-    instrument_idx_to_total_num_question_items_present = {}
-
-    # Find any instruments matching
-    input_question_idx_to_matching_instruments: List[List[dict]] = []
-    for input_question_idx in range(len(questions)):
-        input_question_idx_to_matching_instruments.append([])
-    for input_question_idx in range(len(questions)):
-        top_match_catalogue_question_idx = idxs_of_top_questions_matched_in_catalogue[
-            input_question_idx
-        ]
-        for instrument_idx, question_idxs_in_this_instrument in enumerate(
-                catalogue_instrument_idx_to_catalogue_questions_idx
-        ):
-            if top_match_catalogue_question_idx in question_idxs_in_this_instrument:
-                instrument_from_catalogue = all_catalogue_instruments[instrument_idx]
-                if not any(
-                        x["instrument_name"] == instrument_from_catalogue["instrument_name"]
-                        for x in input_question_idx_to_matching_instruments[input_question_idx]
-                ):
-                    input_question_idx_to_matching_instruments[
-                        input_question_idx
-                    ].append(instrument_from_catalogue)
-
-    # For each catalogue instrument get the total number of question matches in the query
-    # For each catalogue instrument get the total number of questions
-    for instrument_idx, question_idxs_in_this_instrument in enumerate(
-            catalogue_instrument_idx_to_catalogue_questions_idx
-    ):
-        catalogue_question_idxs_in_this_instrument_set = set(
-            question_idxs_in_this_instrument
-        )
-        # instrument_idx_to_num_matching_items_with_query[instrument_idx] = len(
-        #     catalogue_question_idxs_in_this_instrument_set.intersection(
-        #         idxs_of_top_questions_matched_in_catalogue_set
-        #     )
-        # )
-        instrument_idx_to_total_num_question_items_present[instrument_idx] = len(
-            catalogue_question_idxs_in_this_instrument_set
-        )
+    instrument_idx_to_total_num_question_items_present = catalogue_index.instrument_idx_to_num_questions
+
+    # Expand each input question into one (input question, catalogue instrument) pair for every catalogue instrument
+    # which contains the input question's top match. The pairs are ordered by input question, then instrument idx.
+    pair_starts = question_idx_to_instrument_idxs_indptr[idxs_of_top_questions_matched_in_catalogue]
+    num_pairs_per_input_question = (
+            question_idx_to_instrument_idxs_indptr[idxs_of_top_questions_matched_in_catalogue + 1] - pair_starts
+    )
+    input_question_idx_to_pairs_indptr = np.concatenate(([0], np.cumsum(num_pairs_per_input_question)))
+    pair_input_question_idxs = np.repeat(np.arange(num_input_questions), num_pairs_per_input_question)
+    pair_instrument_idxs = question_idx_to_instrument_idxs[
+        np.arange(input_question_idx_to_pairs_indptr[-1])
+        + np.repeat(pair_starts - input_question_idx_to_pairs_indptr[:-1], num_pairs_per_input_question)
+    ]
+    pair_cosine_similarities = catalogue_similarities[
+        pair_input_question_idxs, idxs_of_top_questions_matched_in_catalogue[pair_input_question_idxs]
+    ]
 
     # Question similarity with catalogue questions
     for idx, question in enumerate(questions):
         seen_in_instruments: List[CatalogueInstrument] = []
-        for instrument in input_question_idx_to_matching_instruments[idx]:
+        seen_instrument_names = set()
+        for instrument_idx in pair_instrument_idxs[
+                               input_question_idx_to_pairs_indptr[idx]:input_question_idx_to_pairs_indptr[idx + 1]]:
+            instrument = all_catalogue_instruments[instrument_idx]
             instrument_name = instrument["instrument_name"]
+            if instrument_name in seen_instrument_names:
+                continue
+            seen_instrument_names.add(instrument_name)
             instrument_url = instrument["metadata"].get("url", "")
             source = instrument["metadata"]["source"].upper()
             sweep = instrument["metadata"].get("sweep_id", "")
@@ -401,74 +460,47 @@ def match_questions_with_catalogue_instruments(
             seen_in_instruments=seen_in_instruments,
         )
 
-    # Instrument index to list of cosine similarities top question match
-    for input_question_idx, idx_top_input_question_match_in_catalogue in enumerate(
-            idxs_of_top_questions_matched_in_catalogue
-    ):
-        for (
-                catalogue_instrument_idx,
-                catalogue_question_idxs_in_this_instrument,
-        ) in enumerate(catalogue_instrument_idx_to_catalogue_questions_idx):
-            catalogue_question_idxs_set = set(
-                catalogue_question_idxs_in_this_instrument
-            )
-            if idx_top_input_question_match_in_catalogue in catalogue_question_idxs_set:
-                # Create the list if it doesn't exist yet
-                if not instrument_idx_to_cosine_similarities_top_match.get(
-                        catalogue_instrument_idx
-                ):
-                    instrument_idx_to_cosine_similarities_top_match[
-                        catalogue_instrument_idx
-                    ] = []
-
-                # Add the cosine similarity
-                instrument_idx_to_cosine_similarities_top_match[
-                    catalogue_instrument_idx
-                ].append(
-                    catalogue_similarities[input_question_idx][
-                        idx_top_input_question_match_in_catalogue
-                    ]
-                )
-
-    # Keep track of the instrument id and the count of top question matches that belong to it
-    instrument_idx_to_top_matches_ct = {
-        k: len(v) for k, v in instrument_idx_to_cosine_similarities_top_match.items()
-    }
-
-    # Calculate the average for each list of cosine similarities from instruments
-    instrument_idx_to_cosine_similarities_average: dict[int, float] = {}
-    for (
-            instrument_idx,
-            cosine_similarities,
-    ) in instrument_idx_to_cosine_similarities_top_match.items():
-        instrument_idx_to_cosine_similarities_average[instrument_idx] = (
-            statistics.mean(cosine_similarities)
-        )
-
-    instrument_idx_to_score = {}
-    for instrument_idx, average_sim in instrument_idx_to_cosine_similarities_average.items():
-        score = average_sim * (0.1 + instrument_idx_to_top_matches_ct.get(instrument_idx, 0))
-        instrument_idx_to_score[instrument_idx] = score
+    # Segment reductions over the pairs: for each catalogue instrument, the number of input questions whose top match
+    # it contains, and the mean cosine similarity of those top matches.
+    instrument_idx_to_top_matches_ct = np.bincount(pair_instrument_idxs, minlength=len(all_catalogue_instruments))
+    instrument_idx_to_cosine_similarities_sum = np.bincount(
+        pair_instrument_idxs, weights=pair_cosine_similarities, minlength=len(all_catalogue_instruments)
+    )
+    matched_instrument_idxs, first_pair_idx_per_matched_instrument = np.unique(pair_instrument_idxs,
+                                                                               return_index=True)
+    instrument_idx_to_cosine_similarities_average = (
+            instrument_idx_to_cosine_similarities_sum[matched_instrument_idxs]
+            / instrument_idx_to_top_matches_ct[matched_instrument_idxs]
+    )
+    matched_instrument_scores = instrument_idx_to_cosine_similarities_average * (
+            0.1 + instrument_idx_to_top_matches_ct[matched_instrument_idxs]
+    )
 
-    # Find the top 10 best instrument idx matches, index 0 containing the best match etc.
-    top_n_catalogue_instrument_idxs = sorted(
-        instrument_idx_to_score,
-        key=instrument_idx_to_score.get,
-        reverse=True
-    )[:200]
+    # Find the top 200 best instrument idx matches, index 0 containing the best match etc.
+    # Only the top candidates are partially sorted; ties are broken by the order in which the instruments were matched.
+    num_top_instruments = min(200, len(matched_instrument_idxs))
+    if num_top_instruments < len(matched_instrument_idxs):
+        candidates = np.argpartition(-matched_instrument_scores, num_top_instruments - 1)[:num_top_instruments]
+    else:
+        candidates = np.arange(len(matched_instrument_idxs))
+    candidates = candidates[np.lexsort((first_pair_idx_per_matched_instrument[candidates],
+                                        -matched_instrument_scores[candidates]))]
+    top_n_catalogue_instrument_idxs = matched_instrument_idxs[candidates]
+    top_n_cosine_similarities_average = instrument_idx_to_cosine_similarities_average[candidates]
 
     # Create a list of CatalogueInstrument for each top instrument
     top_instruments: List[CatalogueInstrument] = []
-    for top_catalogue_instrument_idx in top_n_catalogue_instrument_idxs:
+    for top_catalogue_instrument_idx, mean_cosine_similarity in zip(top_n_catalogue_instrument_idxs,
+                                                                    top_n_cosine_similarities_average):
         top_catalogue_instrument = all_catalogue_instruments[top_catalogue_instrument_idx]
-        num_questions_in_ref_instrument = (
+        num_questions_in_ref_instrument = int(
             instrument_idx_to_total_num_question_items_present[
                 top_catalogue_instrument_idx
             ]
         )
-        num_top_match_questions = instrument_idx_to_top_matches_ct[
+        num_top_match_questions = int(instrument_idx_to_top_matches_ct[
             top_catalogue_instrument_idx
-        ]
+        ])
 
         instrument_name = top_catalogue_instrument["instrument_name"]
         instrument_url = top_catalogue_instrument["metadata"].get("url", "")
@@ -497,8 +529,7 @@ def match_questions_with_catalogue_instruments(
                 "info": info,
                 "num_matched_questions": num_top_match_questions,
                 "num_ref_instrument_questions": num_questions_in_ref_instrument,
-                "mean_cosine_similarity": instrument_idx_to_cosine_similarities_average.get(
-                    top_catalogue_instrument_idx)
+                "mean_cosine_similarity": float(mean_cosine_similarity)
             },
         ))
 
@@ -507,20 +538,24 @@ def match_questions_with_catalogue_instruments(
 
 def match_query_with_catalogue_instruments(
         query: str,
-        catalogue_data: dict,
+        catalogue_data: Union[dict, CatalogueIndex],
         vectorisation_function: Callable,
-        texts_cached_vectors: dict[str, List[float]],
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache],
         max_results: int = 100,
-        is_negate: bool = True
+        is_negate: bool = True,
+        n_probe: Optional[int] = None
 ) -> dict[str, Union[list, dict]]:
     """
     Match query with catalogue instruments.
 
     :param query: The query.
-    :param catalogue_data: The catalogue data.
+    :param catalogue_data: The catalogue data, or a CatalogueIndex built from it.
     :param vectorisation_function: A function to vectorize a text.
-    :param texts_cached_vectors: A dictionary of already cached text vectors (text to vector).
+    :param texts_cached_vectors: A dictionary of already cached text vectors (text to vector), or an EmbeddingCache.
     :param max_results: The max amount of instruments to return.
+    :param n_probe: If the catalogue index has an approximate nearest neighbour index (see
+        CatalogueIndex.build_ann_index), the number of IVF lists to search. Higher values give better recall but are
+        slower. Leave as None for an exact search of the whole catalogue.
     :return: A dict containing the list of instruments (up to 100) and the new text vectors.
         E.g. {"instruments": [...], "new_text_vectors": {...}}.
     """
@@ -528,16 +563,11 @@ def match_query_with_catalogue_instruments(
     response = {"instruments": [], "new_text_vectors": {}}
 
     # Catalogue data
-    catalogue_instrument_idx_to_catalogue_questions_idx: List[List[int]] = (
-        catalogue_data["instrument_idx_to_question_idx"]
-    )
-    all_catalogue_questions_embeddings_concatenated: np.ndarray = catalogue_data[
-        "all_embeddings_concatenated"
-    ]
-    all_catalogue_instruments: List[dict] = catalogue_data["all_instruments"]
+    catalogue_index = get_catalogue_index(catalogue_data)
+    all_catalogue_instruments: List[dict] = catalogue_index.all_instruments
 
     # No embeddings = nothing to find
-    if len(all_catalogue_questions_embeddings_concatenated) == 0:
+    if len(catalogue_index.embeddings) == 0:
         return response
 
     # Text vectors
@@ -552,44 +582,31 @@ def match_query_with_catalogue_instruments(
     # Get an array of dimensions
     vectors = np.array([text_vectors[0].vector])
 
-    # Get a 2D array of 1 x (number of questions in catalogue)
-    catalogue_similarities = cosine_similarity(
-        vectors, all_catalogue_questions_embeddings_concatenated
-    )
-
-    # Get the catalogue questions similarities for the query
-    catalogue_questions_similarities_for_query = catalogue_similarities[0].tolist()
-
     # Get indexes of top matching questions in the catalogue
     # The first index contains the best match
-    top_catalogue_questions_matches_idxs = [
-        catalogue_questions_similarities_for_query.index(i)
-        for i in heapq.nlargest(max_results, catalogue_questions_similarities_for_query)
-    ]
+    top_catalogue_questions_matches_idxs = catalogue_index.search(vectors, max_results, n_probe=n_probe)[0][0]
 
     # A dict of matching instruments
     # The key is the name of the instrument and the value is the instrument
     instrument_matches: OrderedDict[str, Instrument] = OrderedDict()
 
-    # Find the matching instruments by looking for the instrument of the top catalogue questions matches indexes
+    # Find the matching instruments by looking up the instruments of the top catalogue questions matches indexes
     # Loop through indexes of top matched catalogue question
     for top_catalogue_question_match_idx in top_catalogue_questions_matches_idxs:
-        # Loop through instrument index with its question indexes
-        for catalogue_instrument_idx, catalogue_instrument_questions_idxs in enumerate(
-                catalogue_instrument_idx_to_catalogue_questions_idx
+        # Loop through the instruments containing the top matched catalogue question
+        for catalogue_instrument_idx in catalogue_index.get_instrument_idxs_for_question(
+                top_catalogue_question_match_idx
         ):
-            # Check if the index of the top matched catalogue question is in the catalogue instrument's question indexes
-            if top_catalogue_question_match_idx in catalogue_instrument_questions_idxs:
-                catalogue_instrument = all_catalogue_instruments[
-                    catalogue_instrument_idx
-                ]
-
-                # Add the instrument to the dict if it wasn't already added
-                instrument_name = catalogue_instrument["instrument_name"]
-                if instrument_name not in instrument_matches:
-                    instrument_matches[instrument_name] = Instrument.model_validate(
-                        catalogue_instrument
-                    )
+            catalogue_instrument = all_catalogue_instruments[
+                catalogue_instrument_idx
+            ]
+
+            # Add the instrument to the dict if it wasn't already added
+            instrument_name = catalogue_instrument["instrument_name"]
+            if instrument_name not in instrument_matches:
+                instrument_matches[instrument_name] = Instrument.model_validate(
+                    catalogue_instrument
+                )
 
     response["instruments"] = [x for x in instrument_matches.values()]
     response["new_text_vectors"] = new_text_vectors
@@ -597,6 +614,85 @@ def match_query_with_catalogue_instruments(
     return response
 
 
+def tag_questions_with_mhc(questions: List[Question], vectors_pos: np.ndarray, mhc_index: Optional[MhcIndex],
+                           mhc_min_similarity: float = 0.0):
+    """
+    Tag each question with its nearest Mental Health Catalogue (MHC) question and that question's topic, and each
+    instrument with the topics most of its questions' nearest MHC questions have in common.
+
+    :param questions: The questions, which are updated in place.
+    :param vectors_pos: The question vectors, one per row.
+    :param mhc_index: The MHC index, or None if there is no MHC data.
+    :param mhc_min_similarity: Questions whose nearest MHC question is less similar than this are not tagged.
+    """
+    if vectors_pos.size == 0 or mhc_index is None or len(mhc_index) == 0:
+        for question in questions:
+            question.topics_auto = []
+        return
+
+    mhc_item_idxs, strengths_of_match = mhc_index.get_nearest_items(vectors_pos)
+
+    # Skip questions with no valid MHC items or whose similarity is below threshold
+    mhc_item_idxs[strengths_of_match < mhc_min_similarity] = -1
+
+    for idx in np.flatnonzero(mhc_item_idxs >= 0):
+        mhc_item_idx = mhc_item_idxs[idx]
+        questions[idx].nearest_match_from_mhc_auto = mhc_index.mhc_questions[mhc_item_idx].model_dump()
+        mhc_topics = mhc_index.mhc_all_metadatas[mhc_item_idx]["topics"]
+        if len(mhc_topics) > 0:
+            questions[idx].topics_strengths = {mhc_topics[-1]: float(strengths_of_match[idx])}
+
+    # Each instrument is tagged with the topics most of its questions' nearest MHC items have in common
+    instrument_id_to_group_idx = {}
+    group_idxs = np.array([instrument_id_to_group_idx.setdefault(question.instrument_id,
+                                                                 len(instrument_id_to_group_idx))
+                           for question in questions], dtype=np.int64)
+    group_topics = mhc_index.get_group_topics(mhc_item_idxs, group_idxs, len(instrument_id_to_group_idx))
+    for question, group_idx in zip(questions, group_idxs):
+        question.topics_auto = list(group_topics[group_idx])
+
+
+def get_clusters(questions: List[Question], similarity_with_polarity, vectors_pos: np.ndarray,
+                 clustering_algorithm: ClusteringAlgorithm = ClusteringAlgorithm.affinity_propagation,
+                 num_clusters_for_kmeans: int = None, initial_exemplars: List[int] = None) -> List[HarmonyCluster]:
+    """
+    Cluster the questions with the chosen algorithm.
+
+    :param questions: The questions.
+    :param similarity_with_polarity: The similarity with polarity matrix of the questions.
+    :param vectors_pos: The question vectors, one per row.
+    :param clustering_algorithm: The clustering algorithm.
+    :param num_clusters_for_kmeans: The number of clusters for k-means. Defaults to the square root of the number
+        of questions.
+    :param initial_exemplars: The idxs of questions to start sparse affinity propagation from as exemplars.
+    :return: The clusters, or an empty list if there is nothing to cluster.
+    """
+    if similarity_with_polarity.size == 0:
+        return []  # fallback if no vectors
+
+    if clustering_algorithm in [ClusteringAlgorithm.affinity_propagation, ClusteringAlgorithm.deterministic,
+                                ClusteringAlgorithm.sparse_affinity_propagation]:
+        # Check the similarity matrix in one pass here, and mark it as checked so the clustering doesn't repeat it
+        validate_similarity_matrix(similarity_with_polarity)
+        similarity_with_polarity = ValidatedSimilarityMatrix(similarity_with_polarity)
+
+    if clustering_algorithm == ClusteringAlgorithm.affinity_propagation:
+        return cluster_questions_affinity_propagation(questions, similarity_with_polarity)
+    elif clustering_algorithm == ClusteringAlgorithm.deterministic:
+        return find_clusters_deterministic(questions, similarity_with_polarity)
+    elif clustering_algorithm == ClusteringAlgorithm.sparse_affinity_propagation:
+        return cluster_questions_sparse_affinity_propagation(questions, similarity_with_polarity,
+                                                             initial_exemplars=initial_exemplars)
+    elif clustering_algorithm == ClusteringAlgorithm.kmeans:
+        if num_clusters_for_kmeans is None:
+            num_clusters_for_kmeans = int(np.floor(np.sqrt(len(questions))))
+        return cluster_questions_kmeans_from_embeddings(questions, vectors_pos, num_clusters_for_kmeans)
+    elif clustering_algorithm == ClusteringAlgorithm.hdbscan:
+        return cluster_questions_hdbscan_from_embeddings(questions, vectors_pos)
+    else:
+        raise Exception("Invalid clustering algorithm")
+
+
 #
 def match_instruments_with_function(
         instruments: List[Instrument],
@@ -606,11 +702,17 @@ def match_instruments_with_function(
         mhc_questions: List = [],
         mhc_all_metadatas: List = [],
         mhc_embeddings: np.ndarray = np.zeros((0, 0)),
-        texts_cached_vectors: dict[str, List[float]] = {},
+        texts_cached_vectors: Union[dict[str, List[float]], EmbeddingCache] = {},
         is_negate: bool = True,
         clustering_algorithm: ClusteringAlgorithm = ClusteringAlgorithm.affinity_propagation,
         num_clusters_for_kmeans: int = None,
-        mhc_min_similarity: float = 0.0
+        mhc_min_similarity: float = 0.0,
+        similarity_memmap_path: str = None,
+        similarity_output: SimilarityOutput = SimilarityOutput.dense,
+        similarity_top_k: int = 20,
+        similarity_threshold: float = 0.5,
+        mhc_index: MhcIndex = None,
+        compact_response_options: bool = False
 ) -> MatchResult:
 
     all_questions: List[Question] = []
@@ -620,7 +722,9 @@ def match_instruments_with_function(
     for question in all_questions:
         if question.question_text is None or question.question_text == "":
             raise ValueError("Invalid argument: you cannot send an empty question to Harmony. Please remove all null and empty questions.")
-            
+
+    similarity_output = SimilarityOutput(similarity_output)
+
     text_vectors, new_vectors_dict = create_full_text_vectors(
         all_questions=[q.question_text for q in all_questions],
         query=query,
@@ -647,142 +751,59 @@ def match_instruments_with_function(
     # --- ✅ Pairwise similarity with polarity (only if valid vectors exist) ---
     if vectors_pos.size > 0:
         try:
-            pairwise_similarity = cosine_similarity(vectors_pos, vectors_pos)
-
-            # negated similarities
-            pairwise_similarity_neg1 = cosine_similarity(vectors_neg, vectors_pos)
-            pairwise_similarity_neg2 = cosine_similarity(vectors_pos, vectors_neg)
-            pairwise_similarity_neg_mean = np.mean(
-                [pairwise_similarity_neg1, pairwise_similarity_neg2], axis=0
-            )
-
-            # polarity calculation
-            similarity_difference = pairwise_similarity - pairwise_similarity_neg_mean
-            similarity_polarity = np.sign(similarity_difference)
-
-            # treat very small diffs as 0 → force polarity to +1
-            similarity_polarity[np.abs(similarity_difference) < 1e-3] = 1
-
-            similarity_max = np.max(
-                [pairwise_similarity, pairwise_similarity_neg_mean], axis=0
-            )
-            similarity_with_polarity = similarity_max * similarity_polarity
+            if similarity_output == SimilarityOutput.topk:
+                # Keep only each question's strongest neighbours in a sparse matrix, without building the dense one
+                similarity_with_polarity = get_sparse_similarity_with_polarity(vectors_pos, vectors_neg,
+                                                                               top_k=similarity_top_k)
+            elif similarity_output == SimilarityOutput.threshold:
+                similarity_with_polarity = get_sparse_similarity_with_polarity(vectors_pos, vectors_neg,
+                                                                               threshold=similarity_threshold)
+            elif similarity_memmap_path is not None:
+                # Write the matrix to a .npy file and return it as a memmap, for harmonisations too large to hold in
+                # memory. The consumers below read it one block of rows at a time.
+                similarity_with_polarity = get_similarity_with_polarity(
+                    vectors_pos, vectors_neg, out=create_similarity_memmap(len(vectors_pos), similarity_memmap_path)
+                )
+                similarity_with_polarity.flush()
+            else:
+                similarity_with_polarity = get_similarity_with_polarity(vectors_pos, vectors_neg)
         except Exception:
             similarity_with_polarity = np.array([])
     else:
         similarity_with_polarity = np.array([])
 
     # --- ✅ Work out similarity with MHC ---
-    if vectors_pos.size > 0 and len(mhc_embeddings) > 0:
-        similarities_mhc = cosine_similarity(vectors_pos, mhc_embeddings)
-        ctrs = {}
-
-        # Build mask of valid MHC questions (non-empty text)
-        valid_mhc_mask = np.array([
-            bool(mhc_questions[i].question_text and len(mhc_questions[i].question_text.strip()) >= 3)
-            for i in range(len(mhc_questions))
-        ])
-
-        for idx in range(len(all_questions)):
-            # Get similarities for this question, masking out invalid MHC items
-            masked_similarities = np.where(valid_mhc_mask, similarities_mhc[idx], -np.inf)
-            mhc_item_idx = int(np.argmax(masked_similarities))
-            strength_of_match = similarities_mhc[idx, mhc_item_idx]
-
-            # Skip if no valid MHC items or similarity is below threshold
-            if masked_similarities[mhc_item_idx] == -np.inf:
-                continue
-            if strength_of_match < mhc_min_similarity:
-                continue
-
-            question_text = mhc_questions[mhc_item_idx].question_text
-            if all_questions[idx].instrument_id not in ctrs:
-                ctrs[all_questions[idx].instrument_id] = Counter()
-            for topic in mhc_all_metadatas[mhc_item_idx]["topics"]:
-                ctrs[all_questions[idx].instrument_id][topic] += 1
-            all_questions[idx].nearest_match_from_mhc_auto = mhc_questions[mhc_item_idx].model_dump()
-            all_questions[idx].topics_strengths = {topic: float(strength_of_match)}
-
-        instrument_to_category = {}
-        for instrument_id, counts in ctrs.items():
-            instrument_to_category[instrument_id] = []
-            max_count = max(counts.values())
-            for topic, topic_count in counts.items():
-                if topic_count > max_count / 2:
-                    instrument_to_category[instrument_id].append(topic)
-
-        for question in all_questions:
-            question.topics_auto = instrument_to_category.get(question.instrument_id, [])
-    else:
-        for question in all_questions:
-            question.topics_auto = []
+    mhc_index = get_mhc_index(mhc_questions, mhc_all_metadatas, mhc_embeddings, mhc_index)
+    tag_questions_with_mhc(all_questions, vectors_pos, mhc_index, mhc_min_similarity)
 
     # --- ✅ Instrument-to-instrument similarities ---
     instrument_to_instrument_similarities = get_instrument_similarity(instruments, similarity_with_polarity)
 
     # --- ✅ Clustering ---
-    if similarity_with_polarity.size > 0:
-        if clustering_algorithm == ClusteringAlgorithm.affinity_propagation:
-            clusters = cluster_questions_affinity_propagation(all_questions, similarity_with_polarity)
-        elif clustering_algorithm == ClusteringAlgorithm.deterministic:
-            clusters = find_clusters_deterministic(all_questions, similarity_with_polarity)
-        elif clustering_algorithm == ClusteringAlgorithm.kmeans:
-            if num_clusters_for_kmeans is None:
-                num_clusters_for_kmeans = int(np.floor(np.sqrt(len(all_questions))))
-            clusters = cluster_questions_kmeans_from_embeddings(all_questions, vectors_pos, num_clusters_for_kmeans)
-        elif clustering_algorithm == ClusteringAlgorithm.hdbscan:
-            clusters = cluster_questions_hdbscan_from_embeddings(all_questions, vectors_pos)
-        else:
-            raise Exception("Invalid clustering algorithm")
-    else:
-        clusters = []  # fallback if no vectors
+    clusters = get_clusters(all_questions, similarity_with_polarity, vectors_pos, clustering_algorithm,
+                            num_clusters_for_kmeans)
 
     # --- ✅ Response options similarity ---
-    options = ["; ".join(q.options) for q in all_questions if q.options]
-    if options:
-        options_vectors = vectorisation_function(options)
-        response_options_similarity = cosine_similarity(options_vectors, options_vectors).clip(0, 1)
-    else:
+    # Each distinct normalised set of options is encoded once
+    # The response options are looked up in the cache like the questions, and the new ones are returned with them
+    response_options_similarity = get_response_options_similarity(
+        all_questions,
+        lambda texts: get_vectors_with_cache(texts, vectorisation_function, texts_cached_vectors, new_vectors_dict)
+    )
+    if len(response_options_similarity) == 0:
         response_options_similarity = np.array([])
+    elif not compact_response_options:
+        response_options_similarity = response_options_similarity.to_dense()
 
     # --- ✅ Topic tagging (only if topics and valid questions exist) ---
     if topics and all_questions:
-        assigned_topics = {idx: [] for idx in range(len(all_questions))}
-        question_topic_similarity_threshold = 0.7
-
-        folder_containing_this_file = pathlib.Path(__file__).parent.resolve()
-        stopwords_folder = f"{folder_containing_this_file}/../stopwords/"
-        lang_to_stopwords = {}
-
-        if os.path.exists(stopwords_folder):
-            for stopwords_file in os.listdir(stopwords_folder):
-                with open(os.path.join(stopwords_folder, stopwords_file), "r", encoding="utf-8") as f:
-                    lang_to_stopwords[stopwords_file] = set(f.read().splitlines())
-
-        for idx, question in enumerate(all_questions):
-            if not question.question_text or not question.question_text.strip():
-                continue
-
-            words = question.question_text.split()
-            try:
-                lang = detect(question.question_text)
-            except Exception:
-                lang = None
-
-            stopwords = lang_to_stopwords.get(lang, [])
-            words = [word for word in words if word not in stopwords]
-
-            if words:
-                question_vector = vectorisation_function(words)
-                topics_vectors = vectorisation_function(topics)
-                sim = cosine_similarity(question_vector, topics_vectors).clip(0, 1)
-
-                for j in range(sim.shape[1]):
-                    if np.any(sim[:, j] >= question_topic_similarity_threshold):
-                        assigned_topics[idx].append(topics[j])
-
-        for idx, q_topics in assigned_topics.items():
-            all_questions[idx].topics = q_topics
+        topic_tagger = TopicTagger(
+            topics,
+            lambda texts: get_vectors_with_cache(texts, vectorisation_function, texts_cached_vectors),
+            threshold=0.7
+        )
+        for question, question_topics in zip(all_questions, topic_tagger.tag(all_questions)):
+            question.topics = question_topics
 
     return MatchResult(
         questions=all_questions,
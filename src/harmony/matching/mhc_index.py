@@ -0,0 +1,147 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import List, Optional
+
+import numpy as np
+from numpy import ndarray
+from scipy.sparse import csr_matrix
+
+from harmony.matching.catalogue_index import normalise_vectors
+from harmony.schemas.requests.text import Question
+
+
+class MhcIndex:
+    """
+    A reusable index over the Mental Health Catalogue (MHC) questions used to tag input questions with topics.
+
+    It holds which MHC questions are usable (text of at least 3 characters), their embeddings L2-normalised as
+    float32 and a sparse incidence matrix from MHC question to topic, so that assigning a batch of questions to their
+    nearest MHC question is one matrix product and a masked argmax, and counting topics per instrument is a couple of
+    sparse matrix products. Build it once and pass it to `match_instruments_with_function` as `mhc_index`.
+    """
+
+    def __init__(self, mhc_questions: List[Question], mhc_all_metadatas: List[dict], mhc_embeddings: ndarray):
+        """
+        :param mhc_questions: The MHC questions.
+        :param mhc_all_metadatas: For each MHC question, a dict whose "topics" are the question's topics.
+        :param mhc_embeddings: The embeddings of the MHC questions, one per row.
+        """
+        self.mhc_questions = mhc_questions
+        self.mhc_all_metadatas = mhc_all_metadatas
+        self.embeddings = normalise_vectors(mhc_embeddings)
+
+        # Only MHC questions with some text can be matched
+        self.valid_mask = np.array([
+            bool(question.question_text and len(question.question_text.strip()) >= 3) for question in mhc_questions
+        ], dtype=bool)
+
+        # Topics are numbered in order of first appearance. The incidence matrix stores, for each (MHC question,
+        # topic), 1 + the position of the topic in the question's list of topics.
+        self.topics: List[str] = []
+        topic_to_topic_idx = {}
+        item_idxs = []
+        topic_idxs = []
+        positions = []
+        for item_idx, metadata in enumerate(mhc_all_metadatas):
+            for position, topic in enumerate(metadata["topics"]):
+                if topic not in topic_to_topic_idx:
+                    topic_to_topic_idx[topic] = len(self.topics)
+                    self.topics.append(topic)
+                item_idxs.append(item_idx)
+                topic_idxs.append(topic_to_topic_idx[topic])
+                positions.append(position + 1)
+        self.topic_positions = csr_matrix((positions, (item_idxs, topic_idxs)),
+                                          shape=(len(mhc_all_metadatas), len(self.topics)), dtype=np.int64)
+        self.topic_incidence = (self.topic_positions > 0).astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.mhc_questions)
+
+    def get_nearest_items(self, vectors: ndarray) -> tuple[ndarray, ndarray]:
+        """
+        Find the most similar usable MHC question to each vector.
+
+        :param vectors: A 2D array of vectors, one per row.
+        :return: A tuple (MHC question idxs, cosine similarities). The idx is -1 where there is no usable MHC question.
+        """
+        similarities = normalise_vectors(vectors) @ self.embeddings.T
+        similarities[:, ~self.valid_mask] = -np.inf
+        item_idxs = np.argmax(similarities, axis=1)
+        strengths = similarities[np.arange(len(similarities)), item_idxs]
+        item_idxs[np.isneginf(strengths)] = -1
+        return item_idxs, strengths
+
+    def get_group_topics(self, item_idxs: ndarray, group_idxs: ndarray, num_groups: int) -> List[List[str]]:
+        """
+        Vote on the topics of groups of questions (e.g. instruments) given each question's nearest MHC question. A
+        group gets every topic voted for by more than half as many of its questions as its most voted topic, in order
+        of first appearance.
+
+        :param item_idxs: For each question, its MHC question idx, or -1 if it was not matched.
+        :param group_idxs: For each question, the idx of its group.
+        :param num_groups: The number of groups.
+        :return: The topics of each group.
+        """
+        is_matched = item_idxs >= 0
+        question_idxs = np.flatnonzero(is_matched)
+        # (groups x questions) @ (questions x MHC questions) @ (MHC questions x topics)
+        group_to_question = csr_matrix((np.ones(len(question_idxs), dtype=np.int64),
+                                        (group_idxs[question_idxs], question_idxs)),
+                                       shape=(num_groups, len(item_idxs)))
+        question_to_item = csr_matrix((np.ones(len(question_idxs), dtype=np.int64),
+                                       (question_idxs, item_idxs[question_idxs])),
+                                      shape=(len(item_idxs), len(self.mhc_questions)))
+        group_to_question_to_item = group_to_question @ question_to_item
+        counts = (group_to_question_to_item @ self.topic_incidence).toarray()
+
+        # The order in which each group first saw each topic: by question, then by position in the MHC question's
+        # topics. Positions are < max_position, so (question idx * max_position + position) orders them.
+        max_position = int(self.topic_positions.max()) + 1 if self.topic_positions.nnz > 0 else 1
+        first_seen = np.full(counts.shape, np.iinfo(np.int64).max, dtype=np.int64)
+        matched_topics = self.topic_positions[item_idxs[question_idxs]].tocoo()
+        np.minimum.at(first_seen, (group_idxs[question_idxs][matched_topics.row], matched_topics.col),
+                      question_idxs[matched_topics.row] * max_position + matched_topics.data)
+
+        group_topics = []
+        for group_idx in range(num_groups):
+            group_counts = counts[group_idx]
+            topic_idxs = np.flatnonzero((group_counts > 0) & (group_counts > group_counts.max() / 2))
+            topic_idxs = topic_idxs[np.argsort(first_seen[group_idx, topic_idxs], kind="stable")]
+            group_topics.append([self.topics[topic_idx] for topic_idx in topic_idxs])
+        return group_topics
+
+
+def get_mhc_index(mhc_questions: List[Question], mhc_all_metadatas: List[dict], mhc_embeddings: ndarray,
+                  mhc_index: Optional[MhcIndex] = None) -> Optional[MhcIndex]:
+    """
+    Get the MHC index to use for a request: the prebuilt one if given, otherwise one built from the MHC data, or
+    None if there is no MHC data.
+    """
+    if mhc_index is not None:
+        return mhc_index
+    if len(mhc_embeddings) == 0:
+        return None
+    return MhcIndex(mhc_questions, mhc_all_metadatas, mhc_embeddings)
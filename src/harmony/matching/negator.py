@@ -25,7 +25,9 @@ SOFTWARE.
 
 '''
 
+import functools
 import re
+from typing import List
 
 re_word = re.compile(r'(?i)(\S+)')
 
@@ -36,140 +38,145 @@ def tokenise(text):
     return tokens
 
 
-def get_change_en(token_texts_lower: list) -> dict:
+# The rules for each language, compiled once at import time:
+# - "replacements": the first token found in this table is replaced, e.g. "always" -> "never", or removed ("").
+# - "insertions": if no token was replaced, this text is inserted before or after every token found in this table.
+# - "fallback": if neither applies, this operation and text is applied to the first token.
+LANGUAGE_TO_NEGATION_RULES = {
+    "en": {
+        "replacements": {
+            **dict.fromkeys(["always", "rather", "really", "very", "totally", "utterly", "absolutely", "completely",
+                             "frequently", "often", "sometimes", "generally", "usually"], "never"),
+            # Team Cheemu: handle negative contractions (eg. can't, won't, shan't)
+            "can't": "can",
+            "won't": "will",
+            "shan't": "shall",
+            **dict.fromkeys(["never", "not", "don't"], ""),
+            "cannot": "can",
+        },
+        "insertions": dict.fromkeys(["is", "are", "am", "was", "were", "has", "have", "had"], ("insert_after", "not")),
+        "fallback": ("insert_before", "never"),
+    },
+    "pt": {
+        "replacements": {
+            **dict.fromkeys(["sempre", "bastante", "realmente", "muito", "totalmente", "absolutamente",
+                             "completamente", "frequentemente", "vezes", "geralmente"], "nunca"),
+            **dict.fromkeys(["nunca", "jamais", "nem", "não"], ""),
+        },
+        "insertions": {},
+        "fallback": ("insert_before", "não"),
+    },
+    "es": {
+        "replacements": {
+            **dict.fromkeys(["siempre", "bastante", "realmente", "muy", "mucho", "totalmente", "absolutamente",
+                             "completamente", "frecuentemente", "frequentemente", "veces"], "nunca"),
+            **dict.fromkeys(["nunca", "jamás", "ni", "no"], ""),
+        },
+        "insertions": {},
+        "fallback": ("insert_before", "no"),
+    },
+    "it": {
+        "replacements": {
+            **dict.fromkeys(["sempre", "abbastanza", "realmente", "davvero", "veramente", "molto", "molta", "molti",
+                             "molte", "totalmente", "assolutamente", "completamente", "frequentemente",
+                             "qualche volta", "a volte", "ogni tanto"], "mai"),
+            **dict.fromkeys(["mai", "né", "non", "nessuno", "nulla", "niente"], ""),
+        },
+        "insertions": dict.fromkeys(["è", "sono", "ero", "erano", "avevano", "avevo", "ho avuto", "sono stato",
+                                     "sono stata", "sono stati", "siamo stati", "sono state"],
+                                    ("insert_before", "non")),
+        "fallback": ("insert_before", "non"),
+    },
+    "de": {
+        "replacements": {
+            **dict.fromkeys(["immer", "ziemlich", "wirklich", "sehr", "viel", "total", "absolut", "vollständig",
+                             "häufig", "manchmal"], "nie"),
+            **dict.fromkeys(["nie", "niemals", "weder", "nicht"], ""),
+        },
+        "insertions": {},
+        "fallback": ("insert_before", "nicht"),
+    },
+    # if we had time: add functionality to handle german word order using Spacy
+    "fr": {
+        "replacements": {
+            **dict.fromkeys(["toujours", "assez", "vraiment", "très", "beaucoup de", "totalement", "absolumment",
+                             "complètement", "plus", "trop de", "plein de", "souvent", "de temps en temps"], "nie"),
+            **dict.fromkeys(["personne", "jamais", "ni", "rien", "pas", "non", "ne", "n'", "nulle", "aucun",
+                             "aucune", "guère"], ""),
+        },
+        "insertions": {},
+        "fallback": ("insert_before", "ne pas"),
+    },
+}
+
+# The maximum number of (text, language) pairs whose negation is memoised
+NEGATION_CACHE_SIZE = 65536
+
+
+def get_change(token_texts_lower: list, language: str) -> dict:
     """
-    Identify how to change an English sentence from positive to negative or vice versa.
-    :param doc:
-    :return:
+    Identify how to change a sentence from positive to negative or vice versa, using the rules of a language.
+    :param token_texts_lower: The lowercased tokens of the sentence.
+    :param language: A language code in LANGUAGE_TO_NEGATION_RULES. Other languages use the English rules.
+    :return: A dict from token idx to (operation, text).
     """
+    rules = LANGUAGE_TO_NEGATION_RULES.get(language, LANGUAGE_TO_NEGATION_RULES["en"])
+    replacements = rules["replacements"]
     for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"always", "rather", "really", "very", "totally", "utterly", "absolutely", "completely",
-                                "frequently", "often", "sometimes", "generally", "usually"}:
-            return {token_idx: ("replace", "never")}
-        # Team Cheemu: added these if statements to handle negative contractions (eg. can't, won't, shan't)
-        if token_text_lower == "can't":
-            return {token_idx: ("replace", "can")}
-        if token_text_lower == "won't":
-            return {token_idx: ("replace", "will")}
-        if token_text_lower == "shan't":
-            return {token_idx: ("replace", "shall")}
-        if token_text_lower in {"never", "not", "don't"}:
-            return {token_idx: ("replace", "")}
-        if token_text_lower in {"cannot"}:
-            return {token_idx: ("replace", "can")}
+        replacement = replacements.get(token_text_lower)
+        if replacement is not None:
+            return {token_idx: ("replace", replacement)}
+    insertions = rules["insertions"]
     result = {}
     for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"is", "are", "am", "are", "was", "were", "has", "have", "had"}:
-            result[token_idx] = "insert_after", "not"
+        insertion = insertions.get(token_text_lower)
+        if insertion is not None:
+            result[token_idx] = insertion
     if len(result) > 0:
         return result
-    #     print ("fallback", doc)
-    return {0: ("insert_before", "never")}
+    return {0: rules["fallback"]}
+
+
+def get_change_en(token_texts_lower: list) -> dict:
+    """
+    Identify how to change an English sentence from positive to negative or vice versa.
+    """
+    return get_change(token_texts_lower, "en")
 
 
 def get_change_pt(token_texts_lower: list) -> dict:
     """
     Identify how to change a Portuguese sentence from positive to negative or vice versa.
-    :param doc:
-    :return:
     """
-    for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"sempre", "bastante", "realmente", "muito", "totalmente", "totalmente", "absolutamente",
-                                "completamente",
-                                "frequentemente", "frequentemente", "vezes", "geralmente", "geralmente"}:
-            return {token_idx: ("replace", "nunca")}
-        if token_text_lower in {"nunca", "jamais", "nem", "não"}:
-            return {token_idx: ("replace", "")}
-    result = {}
-    if len(result) > 0:
-        return result
-    return {0: ("insert_before", "não")}
+    return get_change(token_texts_lower, "pt")
 
 
 def get_change_es(token_texts_lower: list) -> dict:
     """
     # Team Cheemu: Identify how to change a Spanish sentence from positive to negative or vice versa.
-    :param doc:
-    :return:
     """
-    for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"siempre", "bastante", "realmente", "muy", "mucho", "totalmente", "totalmente",
-                                "absolutamente",
-                                "completamente",
-                                "frecuentemente", "frequentemente", "veces"}:
-            return {token_idx: ("replace", "nunca")}
-        if token_text_lower in {"nunca", "jamás", "ni", "no"}:
-            return {token_idx: ("replace", "")}
-    result = {}
-    if len(result) > 0:
-        return result
-    return {0: ("insert_before", "no")}
+    return get_change(token_texts_lower, "es")
 
 
 def get_change_it(token_texts_lower: list) -> dict:
     """
     # Team Cheemu: Identify how to change an Italian sentence from positive to negative or vice versa.
-    :param doc:
-    :return:
     """
-    for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"sempre", "abbastanza", "realmente", "davvero", "veramente", "molto", "molta", "molti",
-                                "molte", "totalmente", "assolutamente",
-                                "completamente",
-                                "frequentemente", "qualche volta", "a volte", "ogni tanto"}:
-            return {token_idx: ("replace", "mai")}
-        if token_text_lower in {"mai", "né", "non", "nessuno", "nulla", "niente"}:
-            return {token_idx: ("replace", "")}
-    result = {}
-    for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"è", "sono", "ero", "erano", "avevano", "avevo", "ho avuto", "sono stato", "sono stata",
-                                "sono stati", "siamo stati", "sono state"}:
-            result[token_idx] = "insert_before", "non"
-    if len(result) > 0:
-        return result
-    return {0: ("insert_before", "non")}
+    return get_change(token_texts_lower, "it")
 
 
 def get_change_de(token_texts_lower: list) -> dict:
     """
     # Team Cheemu: Identify how to change a German sentence from positive to negative or vice versa.
-    :param doc:
-    :return:
     """
-    for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"immer", "ziemlich", "wirklich", "sehr", "viel", "total", "absolut",
-                                "vollständig",
-                                "häufig", "manchmal"}:
-            return {token_idx: ("replace", "nie")}
-        if token_text_lower in {"nie", "niemals", "weder", "nicht"}:
-            return {token_idx: ("replace", "")}
-    result = {}
-    if len(result) > 0:
-        return result
-    return {0: ("insert_before", "nicht")}
-
-
-# if we had time: add functionality to handle german word order using Spacy
+    return get_change(token_texts_lower, "de")
 
 
 def get_change_fr(token_texts_lower: list) -> dict:
     """
     # Team Cheemu: Identify how to change a French sentence from positive to negative or vice versa.
-    :param doc:
-    :return:
     """
-    for token_idx, token_text_lower in enumerate(token_texts_lower):
-        if token_text_lower in {"toujours", "assez", "vraiment", "très", "beaucoup de", "totalement", "absolumment",
-                                "complètement", "plus", "trop de", "plein de",
-                                "souvent", "de temps en temps"}:
-            return {token_idx: ("replace", "nie")}
-        if token_text_lower in {"personne", "jamais", "ni", "rien", "pas", "non", "ne", "n'", "nulle", "aucun",
-                                "aucune", "guère"}:
-            return {token_idx: ("replace", "")}
-    result = {}
-    if len(result) > 0:
-        return result
-    return {0: ("insert_before", "ne pas")}
+    return get_change(token_texts_lower, "fr")
 
 
 def negate(text: str, language: str) -> str:
@@ -181,22 +188,21 @@ def negate(text: str, language: str) -> str:
     "en" for English, "pt" for Portuguese, "es" for Spanish, "it" for Italian, "de" for German, "fr" for French.
     :return: the sentence negated
     """
+    if language not in LANGUAGE_TO_NEGATION_RULES:
+        language = "en"
+    return negate_with_rules(text, language)
+
+
+@functools.lru_cache(maxsize=NEGATION_CACHE_SIZE)
+def negate_with_rules(text: str, language: str) -> str:
+    """
+    Negate a text with the rules of a language in LANGUAGE_TO_NEGATION_RULES. The results are memoised in a bounded
+    LRU cache, since the same standard instruments are negated over and over.
+    """
     tokens = tokenise(text)
-    token_texts = [token.group() for token in tokens]
     token_texts_lower = [token.group().lower() for token in tokens]
 
-    if language == "pt":
-        changes = get_change_pt(token_texts_lower)
-    elif language == "es":
-        changes = get_change_es(token_texts_lower)
-    elif language == "it":
-        changes = get_change_it(token_texts_lower)
-    elif language == "fr":
-        changes = get_change_fr(token_texts_lower)
-    elif language == "de":
-        changes = get_change_de(token_texts_lower)
-    else:
-        changes = get_change_en(token_texts_lower)
+    changes = get_change(token_texts_lower, language)
 
     for token_idx, match in reversed(list(enumerate(tokens))):
         if token_idx in changes:
@@ -226,6 +232,20 @@ def negate(text: str, language: str) -> str:
     return text
 
 
+def negate_many(texts: List[str], language: str) -> tuple[List[str], List[bool]]:
+    """
+    Negate several texts in the same language. Repeated texts are only negated once, and all results are memoised.
+    :param texts: The texts to negate.
+    :param language: The language code, as for `negate`.
+    :return: A tuple (negated texts, is unchanged). For each text, is unchanged is True if negating it gave back the
+    same text, in which case its embedding can be reused for the negated text rather than computed again.
+    """
+    text_to_negated_text = {text: negate(text, language) for text in dict.fromkeys(texts)}
+    negated_texts = [text_to_negated_text[text] for text in texts]
+    is_unchanged = [negated_text == text for text, negated_text in zip(texts, negated_texts)]
+    return negated_texts, is_unchanged
+
+
 if __name__ == "__main__":
     text = "I never feel depressed"
     print(negate(text, "en"))
@@ -0,0 +1,270 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Iterator, Optional
+
+import numpy as np
+from numpy import ndarray
+from scipy.sparse import csr_matrix
+
+from harmony.matching.catalogue_index import normalise_vectors
+
+# Pairs whose similarity and negated similarity differ by less than this are treated as having positive polarity.
+POLARITY_TOLERANCE = 1e-3
+
+DEFAULT_TILE_SIZE = 1024
+
+DEFAULT_ROW_BLOCK_SIZE = 256
+
+
+def fill_similarity_with_polarity_tile(vectors_pos_rows: ndarray, vectors_pos_cols: ndarray,
+                                       vectors_neg_rows: ndarray, vectors_neg_cols: ndarray,
+                                       out: ndarray, neg_buffer: ndarray, difference_buffer: ndarray):
+    """
+    Write one tile of the similarity with polarity matrix into `out`, using the two buffers as scratch space.
+    All vectors must already be L2-normalised and all arrays must share the same float dtype.
+
+    :param vectors_pos_rows: The normalised question vectors for the rows of the tile.
+    :param vectors_pos_cols: The normalised question vectors for the columns of the tile.
+    :param vectors_neg_rows: The normalised negated question vectors for the rows of the tile.
+    :param vectors_neg_cols: The normalised negated question vectors for the columns of the tile.
+    :param out: The output tile, of shape (number of rows, number of columns).
+    :param neg_buffer: Scratch space of the same shape as `out`.
+    :param difference_buffer: Scratch space of the same shape as `out`.
+    """
+    # Mean of the similarity of each negated question with each question and vice versa.
+    np.matmul(vectors_neg_rows, vectors_pos_cols.T, out=neg_buffer)
+    np.matmul(vectors_pos_rows, vectors_neg_cols.T, out=difference_buffer)
+    neg_buffer += difference_buffer
+    neg_buffer *= 0.5
+
+    np.matmul(vectors_pos_rows, vectors_pos_cols.T, out=out)
+    np.subtract(out, neg_buffer, out=difference_buffer)
+
+    # The magnitude is whichever of the two similarities is larger, and the sign is negative only where the
+    # negated similarity is clearly larger.
+    np.maximum(out, neg_buffer, out=out)
+    np.negative(out, out=out, where=difference_buffer <= -POLARITY_TOLERANCE)
+
+
+def normalise_question_vectors(vectors_pos: ndarray, vectors_neg: ndarray) -> tuple[ndarray, ndarray]:
+    """
+    Normalise the question vectors and the negated question vectors to float32 unit vectors, checking that they
+    match up.
+
+    :param vectors_pos: The question vectors, one per row.
+    :param vectors_neg: The vectors of the negated questions, in the same order as `vectors_pos`.
+    :return: The normalised question vectors and the normalised negated question vectors.
+    """
+    vectors_pos = normalise_vectors(vectors_pos)
+    vectors_neg = normalise_vectors(vectors_neg)
+    if vectors_pos.shape != vectors_neg.shape:
+        raise ValueError(f"The question vectors have shape {vectors_pos.shape} but the negated question vectors have "
+                         f"shape {vectors_neg.shape}.")
+    return vectors_pos, vectors_neg
+
+
+def get_similarity_with_polarity(vectors_pos: ndarray, vectors_neg: ndarray,
+                                 tile_size: int = DEFAULT_TILE_SIZE, out: Optional[ndarray] = None) -> ndarray:
+    """
+    Compute the matrix of question similarities with polarity, where a pair of questions that is more similar once
+    one of them has been negated gets a negative score.
+
+    The vectors are normalised once and the result is built in float32 square tiles with preallocated scratch
+    buffers. The matrix is symmetric, so only the tiles on and above the diagonal are computed and the tiles below
+    it are filled in by transposing them.
+
+    :param vectors_pos: The question vectors, one per row.
+    :param vectors_neg: The vectors of the negated questions, in the same order as `vectors_pos`.
+    :param tile_size: The number of rows and columns in each tile.
+    :param out: Optional float32 array of shape (number of questions, number of questions) to write the result into.
+    :return: The similarity with polarity matrix.
+    """
+    vectors_pos, vectors_neg = normalise_question_vectors(vectors_pos, vectors_neg)
+
+    num_questions = len(vectors_pos)
+    if out is None:
+        out = np.empty((num_questions, num_questions), dtype=np.float32)
+    elif out.shape != (num_questions, num_questions):
+        raise ValueError(f"The output array must have shape {(num_questions, num_questions)}.")
+
+    tile_size = max(1, min(tile_size, num_questions))
+    neg_buffer = np.empty((tile_size, tile_size), dtype=np.float32)
+    difference_buffer = np.empty((tile_size, tile_size), dtype=np.float32)
+    tile_buffer = np.empty((tile_size, tile_size), dtype=np.float32)
+
+    for row_start in range(0, num_questions, tile_size):
+        row_end = min(row_start + tile_size, num_questions)
+        for col_start in range(row_start, num_questions, tile_size):
+            col_end = min(col_start + tile_size, num_questions)
+            tile_shape = (row_end - row_start, col_end - col_start)
+            tile = tile_buffer[:tile_shape[0], :tile_shape[1]]
+            fill_similarity_with_polarity_tile(vectors_pos[row_start:row_end], vectors_pos[col_start:col_end],
+                                               vectors_neg[row_start:row_end], vectors_neg[col_start:col_end],
+                                               tile,
+                                               neg_buffer[:tile_shape[0], :tile_shape[1]],
+                                               difference_buffer[:tile_shape[0], :tile_shape[1]])
+            out[row_start:row_end, col_start:col_end] = tile
+            if col_start != row_start:
+                out[col_start:col_end, row_start:row_end] = tile.T
+
+    return out
+
+
+def get_similarity_with_polarity_between(vectors_pos_rows: ndarray, vectors_neg_rows: ndarray,
+                                         vectors_pos_cols: ndarray, vectors_neg_cols: ndarray,
+                                         tile_size: int = DEFAULT_TILE_SIZE) -> ndarray:
+    """
+    Compute the similarities with polarity between one set of questions (the rows) and another (the columns), e.g.
+    between the questions of newly added instruments and all the questions, without computing the rest of the matrix.
+
+    :param vectors_pos_rows: The question vectors of the rows.
+    :param vectors_neg_rows: The vectors of the negated questions of the rows.
+    :param vectors_pos_cols: The question vectors of the columns.
+    :param vectors_neg_cols: The vectors of the negated questions of the columns.
+    :param tile_size: The number of columns computed at once.
+    :return: The float32 similarity with polarity matrix of shape (number of rows, number of columns).
+    """
+    vectors_pos_rows, vectors_neg_rows = normalise_question_vectors(vectors_pos_rows, vectors_neg_rows)
+    vectors_pos_cols, vectors_neg_cols = normalise_question_vectors(vectors_pos_cols, vectors_neg_cols)
+
+    num_rows = len(vectors_pos_rows)
+    num_cols = len(vectors_pos_cols)
+    out = np.empty((num_rows, num_cols), dtype=np.float32)
+
+    tile_size = max(1, min(tile_size, num_cols))
+    neg_buffer = np.empty((num_rows, tile_size), dtype=np.float32)
+    difference_buffer = np.empty((num_rows, tile_size), dtype=np.float32)
+
+    for col_start in range(0, num_cols, tile_size):
+        col_end = min(col_start + tile_size, num_cols)
+        fill_similarity_with_polarity_tile(vectors_pos_rows, vectors_pos_cols[col_start:col_end],
+                                           vectors_neg_rows, vectors_neg_cols[col_start:col_end],
+                                           out[:, col_start:col_end], neg_buffer[:, :col_end - col_start],
+                                           difference_buffer[:, :col_end - col_start])
+
+    return out
+
+
+def iter_similarity_with_polarity_row_blocks(vectors_pos: ndarray, vectors_neg: ndarray,
+                                             block_size: int = DEFAULT_ROW_BLOCK_SIZE,
+                                             tile_size: int = DEFAULT_TILE_SIZE) -> Iterator[tuple[int, int, ndarray]]:
+    """
+    Compute the similarity with polarity matrix one block of rows at a time, so that only a block of rows is ever in
+    memory. The block buffer is reused, so each block must be consumed before the next one is requested.
+
+    :param vectors_pos: The question vectors, one per row.
+    :param vectors_neg: The vectors of the negated questions, in the same order as `vectors_pos`.
+    :param block_size: The number of rows in each block.
+    :param tile_size: The number of columns computed at once within a block.
+    :return: An iterator of (start row, end row, float32 block of rows of the matrix).
+    """
+    vectors_pos, vectors_neg = normalise_question_vectors(vectors_pos, vectors_neg)
+
+    num_questions = len(vectors_pos)
+    block_size = max(1, min(block_size, num_questions))
+    tile_size = max(1, min(tile_size, num_questions))
+    block_buffer = np.empty((block_size, num_questions), dtype=np.float32)
+    neg_buffer = np.empty((block_size, tile_size), dtype=np.float32)
+    difference_buffer = np.empty((block_size, tile_size), dtype=np.float32)
+    tile_buffer = np.empty((block_size, tile_size), dtype=np.float32)
+
+    for row_start in range(0, num_questions, block_size):
+        row_end = min(row_start + block_size, num_questions)
+        num_rows = row_end - row_start
+        for col_start in range(0, num_questions, tile_size):
+            col_end = min(col_start + tile_size, num_questions)
+            num_cols = col_end - col_start
+            tile = tile_buffer[:num_rows, :num_cols]
+            fill_similarity_with_polarity_tile(vectors_pos[row_start:row_end], vectors_pos[col_start:col_end],
+                                               vectors_neg[row_start:row_end], vectors_neg[col_start:col_end],
+                                               tile, neg_buffer[:num_rows, :num_cols],
+                                               difference_buffer[:num_rows, :num_cols])
+            block_buffer[:num_rows, col_start:col_end] = tile
+        yield row_start, row_end, block_buffer[:num_rows]
+
+
+def get_sparse_similarity_with_polarity(vectors_pos: ndarray, vectors_neg: ndarray, top_k: Optional[int] = None,
+                                        threshold: Optional[float] = None,
+                                        block_size: int = DEFAULT_ROW_BLOCK_SIZE) -> csr_matrix:
+    """
+    Compute a sparse similarity with polarity matrix, keeping only each question's `top_k` strongest neighbours
+    and/or the pairs whose absolute similarity is at least `threshold`. The dense matrix is never built: it is
+    computed one block of rows at a time and only the kept entries are stored, so memory is O(N * k) rather than
+    O(N^2).
+
+    Neighbours are ranked by absolute similarity, so strongly negative (opposite polarity) matches count as strong.
+    The diagonal is always kept, and the result is made symmetric by keeping a pair if either question selected the
+    other. Entries that are not stored should be read as "not a match".
+
+    :param vectors_pos: The question vectors, one per row.
+    :param vectors_neg: The vectors of the negated questions, in the same order as `vectors_pos`.
+    :param top_k: The number of neighbours to keep per question, including the question itself.
+    :param threshold: The minimum absolute similarity of a pair to keep.
+    :param block_size: The number of rows computed at once.
+    :return: A symmetric float32 CSR matrix of shape (number of questions, number of questions).
+    """
+    if top_k is None and threshold is None:
+        raise ValueError("Either top_k or threshold must be given.")
+
+    num_questions = len(vectors_pos)
+    row_idxs = [np.arange(num_questions)]
+    col_idxs = [np.arange(num_questions)]
+    values = [np.ones(num_questions, dtype=np.float32)]
+    for start, end, block in iter_similarity_with_polarity_row_blocks(vectors_pos, vectors_neg, block_size):
+        abs_block = np.abs(block)
+        is_kept = np.zeros(block.shape, dtype=bool)
+        if top_k is not None and top_k > 0:
+            k = min(top_k, num_questions)
+            top_k_idxs = np.argpartition(-abs_block, k - 1, axis=1)[:, :k]
+            np.put_along_axis(is_kept, top_k_idxs, True, axis=1)
+        if threshold is not None:
+            is_kept |= abs_block >= threshold
+        block_row_idxs, block_col_idxs = np.nonzero(is_kept)
+        values.append(block[block_row_idxs, block_col_idxs])
+        row_idxs.append(block_row_idxs + start)
+        col_idxs.append(block_col_idxs)
+
+    row_idxs = np.concatenate(row_idxs)
+    col_idxs = np.concatenate(col_idxs)
+    values = np.concatenate(values)
+
+    # Symmetrise: keep each unordered pair once, taking the first value found for it, then mirror it.
+    lower_idxs = np.minimum(row_idxs, col_idxs).astype(np.int64)
+    upper_idxs = np.maximum(row_idxs, col_idxs).astype(np.int64)
+    _, first_idxs = np.unique(lower_idxs * num_questions + upper_idxs, return_index=True)
+    lower_idxs = lower_idxs[first_idxs]
+    upper_idxs = upper_idxs[first_idxs]
+    values = values[first_idxs]
+    is_off_diagonal = lower_idxs != upper_idxs
+
+    similarity_with_polarity = csr_matrix(
+        (np.concatenate([values, values[is_off_diagonal]]),
+         (np.concatenate([lower_idxs, upper_idxs[is_off_diagonal]]),
+          np.concatenate([upper_idxs, lower_idxs[is_off_diagonal]]))),
+        shape=(num_questions, num_questions), dtype=np.float32
+    )
+    similarity_with_polarity.sort_indices()
+    return similarity_with_polarity
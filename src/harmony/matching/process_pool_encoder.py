@@ -0,0 +1,169 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import functools
+import multiprocessing
+import os
+import sys
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, List, Optional
+
+import numpy as np
+from numpy import ndarray
+
+from harmony.schemas.enums.embedding_backend import EmbeddingBackend
+
+DEFAULT_THREADS_PER_WORKER = 4
+
+DEFAULT_SHARD_SIZE = 1000
+
+# The environment variables which set the size of the thread pools of torch, ONNX Runtime and BLAS
+THREAD_ENVIRONMENT_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+# The encoding function of a worker process, set by `init_worker`
+worker_encode_function: Optional[Callable[[List[str]], ndarray]] = None
+
+
+def init_worker(encode_function: Callable[[List[str]], ndarray], threads_per_worker: int):
+    """
+    Set up a worker process: fix the number of threads it computes with, before torch is imported, and keep its
+    encoding function. The model is loaded by the encoding function the first time it is called.
+    """
+    global worker_encode_function
+    for environment_variable in THREAD_ENVIRONMENT_VARIABLES:
+        os.environ[environment_variable] = str(threads_per_worker)
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads_per_worker)
+    worker_encode_function = encode_function
+
+
+def encode_into_shared_memory(shared_memory_name: str, shape: tuple, dtype: str, start: int, texts: List[str]) -> int:
+    """
+    Encode a shard of texts in a worker process and write the vectors into rows `start` onwards of the output array
+    in shared memory, so that they do not have to be pickled back to the parent process.
+
+    :return: The number of texts encoded.
+    """
+    shared_memory = SharedMemory(name=shared_memory_name)
+    try:
+        vectors = np.ndarray(shape, dtype=dtype, buffer=shared_memory.buf)
+        vectors[start:start + len(texts)] = worker_encode_function(texts)
+        del vectors
+    finally:
+        shared_memory.close()
+    return len(texts)
+
+
+def get_vector_shape_and_dtype(texts: List[str]) -> tuple:
+    vectors = np.asarray(worker_encode_function(texts[:1]))
+    return vectors.shape[1:], vectors.dtype.str
+
+
+class ProcessPoolEncoder:
+    """
+    Encodes texts on a pool of worker processes, each with its own copy of the model and a fixed number of threads,
+    for offline jobs which encode hundreds of thousands of texts (e.g. building a catalogue) on a machine with many
+    cores, where one process with more threads scales poorly.
+
+    The texts are split into shards of `shard_size` which the workers encode in parallel, writing the vectors straight
+    into one array in shared memory. The encoder can be used wherever a `vectorisation_function` is expected:
+
+        with ProcessPoolEncoder(num_workers=8) as encoder:
+            match_result = match_instruments_with_function(instruments, None, encoder)
+    """
+
+    def __init__(self, encode_function: Optional[Callable[[List[str]], ndarray]] = None,
+                 num_workers: Optional[int] = None, threads_per_worker: int = DEFAULT_THREADS_PER_WORKER,
+                 shard_size: int = DEFAULT_SHARD_SIZE, embedding_backend: EmbeddingBackend = None,
+                 start_method: str = "spawn"):
+        """
+        :param encode_function: The function to vectorise a list of texts in a worker. It must be picklable, i.e. a
+            module-level function. Defaults to Harmony's default sentence transformer (`convert_texts_to_vector`).
+        :param num_workers: The number of worker processes. Defaults to the number of CPUs divided by
+            `threads_per_worker`.
+        :param threads_per_worker: The number of threads each worker computes with.
+        :param shard_size: The number of texts a worker encodes at a time.
+        :param embedding_backend: The embedding backend of the default sentence transformer.
+        :param start_method: How to start the workers. The default, "spawn", starts them without copying the parent
+            process, which is safe even if the parent has already loaded torch.
+        """
+        if encode_function is None:
+            from harmony.matching.default_matcher import convert_texts_to_vector
+            encode_function = functools.partial(convert_texts_to_vector, embedding_backend=embedding_backend)
+        self.threads_per_worker = max(1, threads_per_worker)
+        if num_workers is None:
+            num_workers = max(1, (os.cpu_count() or 1) // self.threads_per_worker)
+        self.num_workers = max(1, num_workers)
+        self.shard_size = max(1, shard_size)
+        self.pool = multiprocessing.get_context(start_method).Pool(
+            self.num_workers, initializer=init_worker, initargs=(encode_function, self.threads_per_worker))
+        # The shape and dtype of one vector, found by encoding one text the first time the encoder is called
+        self.vector_shape: Optional[tuple] = None
+        self.vector_dtype: Optional[str] = None
+
+    def __call__(self, texts: List[str]) -> ndarray:
+        return self.encode(texts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Stop the worker processes.
+        """
+        self.pool.close()
+        self.pool.join()
+
+    def encode(self, texts: List[str]) -> ndarray:
+        """
+        Encode texts on the worker processes.
+
+        :param texts: The texts.
+        :return: A 2D array of the texts' vectors, in order.
+        """
+        texts = list(texts)
+        if len(texts) == 0:
+            return np.zeros((0, 0))
+        if self.vector_shape is None:
+            self.vector_shape, self.vector_dtype = self.pool.apply(get_vector_shape_and_dtype, (texts[:1],))
+
+        shape = (len(texts),) + tuple(self.vector_shape)
+        shared_memory = SharedMemory(create=True,
+                                     size=max(1, int(np.prod(shape)) * np.dtype(self.vector_dtype).itemsize))
+        try:
+            shards = [(shared_memory.name, shape, self.vector_dtype, start, texts[start:start + self.shard_size])
+                      for start in range(0, len(texts), self.shard_size)]
+            self.pool.starmap(encode_into_shared_memory, shards, chunksize=1)
+            shared_vectors = np.ndarray(shape, dtype=self.vector_dtype, buffer=shared_memory.buf)
+            vectors = shared_vectors.copy()
+            del shared_vectors
+        finally:
+            shared_memory.close()
+            shared_memory.unlink()
+
+        return vectors
@@ -0,0 +1,182 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+from typing import Optional
+
+import numpy as np
+from numpy import ndarray
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+QUANTISATIONS = (FLOAT32, FLOAT16, INT8)
+
+INT8_MAX = 127
+
+DEFAULT_TILE_SIZE = 8192
+
+
+def check_quantisation(quantisation: str):
+    if quantisation not in QUANTISATIONS:
+        raise ValueError(f"Unknown quantisation {quantisation}. It should be one of {', '.join(QUANTISATIONS)}.")
+
+
+def quantise_vectors(vectors: ndarray, quantisation: str) -> tuple[ndarray, Optional[ndarray]]:
+    """
+    Quantise the rows of a 2D array.
+
+    For float16 the values are simply cast. For int8 the quantisation is symmetric with one scale per row, so that
+    row `i` is approximately `values[i] * scales[i]`.
+
+    :param vectors: A 2D array of vectors, one per row.
+    :param quantisation: One of "float32", "float16" or "int8".
+    :return: A tuple (values, scales). The scales are a float32 array with one value per row for int8, and None
+        otherwise.
+    """
+    check_quantisation(quantisation)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if quantisation != INT8:
+        return vectors.astype(quantisation), None
+    scales = np.max(np.abs(vectors), axis=1) / INT8_MAX
+    scales[scales == 0] = 1
+    values = np.clip(np.rint(vectors / scales[:, np.newaxis]), -INT8_MAX, INT8_MAX).astype(np.int8)
+    return values, scales.astype(np.float32)
+
+
+def dequantise_vectors(values: ndarray, scales: Optional[ndarray] = None) -> ndarray:
+    """
+    Convert quantised rows back to float32.
+
+    :param values: The quantised values, one vector per row.
+    :param scales: The per-row scales for int8 values, or None.
+    :return: The vectors as float32.
+    """
+    vectors = np.asarray(values, dtype=np.float32)
+    if scales is not None:
+        vectors = vectors * np.asarray(scales, dtype=np.float32)[:, np.newaxis]
+    return vectors
+
+
+def vector_to_bytes(vector, quantisation: str) -> bytes:
+    """
+    Serialise one vector, quantised. An int8 vector is followed by its float32 scale.
+    """
+    values, scales = quantise_vectors(np.asarray(vector, dtype=np.float32)[np.newaxis, :], quantisation)
+    if scales is None:
+        return values.tobytes()
+    return values.tobytes() + scales.tobytes()
+
+
+def vector_from_bytes(data: bytes, quantisation: str) -> ndarray:
+    """
+    Deserialise one vector written by `vector_to_bytes` as float32.
+    """
+    check_quantisation(quantisation)
+    if quantisation != INT8:
+        return np.frombuffer(data, dtype=quantisation).astype(np.float32)
+    scale = np.frombuffer(data, dtype=np.float32, offset=len(data) - 4)[0]
+    return np.frombuffer(data, dtype=np.int8, count=len(data) - 4).astype(np.float32) * scale
+
+
+class QuantisedVectors:
+    """
+    A 2D array of vectors stored as float16, or as int8 with a float32 scale per row, which takes a half or a quarter
+    of the memory and disk space of float32.
+
+    Dot products dequantise one tile of rows at a time, so a scan over all the vectors never holds more than a tile
+    of float32 values. Indexing with `vectors[idxs]` returns the dequantised rows, so the class can stand in for a
+    float32 array wherever rows are gathered.
+    """
+
+    def __init__(self, values: ndarray, scales: Optional[ndarray] = None):
+        """
+        :param values: The quantised values, shape (number of vectors, dimensions), as float16 or int8.
+        :param scales: For int8 values, the float32 scale of each row.
+        """
+        if values.dtype == np.int8 and scales is None:
+            raise ValueError("int8 vectors need a scale per row.")
+        self.values = values
+        self.scales = scales
+
+    @classmethod
+    def quantise(cls, vectors: ndarray, quantisation: str = INT8) -> "QuantisedVectors":
+        """
+        Quantise a 2D array of vectors.
+
+        :param vectors: The vectors, one per row.
+        :param quantisation: "float16" or "int8".
+        """
+        if quantisation == FLOAT32:
+            raise ValueError("float32 vectors do not need to be quantised.")
+        return cls(*quantise_vectors(vectors, quantisation))
+
+    @property
+    def quantisation(self) -> str:
+        return str(self.values.dtype)
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, idxs) -> ndarray:
+        values = self.values[idxs]
+        if self.scales is None:
+            return np.asarray(values, dtype=np.float32)
+        scales = self.scales[idxs]
+        if values.ndim == 1:
+            return values.astype(np.float32) * scales
+        return dequantise_vectors(values, scales)
+
+    def dequantise(self) -> ndarray:
+        """
+        Get all the vectors as a float32 array.
+        """
+        return dequantise_vectors(self.values, self.scales)
+
+    def dot(self, query_vectors: ndarray, tile_size: int = DEFAULT_TILE_SIZE) -> ndarray:
+        """
+        Compute the dot product of each query vector with each stored vector, dequantising one tile of stored
+        vectors at a time.
+
+        :param query_vectors: A 2D float array, shape (number of queries, dimensions).
+        :param tile_size: The number of stored vectors dequantised at once.
+        :return: A float32 array of shape (number of queries, number of stored vectors).
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        products = np.empty((len(query_vectors), len(self.values)), dtype=np.float32)
+        for start in range(0, len(self.values), tile_size):
+            end = min(start + tile_size, len(self.values))
+            # For int8 the scale is applied to the products rather than to the tile
+            np.matmul(query_vectors, self.values[start:end].astype(np.float32).T, out=products[:, start:end])
+            if self.scales is not None:
+                products[:, start:end] *= self.scales[start:end]
+        return products
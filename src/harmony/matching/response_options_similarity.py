@@ -0,0 +1,140 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import re
+from typing import Callable, List
+
+import numpy as np
+from numpy import ndarray
+
+from harmony.schemas.requests.text import Question
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise_response_options(options: List[str]) -> str:
+    """
+    Canonicalise a question's response options so that the same Likert scale written with different case or spacing
+    (e.g. "Not at all ;  Several days" and "not at all; several days") is encoded only once.
+
+    :param options: The response options of a question.
+    :return: The options, each lower-cased with its whitespace collapsed, joined with "; ". Empty options are dropped.
+    """
+    normalised_options = [WHITESPACE_RE.sub(" ", option).strip().lower() for option in options if option]
+    return "; ".join(option for option in normalised_options if option)
+
+
+class ResponseOptionsSimilarity:
+    """
+    The similarity between the response options of every pair of questions that have response options, stored
+    compactly: a matrix of the similarities between the U distinct (normalised) option strings, and for each of the N
+    questions the index of its option string. Instruments usually repeat the same scale on every item, so U is much
+    smaller than N.
+
+    It can be indexed like the N x N matrix, e.g. `sim[i, j]`, `sim[i]` or `sim[:10, :10]`, which only expands the
+    requested entries, and `np.asarray(sim)` or `to_dense()` expand the whole matrix.
+    """
+
+    def __init__(self, unique_options: List[str], unique_similarity: ndarray, option_idxs: ndarray):
+        """
+        :param unique_options: The U distinct normalised option strings.
+        :param unique_similarity: The U x U similarity matrix between the option strings.
+        :param option_idxs: For each of the N questions with response options, the index of its option string.
+        """
+        self.unique_options = unique_options
+        self.unique_similarity = unique_similarity
+        self.option_idxs = option_idxs
+
+    @property
+    def shape(self) -> tuple:
+        return len(self.option_idxs), len(self.option_idxs)
+
+    @property
+    def size(self) -> int:
+        return len(self.option_idxs) ** 2
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self):
+        return self.unique_similarity.dtype
+
+    @property
+    def T(self):
+        # The matrix is symmetric
+        return self
+
+    def __len__(self) -> int:
+        return len(self.option_idxs)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if len(key) > 2:
+            raise IndexError("too many indices for a 2-dimensional matrix")
+        rows = self.option_idxs[key[0]]
+        cols = self.option_idxs[key[1] if len(key) == 2 else slice(None)]
+        if np.ndim(rows) == 0 or np.ndim(cols) == 0:
+            return self.unique_similarity[rows, cols]
+        return self.unique_similarity[np.ix_(rows, cols)]
+
+    def __array__(self, dtype=None, copy=None):
+        dense = self.to_dense()
+        return dense if dtype is None else dense.astype(dtype, copy=False)
+
+    def to_dense(self) -> ndarray:
+        """
+        :return: The full N x N similarity matrix.
+        """
+        return self.unique_similarity[np.ix_(self.option_idxs, self.option_idxs)]
+
+
+def get_response_options_similarity(questions: List[Question],
+                                    vectorisation_function: Callable) -> ResponseOptionsSimilarity:
+    """
+    Compute the similarity between the response options of the questions which have response options, encoding each
+    distinct normalised option string only once.
+
+    :param questions: The questions.
+    :param vectorisation_function: A function to vectorise a list of texts.
+    :return: The similarities, in the order of the questions with response options.
+    """
+    option_to_option_idx = {}
+    option_idxs = np.array([
+        option_to_option_idx.setdefault(normalise_response_options(question.options), len(option_to_option_idx))
+        for question in questions if question.options
+    ], dtype=np.int64)
+    unique_options = list(option_to_option_idx)
+
+    if len(unique_options) == 0:
+        return ResponseOptionsSimilarity(unique_options, np.zeros((0, 0)), option_idxs)
+
+    options_vectors = np.asarray(vectorisation_function(unique_options))
+    norms = np.linalg.norm(options_vectors, axis=1)
+    unique_similarity = np.asarray(options_vectors @ options_vectors.T / np.outer(norms, norms)).clip(0, 1)
+
+    return ResponseOptionsSimilarity(unique_options, unique_similarity, option_idxs)
@@ -0,0 +1,326 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import os
+import tempfile
+import weakref
+from typing import Iterator, List, Optional
+
+import numpy as np
+from numpy import ndarray
+from scipy.sparse import issparse
+
+from harmony.schemas.requests.text import Instrument
+from harmony.schemas.responses.text import MatchResponse, MatchResult, SparseSimilarityMatrix
+
+# The approximate number of bytes of a similarity matrix to hold in memory at once when working through it in blocks.
+DEFAULT_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def get_row_block_size(matrix: ndarray, max_bytes: int = DEFAULT_BLOCK_BYTES) -> int:
+    """
+    Get the number of rows of a matrix that fit in roughly `max_bytes` of float64.
+
+    :param matrix: A 2D array or memmap.
+    :param max_bytes: The memory budget for one block of rows.
+    :return: The number of rows per block, at least 1.
+    """
+    bytes_per_row = max(1, matrix.shape[1]) * np.dtype(np.float64).itemsize
+    return max(1, max_bytes // bytes_per_row)
+
+
+def to_dense(matrix) -> ndarray:
+    """
+    Get a (part of a) similarity matrix as a dense array. Entries that are not stored in a sparse matrix become 0.
+
+    :param matrix: A 2D array, memmap or scipy.sparse matrix.
+    :return: The matrix as an in-memory array.
+    """
+    if issparse(matrix):
+        return matrix.toarray()
+    return np.asarray(matrix)
+
+
+def iter_row_blocks(matrix: ndarray, block_size: Optional[int] = None) -> Iterator[tuple[int, int, ndarray]]:
+    """
+    Iterate over a 2D array or memmap in blocks of consecutive rows, reading one block into memory at a time.
+
+    :param matrix: A 2D array, memmap or scipy.sparse matrix.
+    :param block_size: The number of rows per block. Defaults to a block size that fits in DEFAULT_BLOCK_BYTES.
+    :return: An iterator of (start row, end row, block as a dense array). Blocks of a float32 or float64 matrix keep
+        its dtype, so that the rows of an in-memory array are not copied, and other dtypes are converted to float64.
+    """
+    if issparse(matrix):
+        matrix = matrix.tocsr()
+    if block_size is None:
+        block_size = get_row_block_size(matrix)
+    dtype = matrix.dtype if matrix.dtype in (np.float32, np.float64) else np.float64
+    for start in range(0, matrix.shape[0], block_size):
+        end = min(start + block_size, matrix.shape[0])
+        yield start, end, np.asarray(to_dense(matrix[start:end]), dtype=dtype)
+
+
+def iter_lower_triangle_entries(matrix, min_abs_similarity: Optional[float] = None,
+                                block_size: Optional[int] = None) -> Iterator[tuple[ndarray, ndarray, ndarray]]:
+    """
+    Iterate over the entries below the diagonal of a similarity matrix one block of rows at a time, in row-major
+    order. For a sparse matrix only the stored entries are returned.
+
+    :param matrix: A 2D array, memmap or scipy.sparse matrix.
+    :param min_abs_similarity: If given, only entries whose absolute value is at least this are returned.
+    :param block_size: The number of rows per block.
+    :return: An iterator of (row idxs, column idxs, absolute values) for each block. The absolute values are
+        float32 for a float32 matrix and float64 otherwise.
+    """
+    if block_size is None:
+        block_size = get_row_block_size(matrix)
+    if issparse(matrix):
+        matrix = matrix.tocsr()
+        for start in range(0, matrix.shape[0], block_size):
+            block = matrix[start:start + block_size]
+            block.sort_indices()
+            block = block.tocoo()
+            ys = block.row.astype(int) + start
+            xs = block.col.astype(int)
+            abs_sims = np.abs(block.data.astype(np.float32 if block.dtype == np.float32 else np.float64))
+            is_kept = ys > xs
+            if min_abs_similarity is not None:
+                is_kept &= abs_sims >= min_abs_similarity
+            yield ys[is_kept], xs[is_kept], abs_sims[is_kept]
+    else:
+        for start, end, block in iter_row_blocks(matrix, block_size):
+            abs_block = np.abs(block)
+            is_kept = np.arange(start, end)[:, np.newaxis] > np.arange(abs_block.shape[1])[np.newaxis, :]
+            if min_abs_similarity is not None:
+                is_kept &= abs_block >= min_abs_similarity
+            ys, xs = np.nonzero(is_kept)
+            yield ys + start, xs, abs_block[ys, xs]
+
+
+def remove_file(path: str):
+    """
+    Delete a file if it still exists.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def create_similarity_memmap(num_questions: int, path: Optional[str] = None) -> np.memmap:
+    """
+    Create a float32 square matrix backed by a .npy file on disk, which can be reopened later with
+    `np.load(path, mmap_mode="r")`.
+
+    :param num_questions: The number of rows and columns.
+    :param path: The file to write. If not given, a temporary .npy file is created, which is deleted when the
+        memmap (and every view of it) has been garbage collected, or when the process exits.
+    :return: The writeable memmap.
+    """
+    if path is not None:
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(num_questions, num_questions))
+
+    with tempfile.NamedTemporaryFile(prefix="harmony_similarity_", suffix=".npy", delete=False) as f:
+        path = f.name
+    memmap = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(num_questions, num_questions))
+    weakref.finalize(memmap, remove_file, path)
+    return memmap
+
+
+class ValidatedSimilarityMatrix:
+    """
+    A similarity matrix which has passed `validate_similarity_matrix`. `match_instruments_with_function` validates its
+    similarity matrix once and hands it to the clustering functions wrapped in this, so that they do not check it
+    again. The clustering functions and `generate_crosswalk_table` accept either a plain matrix or this wrapper.
+    """
+
+    def __init__(self, matrix):
+        """
+        :param matrix: The similarity matrix, as an array, memmap or scipy.sparse matrix.
+        """
+        self.matrix = matrix
+
+    @property
+    def shape(self) -> tuple:
+        return self.matrix.shape
+
+    @property
+    def size(self) -> int:
+        return self.matrix.size if not issparse(self.matrix) else self.matrix.shape[0] * self.matrix.shape[1]
+
+    @property
+    def dtype(self):
+        return self.matrix.dtype
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def __getitem__(self, item):
+        return self.matrix[item]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(to_dense(self.matrix), dtype=dtype)
+
+
+def get_validated_similarity_matrix(item_to_item_similarity_matrix, validate: bool = True):
+    """
+    Get the plain similarity matrix out of a `ValidatedSimilarityMatrix`, or validate a plain matrix.
+
+    :param item_to_item_similarity_matrix: The similarity matrix, plain or wrapped in a `ValidatedSimilarityMatrix`.
+    :param validate: Set to False to skip the checks of a plain matrix, when it is known to be valid.
+    :return: The plain similarity matrix.
+    """
+    if isinstance(item_to_item_similarity_matrix, ValidatedSimilarityMatrix):
+        return item_to_item_similarity_matrix.matrix
+    if validate:
+        validate_similarity_matrix(item_to_item_similarity_matrix)
+    return item_to_item_similarity_matrix
+
+
+def get_tile_size(max_bytes: int = DEFAULT_BLOCK_BYTES) -> int:
+    """
+    Get the side of a square tile of a matrix that fits in roughly `max_bytes` of float64.
+
+    :param max_bytes: The memory budget for one tile.
+    :return: The number of rows and columns per tile, at least 1.
+    """
+    return max(1, int(np.sqrt(max_bytes // np.dtype(np.float64).itemsize)))
+
+
+def validate_similarity_matrix(item_to_item_similarity_matrix: ndarray, block_size: Optional[int] = None):
+    """
+    Check that a similarity matrix is square, symmetric, in the range -1 to 1 and has 1s on its diagonal. A dense
+    matrix or memmap is read in square tiles, comparing each tile above the diagonal with the transpose of its mirror
+    image below it, so that every part of a memmap is read about twice and never all at once. A sparse matrix is
+    checked on its stored entries only.
+
+    :param item_to_item_similarity_matrix: The similarity matrix, as an array, memmap or scipy.sparse matrix.
+    :param block_size: The number of rows and columns of the tiles to check at once.
+    """
+    if isinstance(item_to_item_similarity_matrix, ValidatedSimilarityMatrix):
+        return
+
+    # assert that the similarity matrix is square
+    assert item_to_item_similarity_matrix.shape[0] == item_to_item_similarity_matrix.shape[1], \
+        "Similarity matrix must be square."
+
+    if issparse(item_to_item_similarity_matrix):
+        validate_sparse_similarity_matrix(item_to_item_similarity_matrix.tocsr())
+        return
+
+    if block_size is None:
+        block_size = get_tile_size()
+    num_items = item_to_item_similarity_matrix.shape[0]
+    dtype = item_to_item_similarity_matrix.dtype \
+        if item_to_item_similarity_matrix.dtype in (np.float32, np.float64) else np.float64
+    for row_start in range(0, num_items, block_size):
+        row_end = min(row_start + block_size, num_items)
+        for column_start in range(row_start, num_items, block_size):
+            column_end = min(column_start + block_size, num_items)
+            tile = np.asarray(item_to_item_similarity_matrix[row_start:row_end, column_start:column_end], dtype=dtype)
+            if column_start == row_start:
+                mirror_transposed = tile.T
+            else:
+                mirror_transposed = np.asarray(
+                    item_to_item_similarity_matrix[column_start:column_end, row_start:row_end], dtype=dtype).T
+
+            # assert that the similarity matrix is symmetric, with the same tolerances as np.allclose
+            assert np.all(np.abs(tile - mirror_transposed) <= 1e-08 + 1e-05 * np.abs(mirror_transposed)), \
+                "Similarity matrix must be symmetric."
+
+            # assert that the similarity matrix is -1 <= x <= 1. Rounding is monotonic, so checking the smallest and
+            # largest values is the same as checking them all. The tiles above the diagonal and their mirror
+            # images cover the whole matrix.
+            for values in (tile,) if column_start == row_start else (tile, mirror_transposed):
+                assert np.round(float(np.min(values)), 3) >= -1., "All similarity scores must be >= -1."
+                assert np.round(float(np.max(values)), 3) <= 1., "All similarity scores must be <= 1."
+
+            # assert that the similarity matrix has 1s on its diagonals
+            if column_start == row_start:
+                assert np.allclose(np.diag(tile), 1.), "Diagonal elements of similarity matrix should be 1."
+
+
+def validate_sparse_similarity_matrix(matrix):
+    """
+    Check a square scipy.sparse CSR similarity matrix in time proportional to its number of stored entries.
+    Entries which are not stored count as 0.
+    """
+    # The same tolerances as np.allclose: |x - x.T| <= 1e-08 + 1e-05 * |x.T|
+    transpose = matrix.T.tocsr().astype(np.float64)
+    excess = (abs(matrix.astype(np.float64) - transpose) - 1e-05 * abs(transpose)).tocsr()
+    assert not np.any(excess.data > 1e-08), "Similarity matrix must be symmetric."
+
+    if matrix.nnz > 0:
+        assert np.round(float(np.min(matrix.data)), 3) >= -1., "All similarity scores must be >= -1."
+        assert np.round(float(np.max(matrix.data)), 3) <= 1., "All similarity scores must be <= 1."
+
+    assert np.allclose(matrix.diagonal(), 1.), "Diagonal elements of similarity matrix should be 1."
+
+
+def to_sparse_similarity_matrix(matrix) -> SparseSimilarityMatrix:
+    """
+    Convert a sparse similarity matrix into its serialisable CSR form for the API.
+
+    :param matrix: A scipy.sparse matrix.
+    :return: The SparseSimilarityMatrix.
+    """
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    return SparseSimilarityMatrix(shape=list(matrix.shape), indptr=matrix.indptr.tolist(),
+                                  indices=matrix.indices.tolist(), data=matrix.data.tolist())
+
+
+def to_match_response(match_result: MatchResult, instruments: List[Instrument]) -> MatchResponse:
+    """
+    Convert a MatchResult from the library into the serialisable MatchResponse of the API. A sparse similarity matrix
+    (from `similarity_output="topk"` or `"threshold"`) goes into `sparse_matches`, so that the payload grows with the
+    number of stored pairs, and `matches` is left empty; a dense one goes into `matches`. The response options
+    similarity is always returned dense.
+
+    :param match_result: The result of matching the instruments.
+    :param instruments: The instruments which were matched.
+    :return: The MatchResponse.
+    """
+    # The optional fields are only set when there is something to put in them
+    optional_fields = {}
+    similarity_with_polarity = match_result.similarity_with_polarity
+    if issparse(similarity_with_polarity):
+        matches = []
+        optional_fields["sparse_matches"] = to_sparse_similarity_matrix(similarity_with_polarity)
+    else:
+        matches = np.asarray(to_dense(similarity_with_polarity)).tolist()
+    if match_result.query_similarity is not None:
+        optional_fields["query_similarity"] = np.asarray(match_result.query_similarity).tolist()
+    if match_result.instrument_to_instrument_similarities is not None:
+        optional_fields["instrument_to_instrument_similarities"] = match_result.instrument_to_instrument_similarities
+
+    return MatchResponse(
+        instruments=instruments,
+        questions=match_result.questions,
+        matches=matches,
+        clusters=match_result.clusters,
+        response_options_similarity=np.asarray(match_result.response_options_similarity).tolist(),
+        **optional_fields
+    )
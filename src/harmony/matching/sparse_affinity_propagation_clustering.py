@@ -0,0 +1,358 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import warnings
+from typing import List, Optional
+
+import numpy as np
+from numpy import ndarray
+from scipy.sparse import issparse
+from sklearn.exceptions import ConvergenceWarning
+
+from harmony.matching.ann_index import get_top_k_idxs
+from harmony.matching.generate_cluster_topics import generate_cluster_topics
+from harmony.matching.similarity_matrix import get_validated_similarity_matrix, iter_row_blocks
+from harmony.schemas.requests.text import Question
+from harmony.schemas.responses.text import HarmonyCluster
+
+DEFAULT_TOP_K = 30
+
+# The number of pairs sampled to estimate the median similarity, which is the default preference
+NUM_PREFERENCE_SAMPLES = 100000
+
+
+def get_top_k_neighbours(item_to_item_similarity_matrix, top_k: int = DEFAULT_TOP_K) -> tuple[ndarray, ndarray, ndarray]:
+    """
+    Get the graph of each item's `top_k` most similar other items by absolute similarity, reading a dense or
+    memory-mapped matrix one block of rows at a time. For a sparse matrix, only the stored entries are considered.
+
+    :param item_to_item_similarity_matrix: A square similarity matrix, as an array, memmap or scipy.sparse matrix.
+    :param top_k: The number of neighbours of each item.
+    :return: The (row idxs, column idxs, absolute similarities as float64) of the edges, sorted by row.
+    """
+    num_items = item_to_item_similarity_matrix.shape[0]
+    top_k = max(0, min(top_k, num_items - 1))
+
+    if issparse(item_to_item_similarity_matrix):
+        entries = item_to_item_similarity_matrix.tocoo()
+        is_off_diagonal = entries.row != entries.col
+        rows = entries.row[is_off_diagonal].astype(np.int64)
+        cols = entries.col[is_off_diagonal].astype(np.int64)
+        sims = np.abs(entries.data[is_off_diagonal].astype(np.float64))
+        # Best first within each row, ties broken by the lower column idx, then keep the first top_k of each row
+        order = np.lexsort((cols, -sims, rows))
+        rows, cols, sims = rows[order], cols[order], sims[order]
+        rank_in_row = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+        is_kept = rank_in_row < top_k
+        return rows[is_kept], cols[is_kept], sims[is_kept]
+
+    all_rows = []
+    all_cols = []
+    all_sims = []
+    for start, end, block in iter_row_blocks(item_to_item_similarity_matrix):
+        abs_block = np.abs(block)
+        abs_block[np.arange(end - start), np.arange(start, end)] = -np.inf
+        idxs = get_top_k_idxs(abs_block, top_k)
+        all_rows.append(np.repeat(np.arange(start, end), idxs.shape[1]))
+        all_cols.append(idxs.ravel())
+        all_sims.append(np.take_along_axis(abs_block, idxs, axis=1).ravel().astype(np.float64))
+    return np.concatenate(all_rows), np.concatenate(all_cols), np.concatenate(all_sims)
+
+
+def estimate_median_similarity(item_to_item_similarity_matrix, num_samples: int = NUM_PREFERENCE_SAMPLES,
+                               random_state: int = 1) -> float:
+    """
+    Get the median absolute similarity of a matrix, which is the preference that scikit-learn's affinity propagation
+    uses by default. For a matrix with more than `num_samples` entries, it is estimated from a random sample of them.
+    For a sparse matrix, it is the median of the stored entries off the diagonal, since the pairs which are not stored
+    have an unknown similarity rather than 0.
+
+    :param item_to_item_similarity_matrix: A square similarity matrix, as an array, memmap or scipy.sparse matrix.
+    :param num_samples: The number of entries to sample.
+    :param random_state: The seed of the sample.
+    :return: The median absolute similarity.
+    """
+    num_items = item_to_item_similarity_matrix.shape[0]
+    if issparse(item_to_item_similarity_matrix):
+        entries = item_to_item_similarity_matrix.tocoo()
+        off_diagonal_data = entries.data[entries.row != entries.col]
+        return float(np.median(np.abs(off_diagonal_data))) if len(off_diagonal_data) > 0 else 0.
+    if num_items * num_items <= num_samples:
+        return float(np.median(np.abs(np.concatenate(
+            [block.ravel() for _, _, block in iter_row_blocks(item_to_item_similarity_matrix)]))))
+    random_state = np.random.RandomState(random_state)
+    rows = np.sort(random_state.randint(0, num_items, size=num_samples))
+    cols = random_state.randint(0, num_items, size=num_samples)
+    return float(np.median(np.abs(np.asarray(item_to_item_similarity_matrix[rows, cols]))))
+
+
+class SparseAffinityPropagation:
+    """
+    Affinity propagation which passes messages only along the edges of a sparse graph, such as each item's top-k
+    neighbours, instead of between all pairs of items. Its memory is proportional to the number of edges, so it can
+    cluster tens of thousands of items, and it is cheap enough per iteration to run until it converges.
+
+    Two items which are not joined by an edge are treated as infinitely dissimilar. The messages follow scikit-learn's
+    `AffinityPropagation`, including its damping and its convergence test: the run stops once the set of exemplars
+    has not changed for `convergence_iter` iterations.
+
+    After `fit`, the estimator has these attributes:
+
+    - `cluster_centers_indices_`: the idxs of the exemplars.
+    - `labels_`: the cluster of each item, i.e. the position in `cluster_centers_indices_` of the exemplar joined to it
+      by its most similar edge, or -1 if no exemplar is joined to it.
+    - `n_iter_`: the number of iterations run.
+    - `converged_`: whether the exemplars stopped changing before `max_iter`.
+    - `num_exemplars_history_`: the number of exemplars after each iteration.
+    """
+
+    def __init__(self, damping: float = 0.5, max_iter: int = 1000, convergence_iter: int = 15,
+                 preference: Optional[float] = None, random_state: int = 1):
+        """
+        :param damping: How much of the previous messages to keep in each iteration, between 0.5 and 1.
+        :param max_iter: The maximum number of iterations. An iteration only costs a few passes over the edges, so the
+            default is higher than scikit-learn's; 30,000 questions with 30 neighbours each take a few hundred.
+        :param convergence_iter: The number of iterations without a change in the exemplars to stop after.
+        :param preference: How likely each item is to be an exemplar. Defaults to the median similarity of the
+            edges. A higher preference gives more clusters.
+        :param random_state: The seed of the tiny noise added to the similarities to break ties.
+        """
+        if not 0.5 <= damping < 1:
+            raise ValueError("damping must be >= 0.5 and < 1")
+        self.damping = damping
+        self.max_iter = max_iter
+        self.convergence_iter = convergence_iter
+        self.preference = preference
+        self.random_state = random_state
+
+    def fit(self, rows: ndarray, cols: ndarray, similarities: ndarray, num_items: int,
+            initial_exemplars: Optional[List[int]] = None,
+            preference: Optional[float] = None) -> "SparseAffinityPropagation":
+        """
+        Cluster the items of a graph.
+
+        :param rows: The idxs of the items each edge starts at. Edges from an item to itself are ignored.
+        :param cols: The idxs of the items each edge ends at.
+        :param similarities: The similarity of each edge.
+        :param num_items: The number of items.
+        :param initial_exemplars: Items to start from as exemplars, e.g. the exemplars of an earlier clustering of
+            mostly the same items. Starting from good exemplars needs fewer iterations to converge.
+        :param preference: The preference to use instead of the estimator's.
+        :return: The fitted estimator.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        cols = np.asarray(cols, dtype=np.int64)
+        similarities = np.asarray(similarities, dtype=np.float64)
+        is_off_diagonal = rows != cols
+        rows, cols, similarities = rows[is_off_diagonal], cols[is_off_diagonal], similarities[is_off_diagonal]
+
+        if preference is None:
+            preference = self.preference
+        if preference is None:
+            preference = float(np.median(similarities)) if len(similarities) > 0 else 0.
+
+        # Add an edge from each item to itself with the preference, and sort the edges by row so each row is a slice
+        self_idxs = np.arange(num_items, dtype=np.int64)
+        rows = np.concatenate([rows, self_idxs])
+        cols = np.concatenate([cols, self_idxs])
+        similarities = np.concatenate([similarities, np.full(num_items, preference)])
+        order = np.lexsort((cols, rows))
+        rows, cols, similarities = rows[order], cols[order], similarities[order]
+        row_starts = np.searchsorted(rows, self_idxs)
+        self_edges = np.flatnonzero(rows == cols)
+        edge_idxs = np.arange(len(rows))
+
+        # Remove degeneracies as scikit-learn does
+        random_state = np.random.RandomState(self.random_state)
+        similarities = similarities + (np.finfo(np.float64).eps * similarities + np.finfo(np.float64).tiny * 100) * \
+            random_state.standard_normal(size=len(similarities))
+
+        # An item with no edges but its self-edge has no second best, so it is given one far enough below its own
+        # similarity that it always prefers itself, which keeps its responsibilities finite
+        has_no_neighbours = np.diff(np.append(row_starts, len(rows))) == 1
+        similarity_span = float(np.max(similarities) - np.min(similarities)) + 1.
+        no_neighbour_second_max = similarities[self_edges] - similarity_span
+
+        responsibilities = np.zeros(len(rows))
+        availabilities = np.zeros(len(rows))
+        if initial_exemplars is not None and len(initial_exemplars) > 0:
+            # Start with negative availabilities towards every item but the earlier exemplars, as they would be if
+            # the earlier exemplars had been chosen, so that the messages settle sooner
+            is_initial_exemplar = np.zeros(num_items, dtype=bool)
+            is_initial_exemplar[np.asarray(initial_exemplars, dtype=np.int64)] = True
+            availabilities[~is_initial_exemplar[cols] & (rows != cols)] = -float(np.max(similarities) -
+                                                                                 np.min(similarities))
+
+        is_exemplar_history = np.zeros((num_items, self.convergence_iter), dtype=bool)
+        self.num_exemplars_history_ = []
+        self.converged_ = False
+        iteration = 0
+        for iteration in range(self.max_iter):
+            # Responsibilities: r(i, k) = s(i, k) - max over k' != k of (a(i, k') + s(i, k'))
+            total = availabilities + similarities
+            row_max = np.maximum.reduceat(total, row_starts)
+            first_max_edges = np.minimum.reduceat(np.where(total == row_max[rows], edge_idxs, len(rows)), row_starts)
+            total[first_max_edges] = -np.inf
+            row_second_max = np.maximum.reduceat(total, row_starts)
+            row_second_max[has_no_neighbours] = no_neighbour_second_max[has_no_neighbours]
+            new_responsibilities = similarities - row_max[rows]
+            new_responsibilities[first_max_edges] = similarities[first_max_edges] - row_second_max
+            responsibilities = self.damping * responsibilities + (1 - self.damping) * new_responsibilities
+
+            # Availabilities: a(i, k) = min(0, r(k, k) + sum over i' not in {i, k} of max(0, r(i', k))) and
+            # a(k, k) = sum over i' != k of max(0, r(i', k))
+            positive_responsibilities = np.maximum(responsibilities, 0)
+            positive_responsibilities[self_edges] = responsibilities[self_edges]
+            column_sums = np.bincount(cols, weights=positive_responsibilities, minlength=num_items)
+            new_availabilities = np.minimum(column_sums[cols] - positive_responsibilities, 0)
+            new_availabilities[self_edges] = column_sums - responsibilities[self_edges]
+            availabilities = self.damping * availabilities + (1 - self.damping) * new_availabilities
+
+            is_exemplar = availabilities[self_edges] + responsibilities[self_edges] > 0
+            is_exemplar_history[:, iteration % self.convergence_iter] = is_exemplar
+            num_exemplars = int(np.sum(is_exemplar))
+            self.num_exemplars_history_.append(num_exemplars)
+
+            if iteration >= self.convergence_iter:
+                num_iterations_as_exemplar = np.sum(is_exemplar_history, axis=1)
+                is_unchanged = (num_iterations_as_exemplar == self.convergence_iter) | (num_iterations_as_exemplar == 0)
+                if np.all(is_unchanged) and num_exemplars > 0:
+                    self.converged_ = True
+                    break
+        self.n_iter_ = iteration + 1
+
+        self.cluster_centers_indices_ = np.flatnonzero(availabilities[self_edges] + responsibilities[self_edges] > 0)
+
+        # Join each item to the exemplar of its most similar edge
+        exemplar_to_label = np.full(num_items, -1)
+        exemplar_to_label[self.cluster_centers_indices_] = np.arange(len(self.cluster_centers_indices_))
+        is_to_exemplar = (exemplar_to_label[cols] >= 0) & (rows != cols)
+        exemplar_similarities = np.where(is_to_exemplar, similarities, -np.inf)
+        row_best = np.maximum.reduceat(exemplar_similarities, row_starts)
+        best_edges = np.minimum.reduceat(
+            np.where(is_to_exemplar & (exemplar_similarities == row_best[rows]), edge_idxs, len(rows) - 1),
+            row_starts)
+        self.labels_ = np.where(np.isfinite(row_best), exemplar_to_label[cols[best_edges]], -1)
+        self.labels_[self.cluster_centers_indices_] = np.arange(len(self.cluster_centers_indices_))
+
+        return self
+
+
+def cluster_questions_sparse_affinity_propagation(
+        questions: List[Question],
+        item_to_item_similarity_matrix: np.ndarray,
+        top_k: int = DEFAULT_TOP_K,
+        initial_exemplars: Optional[List[int]] = None,
+        affinity_propagation: Optional[SparseAffinityPropagation] = None,
+        validate: bool = True
+) -> List[HarmonyCluster]:
+    """
+    Affinity Propagation Clustering over each question's top-k neighbours, for large sets of questions.
+
+    Parameters
+    ----------
+    questions : List[Question]
+        The set of questions to cluster.
+
+    item_to_item_similarity_matrix : np.ndarray
+        The cosine similarity matrix for the questions. This can be a
+        memory-mapped array, which is read one block of rows at a time, or a
+        scipy.sparse matrix, in which case only the stored pairs are
+        neighbours.
+
+    top_k : int, optional
+        The number of neighbours of each question that messages are passed
+        to. Default is 30.
+
+    initial_exemplars : List[int], optional
+        The idxs of questions to start from as exemplars, e.g. the centroids
+        of an earlier clustering of mostly the same questions.
+
+    affinity_propagation : SparseAffinityPropagation, optional
+        The estimator to use, to set its parameters or to read its
+        convergence diagnostics afterwards. Its preference defaults to the
+        median similarity of the whole matrix, like scikit-learn's.
+
+    validate : bool, optional
+        Set to False to skip checking the similarity matrix when it is known
+        to be valid. A ValidatedSimilarityMatrix is never checked again.
+        Default is True.
+
+    Returns
+    -------
+    List[HarmonyCluster]
+        A list of HarmonyCluster objects representing the clusters.
+    """
+    item_to_item_similarity_matrix = get_validated_similarity_matrix(item_to_item_similarity_matrix, validate)
+
+    assert len(questions) > 0
+    assert len(questions) == item_to_item_similarity_matrix.shape[0]
+    assert len(questions) == item_to_item_similarity_matrix.shape[1]
+
+    if affinity_propagation is None:
+        affinity_propagation = SparseAffinityPropagation()
+    preference = affinity_propagation.preference
+    if preference is None:
+        preference = estimate_median_similarity(item_to_item_similarity_matrix)
+
+    rows, cols, sims = get_top_k_neighbours(item_to_item_similarity_matrix, top_k)
+    affinity_propagation.fit(rows, cols, sims, len(questions), initial_exemplars, preference)
+    if not affinity_propagation.converged_:
+        warnings.warn(f"Sparse affinity propagation did not converge in {affinity_propagation.n_iter_} iterations.",
+                      ConvergenceWarning)
+
+    exemplars = affinity_propagation.cluster_centers_indices_.tolist()
+    labels = affinity_propagation.labels_.copy()
+    if len(exemplars) == 0:
+        # Without any exemplar, each question is its own cluster
+        exemplars = list(range(len(questions)))
+        labels = np.arange(len(questions))
+    elif np.any(labels < 0):
+        # Questions with no exemplar among their neighbours join their most similar exemplar
+        for start, end, block in iter_row_blocks(item_to_item_similarity_matrix):
+            is_unlabelled = labels[start:end] < 0
+            if np.any(is_unlabelled):
+                labels[start:end][is_unlabelled] = np.argmax(np.abs(block[is_unlabelled][:, exemplars]), axis=1)
+
+    clusters = []
+    for cluster_id, exemplar in enumerate(exemplars):
+        item_ids = np.flatnonzero(labels == cluster_id).tolist()
+        clusters.append(
+            HarmonyCluster(
+                cluster_id=cluster_id,
+                centroid_id=exemplar,
+                centroid=questions[exemplar],
+                items=[questions[i] for i in item_ids],
+                item_ids=item_ids,
+                text_description=questions[exemplar].question_text,
+                keywords=[]
+            )
+        )
+
+    cluster_topics = generate_cluster_topics(clusters, top_k_topics=5)
+    for cluster, topics in zip(clusters, cluster_topics):
+        cluster.keywords = topics
+
+    return clusters
@@ -0,0 +1,142 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import functools
+import os
+import pathlib
+from typing import Callable, List, Optional
+
+import numpy as np
+from langdetect import detect, DetectorFactory
+from scipy.sparse import csr_matrix
+
+from harmony.matching.catalogue_index import normalise_vectors
+from harmony.schemas.requests.text import Question
+
+DetectorFactory.seed = 0
+
+DEFAULT_STOPWORDS_FOLDER = str(pathlib.Path(__file__).parent.resolve().parent.joinpath("stopwords"))
+
+# The maximum number of question texts whose detected language is memoised
+LANGUAGE_CACHE_SIZE = 65536
+
+
+@functools.lru_cache(maxsize=None)
+def load_lang_to_stopwords(stopwords_folder: str = DEFAULT_STOPWORDS_FOLDER) -> dict:
+    """
+    Load the stopwords of each language from a folder containing one file per language code, once per process.
+
+    :param stopwords_folder: The folder of stopwords files.
+    :return: A dict from language code to the set of stopwords.
+    """
+    lang_to_stopwords = {}
+    if os.path.exists(stopwords_folder):
+        for stopwords_file in os.listdir(stopwords_folder):
+            with open(os.path.join(stopwords_folder, stopwords_file), "r", encoding="utf-8") as f:
+                lang_to_stopwords[stopwords_file] = set(f.read().splitlines())
+    return lang_to_stopwords
+
+
+@functools.lru_cache(maxsize=LANGUAGE_CACHE_SIZE)
+def detect_language(text: str) -> Optional[str]:
+    """
+    Detect the language of a text, memoised since the same instruments are tagged over and over.
+
+    :param text: The text.
+    :return: The language code, or None if it could not be detected.
+    """
+    try:
+        return detect(text)
+    except Exception:
+        return None
+
+
+class TopicTagger:
+    """
+    Tags questions with the topics that any of their words (other than stopwords) is similar to.
+
+    The topics are encoded once, the first time they are needed, and each call to `tag` encodes all the distinct
+    words of all the questions in one call to the vectorisation function, together with the topics if they have not
+    been encoded yet. Which words match which topics is then one matrix product, and which questions match which
+    topics one sparse matrix product.
+    """
+
+    def __init__(self, topics: List[str], vectorisation_function: Callable, threshold: float = 0.7,
+                 lang_to_stopwords: Optional[dict] = None):
+        """
+        :param topics: The topics to tag questions with.
+        :param vectorisation_function: A function to vectorise a list of texts.
+        :param threshold: The minimum cosine similarity between a word and a topic for the topic to be assigned.
+        :param lang_to_stopwords: A dict from language code to stopwords. Defaults to Harmony's stopwords.
+        """
+        self.topics = topics
+        self.vectorisation_function = vectorisation_function
+        self.threshold = threshold
+        if lang_to_stopwords is None:
+            lang_to_stopwords = load_lang_to_stopwords()
+        self.lang_to_stopwords = lang_to_stopwords
+        self.topic_vectors = None
+
+    def tag(self, questions: List[Question]) -> List[List[str]]:
+        """
+        Get the topics of each question, in the order of `topics`. Questions without text get no topics.
+
+        :param questions: The questions to tag.
+        :return: For each question, the list of its topics.
+        """
+        # Split every question into its words other than stopwords, and number the distinct words
+        word_to_word_idx = {}
+        question_idxs = []
+        word_idxs = []
+        for question_idx, question in enumerate(questions):
+            if not question.question_text or not question.question_text.strip():
+                continue
+            stopwords = self.lang_to_stopwords.get(detect_language(question.question_text), [])
+            for word in question.question_text.split():
+                if word not in stopwords:
+                    question_idxs.append(question_idx)
+                    word_idxs.append(word_to_word_idx.setdefault(word, len(word_to_word_idx)))
+
+        if len(word_to_word_idx) == 0 or len(self.topics) == 0:
+            return [[] for _ in questions]
+
+        words = list(word_to_word_idx)
+        if self.topic_vectors is None:
+            vectors = np.asarray(self.vectorisation_function(list(self.topics) + words))
+            self.topic_vectors = normalise_vectors(vectors[:len(self.topics)], dtype=np.float64)
+            word_vectors = vectors[len(self.topics):]
+        else:
+            word_vectors = self.vectorisation_function(words)
+        word_vectors = normalise_vectors(word_vectors, dtype=np.float64)
+
+        # (words x topics): does each word match each topic?
+        is_word_topic_match = (word_vectors @ self.topic_vectors.T >= self.threshold).astype(np.int64)
+
+        # (questions x words) @ (words x topics): how many of each question's words match each topic?
+        question_to_word = csr_matrix((np.ones(len(word_idxs), dtype=np.int64), (question_idxs, word_idxs)),
+                                      shape=(len(questions), len(words)))
+        is_question_topic_match = (question_to_word @ is_word_topic_match) > 0
+
+        return [[self.topics[topic_idx] for topic_idx in np.flatnonzero(row)] for row in is_question_topic_match]
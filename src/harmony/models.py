@@ -0,0 +1,273 @@
+"""
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+import gc
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+def get_model_size_bytes(model: Any) -> int:
+    """
+    Estimate the memory taken by a model: the parameters and buffers of a PyTorch module, the size of a NumPy
+    array, or the sum of the sizes of the items of a tuple or list (e.g. a model and its tokeniser).
+    Anything else counts as 0 bytes.
+
+    :param model: The model.
+    :return: The estimated size in bytes.
+    """
+    if isinstance(model, (tuple, list)):
+        return sum(get_model_size_bytes(item) for item in model)
+    if hasattr(model, "parameters") and hasattr(model, "buffers"):
+        return sum(tensor.numel() * tensor.element_size()
+                   for tensors in (model.parameters(), model.buffers()) for tensor in tensors)
+    if hasattr(model, "nbytes"):
+        return int(model.nbytes)
+    return 0
+
+
+def get_memory_budget_from_environment() -> Optional[int]:
+    """
+    Get the memory budget from the environment variable HARMONY_MODEL_MEMORY_BUDGET_MB, or None (no budget).
+    """
+    memory_budget_mb = os.environ.get("HARMONY_MODEL_MEMORY_BUDGET_MB", "")
+    if memory_budget_mb == "":
+        return None
+    try:
+        return int(float(memory_budget_mb) * 1024 * 1024)
+    except ValueError:
+        warnings.warn(f"HARMONY_MODEL_MEMORY_BUDGET_MB must be a number of megabytes, not {memory_budget_mb!r}. "
+                      "No memory budget is set.")
+        return None
+
+
+class ModelRegistry:
+    """
+    A thread-safe registry of the models used by Harmony (the sentence transformers and the PDF parser), shared by
+    all the modules that use them. Models are registered by name with a function that loads them and are only loaded
+    when first requested. The registry keeps track of the memory each loaded model takes, and if a memory budget is
+    set it unloads the least recently used models to stay within it:
+
+        from harmony.models import model_registry
+
+        model_registry.set_memory_budget(2 * 1024 ** 3)
+        model_registry.warm_up()  # load all the registered models, e.g. when a server starts
+        print(model_registry.get_stats())
+
+    A model that is evicted or unloaded is loaded again the next time it is requested. The registry only drops its
+    own reference, so the memory is only freed once nobody else holds on to the model.
+    """
+
+    def __init__(self, memory_budget: Optional[int] = None):
+        """
+        :param memory_budget: The maximum total size in bytes of the loaded models, or None for no limit.
+        """
+        self.memory_budget = memory_budget
+        self.loaders: Dict[str, Callable[[], Any]] = {}
+        self.size_functions: Dict[str, Callable[[Any], int]] = {}
+        # The loaded models, least recently used first
+        self.models: OrderedDict[str, Any] = OrderedDict()
+        self.model_sizes: Dict[str, int] = {}
+        self.model_stats: Dict[str, dict] = {}
+        self.event_listeners: List[Callable[[str, str, int], None]] = []
+        self.lock = threading.RLock()
+        # A lock per model name, held while that model is being loaded
+        self.loading_locks: Dict[str, threading.Lock] = {}
+
+    def register(self, name: str, loader: Callable[[], Any], size_function: Callable[[Any], int] = None):
+        """
+        Register a model. Registering a name again replaces its loader, but a model which is already loaded is kept.
+
+        :param name: The name of the model.
+        :param loader: A function with no arguments that loads the model.
+        :param size_function: Optionally, a function giving the size in bytes of the loaded model. Defaults to
+            `get_model_size_bytes`.
+        """
+        with self.lock:
+            self.loaders[name] = loader
+            self.size_functions[name] = size_function or get_model_size_bytes
+            self.model_stats.setdefault(name, {"num_loads": 0, "num_hits": 0, "num_evictions": 0,
+                                               "load_seconds": 0.0})
+
+    def is_registered(self, name: str) -> bool:
+        return name in self.loaders
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.models
+
+    def get(self, name: str) -> Any:
+        """
+        Get a model, loading it if it is not loaded. Loading a model may evict the least recently used other models
+        to stay within the memory budget.
+
+        :param name: The name of the model.
+        :return: The model.
+        """
+        with self.lock:
+            model = self.get_loaded(name)
+            if model is not None:
+                return model
+            if name not in self.loaders:
+                raise KeyError(f"No model named {name} is registered.")
+            loading_lock = self.loading_locks.setdefault(name, threading.Lock())
+
+        # The model is loaded holding only its own lock, so that other models can be used in the meantime, while
+        # threads asking for the same model wait for the first one to load it
+        with loading_lock:
+            with self.lock:
+                model = self.get_loaded(name)
+                if model is not None:
+                    return model
+                loader = self.loaders[name]
+                size_function = self.size_functions[name]
+
+            start_time = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start_time
+            model_size = size_function(model)
+
+            with self.lock:
+                self.model_stats[name]["load_seconds"] += load_seconds
+                self.model_stats[name]["num_loads"] += 1
+                self.models[name] = model
+                self.model_sizes[name] = model_size
+                self.notify("load", name)
+                self.enforce_memory_budget(keep=name)
+            return model
+
+    def get_loaded(self, name: str) -> Optional[Any]:
+        """
+        Get a model if it is loaded, marking it as the most recently used. Must be called holding the lock.
+
+        :param name: The name of the model.
+        :return: The model, or None if it is not loaded.
+        """
+        if name not in self.models:
+            return None
+        self.models.move_to_end(name)
+        self.model_stats[name]["num_hits"] += 1
+        return self.models[name]
+
+    def unload(self, name: str) -> bool:
+        """
+        Unload a model, if it is loaded.
+
+        :param name: The name of the model.
+        :return: Whether the model was loaded.
+        """
+        with self.lock:
+            return self.remove(name, "unload")
+
+    def unload_all(self):
+        with self.lock:
+            for name in list(self.models):
+                self.remove(name, "unload")
+
+    def warm_up(self, names: List[str] = None) -> List[str]:
+        """
+        Load models ahead of their first use, e.g. when a server starts. If they do not all fit in the memory budget,
+        the ones loaded first are evicted.
+
+        :param names: The names of the models to load. Defaults to all the registered models.
+        :return: The names of the models that are loaded afterwards.
+        """
+        for name in (names if names is not None else list(self.loaders)):
+            self.get(name)
+        with self.lock:
+            return list(self.models)
+
+    def set_memory_budget(self, memory_budget: Optional[int]):
+        """
+        Change the memory budget, evicting models straight away if they no longer fit.
+
+        :param memory_budget: The maximum total size in bytes of the loaded models, or None for no limit.
+        """
+        with self.lock:
+            self.memory_budget = memory_budget
+            self.enforce_memory_budget()
+
+    def get_total_size(self) -> int:
+        with self.lock:
+            return sum(self.model_sizes[name] for name in self.models)
+
+    def get_stats(self) -> dict:
+        """
+        :return: The memory budget, the total size of the loaded models, and for each registered model whether it is
+            loaded, its size in bytes, and how many times it has been loaded, requested while loaded and evicted, and
+            the total time spent loading it.
+        """
+        with self.lock:
+            return {
+                "memory_budget": self.memory_budget,
+                "total_size": self.get_total_size(),
+                "models": {
+                    name: {"is_loaded": name in self.models, "size": self.model_sizes.get(name, 0),
+                           **self.model_stats[name]}
+                    for name in self.loaders
+                },
+            }
+
+    def add_event_listener(self, listener: Callable[[str, str, int], None]):
+        """
+        Add a function to be called with (event, model name, model size in bytes) whenever a model is loaded
+        ("load"), evicted to stay within the memory budget ("evict") or unloaded ("unload"), e.g. to export metrics.
+
+        :param listener: The function.
+        """
+        with self.lock:
+            self.event_listeners.append(listener)
+
+    def notify(self, event: str, name: str):
+        for listener in self.event_listeners:
+            listener(event, name, self.model_sizes.get(name, 0))
+
+    def remove(self, name: str, event: str) -> bool:
+        if name not in self.models:
+            return False
+        self.notify(event, name)
+        del self.models[name]
+        del self.model_sizes[name]
+        gc.collect()
+        return True
+
+    def enforce_memory_budget(self, keep: Optional[str] = None):
+        """
+        Evict the least recently used models until the loaded models fit in the memory budget. The model `keep` is
+        never evicted, so a single model larger than the budget can still be used.
+        """
+        if self.memory_budget is None:
+            return
+        for name in list(self.models):
+            if self.get_total_size() <= self.memory_budget:
+                break
+            if name != keep:
+                self.model_stats[name]["num_evictions"] += 1
+                self.remove(name, "evict")
+
+
+model_registry = ModelRegistry(memory_budget=get_memory_budget_from_environment())
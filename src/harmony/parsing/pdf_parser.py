@@ -28,26 +28,58 @@ SOFTWARE.
 import re
 from harmony.parsing.capi_parser import is_capi_format, convert_capi_to_instruments
 
-import torch
+from harmony.models import model_registry
 from harmony.parsing.util.tika_wrapper import parse_pdf_to_list
 from harmony.schemas.requests.text import RawFile, Instrument
 from tqdm import tqdm
-from transformers import AutoModelForTokenClassification, AutoTokenizer
 
 import harmony
 
 # Disable tokenizer parallelism
 # os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-print("Starting to load pretrained model... harmonydata/debertaV2_pdfparser")
-model = AutoModelForTokenClassification.from_pretrained("harmonydata/debertaV2_pdfparser")
+PDF_PARSER_MODEL_NAME = "harmonydata/debertaV2_pdfparser"
 
-print("Starting to load pretrained tokeniser... harmonydata/debertaV2_pdfparser")
-tokenizer = AutoTokenizer.from_pretrained("harmonydata/debertaV2_pdfparser")
-print("Loaded pretrained model and tokeniser.")
+
+def load_model_and_tokeniser() -> tuple:
+    from transformers import AutoModelForTokenClassification, AutoTokenizer
+
+    print("Starting to load pretrained model... " + PDF_PARSER_MODEL_NAME)
+    model = AutoModelForTokenClassification.from_pretrained(PDF_PARSER_MODEL_NAME)
+
+    print("Starting to load pretrained tokeniser... " + PDF_PARSER_MODEL_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(PDF_PARSER_MODEL_NAME)
+    print("Loaded pretrained model and tokeniser.")
+
+    return model, tokenizer
+
+
+model_registry.register(PDF_PARSER_MODEL_NAME, load_model_and_tokeniser)
+
+
+def get_model_and_tokeniser() -> tuple:
+    """
+    Get the PDF parser's token classification model and its tokeniser from the model registry, loading them the
+    first time they are needed rather than when the module is imported.
+
+    :return: The model and the tokeniser.
+    """
+    return model_registry.get(PDF_PARSER_MODEL_NAME)
+
+
+def __getattr__(name):
+    # The module used to load `model` and `tokenizer` at import time, so keep them available as attributes
+    if name == "model":
+        return get_model_and_tokeniser()[0]
+    if name == "tokenizer":
+        return get_model_and_tokeniser()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def predict(text):
+    import torch
+
+    model, tokenizer = get_model_and_tokeniser()
     inputs = tokenizer(
         text,
         return_offsets_mapping=True,
@@ -33,3 +33,4 @@ class ClusteringAlgorithm(str, Enum):
     deterministic: str = 'deterministic'
     kmeans: str = 'kmeans'
     hdbscan: str = 'hdbscan'
+    sparse_affinity_propagation: str = 'sparse_affinity_propagation'
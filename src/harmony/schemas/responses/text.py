@@ -77,6 +77,18 @@ class HarmonyCluster(BaseModel):
     keywords: List[str] = Field(description="Cluster keywords/topics that best summarise the cluster")
 
 
+class SparseSimilarityMatrix(BaseModel):
+    """
+    A square similarity matrix in compressed sparse row (CSR) form. The values of row `i` are
+    `data[indptr[i]:indptr[i + 1]]` and their column indices are `indices[indptr[i]:indptr[i + 1]]`.
+    Entries that are not stored are not matches.
+    """
+    shape: List[int] = Field(description="The number of rows and columns of the matrix")
+    indptr: List[int] = Field(description="The offsets of each row's entries in indices and data")
+    indices: List[int] = Field(description="The column index of each stored entry")
+    data: List[float] = Field(description="The value of each stored entry")
+
+
 class MatchResponse(BaseModel):
     """
     This is serialisable (no Numpy objects inside) and can be returned by FastAPI.
@@ -87,6 +99,10 @@ class MatchResponse(BaseModel):
         description="The questions which were matched, in an order matching the order of the matrix"
     )
     matches: List[List] = Field(description="Matrix of cosine similarity matches for the questions")
+    sparse_matches: SparseSimilarityMatrix = Field(
+        None, description="Sparse matrix of cosine similarity matches for the questions, used instead of matches when "
+                          "a top-k or thresholded similarity output was requested"
+    )
     query_similarity: List = Field(
         None, description="Similarity metric between query string and items"
     )
@@ -111,7 +127,11 @@ class MatchResult(BaseModel):
         description="The questions which were matched, in an order matching the order of the matrix"
     )
     similarity_with_polarity: Any = Field(description="Matrix of cosine similarity matches for the questions")
-    response_options_similarity: Any = Field(description="Matrix of cosine similarity matches for the response options")
+    response_options_similarity: Any = Field(
+        description="Matrix of cosine similarity matches for the response options. This is a "
+                    "ResponseOptionsSimilarity, which stores one row per distinct set of options, if "
+                    "compact_response_options was requested"
+    )
     query_similarity: Any = Field(
         None, description="Similarity metric between query string and items"
     )
@@ -12,6 +12,7 @@ try:
 except ImportError:
     GRAPHICS_AVAILABLE = False
 
+from harmony.matching.similarity_matrix import to_dense
 from harmony.schemas.requests.text import Instrument
 from harmony.schemas.responses.text import MatchResponse
 
@@ -380,6 +381,7 @@ def generate_pdf_report(
     
     if sim is None or questions is None:
         raise ValueError("Invalid match response: missing similarity matrix or questions")
+    sim = to_dense(sim)
     
     for i in range(sim.shape[0]):
         for j in range(sim.shape[1]):
@@ -499,6 +501,7 @@ def generate_harmony_pdf_report(
     
     if sim is None or questions is None:
         raise ValueError("Invalid match response: missing similarity matrix or questions")
+    sim = to_dense(sim)
     
     # Collect all matches
     raw_matches = []
@@ -0,0 +1,73 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import zlib
+from typing import Callable, List
+
+import numpy as np
+from numpy import ndarray
+
+
+def get_fake_vector(text: str, size: int = 8) -> ndarray:
+    """
+    Get a deterministic pseudo-embedding of a text, so that tests do not need a model. The random seed is a hash of
+    the whole text, so that texts with the same characters in a different order get different vectors.
+    """
+    return np.random.RandomState(zlib.crc32(text.encode("utf-8"))).normal(size=size)
+
+
+def vectorise(texts: List[str], size: int = 8, dtype=np.float64) -> ndarray:
+    """
+    Get the deterministic pseudo-embedding of each text, in place of a sentence transformer.
+    """
+    return np.array([get_fake_vector(text, size) for text in texts], dtype=dtype).reshape(len(texts), size)
+
+
+class CountingVectoriser:
+    """
+    A fake vectoriser which records the texts it is asked to encode, so that tests can check what was encoded and in
+    how many calls.
+    """
+
+    def __init__(self, size: int = 8, get_vector: Callable[[str, int], ndarray] = get_fake_vector):
+        """
+        :param size: The length of the vectors.
+        :param get_vector: A function giving the vector of a text of the given length.
+        """
+        self.size = size
+        self.get_vector = get_vector
+        # The texts of each call, in order
+        self.calls = []
+
+    @property
+    def texts(self) -> List[str]:
+        # All the texts encoded, in order
+        return [text for call in self.calls for text in call]
+
+    def __call__(self, texts: List[str]) -> ndarray:
+        self.calls.append(list(texts))
+        return np.array([self.get_vector(text, self.size) for text in texts]).reshape(len(texts), self.size)
@@ -0,0 +1,136 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.adaptive_batching import encode_in_length_sorted_batches, estimate_bytes_per_sequence, \
+    get_batch_end, is_out_of_memory_error
+
+
+class FakeEncoder:
+    def __init__(self, max_padded_tokens: int = None, error: Exception = MemoryError()):
+        self.max_padded_tokens = max_padded_tokens
+        self.error = error
+        self.batches = []
+
+    def __call__(self, texts):
+        padded_tokens = len(texts) * max(len(text.split()) for text in texts)
+        if self.max_padded_tokens is not None and padded_tokens > self.max_padded_tokens:
+            raise self.error
+        self.batches.append(list(texts))
+        return np.array([[len(text.split()), sum(map(ord, text))] for text in texts], dtype=np.float32)
+
+
+def get_texts():
+    return [" ".join(["word"] * (1 + (i * 7) % 23)) + f" {i}" for i in range(100)]
+
+
+def get_lengths(texts):
+    return np.array([len(text.split()) for text in texts])
+
+
+class TestAdaptiveBatching(unittest.TestCase):
+
+    def test_vectors_are_in_the_original_order(self):
+        texts = get_texts()
+        encoder = FakeEncoder()
+        vectors = encode_in_length_sorted_batches(texts, encoder, get_lengths(texts),
+                                                  memory_budget=20 * estimate_bytes_per_sequence(10))
+
+        np.testing.assert_array_equal(vectors, FakeEncoder()(texts))
+        self.assertEqual(sorted(sum(encoder.batches, [])), sorted(texts))
+        self.assertGreater(len(encoder.batches), 1)
+
+    def test_batches_are_sorted_by_length(self):
+        texts = get_texts()
+        encoder = FakeEncoder()
+        encode_in_length_sorted_batches(texts, encoder, get_lengths(texts),
+                                        memory_budget=20 * estimate_bytes_per_sequence(10))
+
+        lengths = [len(text.split()) for batch in encoder.batches for text in batch]
+        self.assertEqual(lengths, sorted(lengths))
+
+    def test_batches_fit_in_memory_budget(self):
+        lengths = np.sort(get_lengths(get_texts()))
+        memory_budget = 20 * estimate_bytes_per_sequence(10)
+        start = 0
+        while start < len(lengths):
+            end = get_batch_end(lengths, start, memory_budget)
+            self.assertTrue(end - start == 1 or
+                            (end - start) * estimate_bytes_per_sequence(lengths[end - 1]) <= memory_budget)
+            start = end
+
+    def test_short_texts_get_bigger_batches(self):
+        lengths = np.array([2] * 1000 + [200] * 1000)
+        memory_budget = 1024 * 1024 * 64
+        self.assertGreater(get_batch_end(lengths, 0, memory_budget), get_batch_end(lengths, 1000, memory_budget) - 1000)
+
+    def test_max_batch_size(self):
+        lengths = np.ones(100, dtype=int)
+        self.assertEqual(10, get_batch_end(lengths, 0, 1024 * 1024 * 1024, max_batch_size=10))
+        self.assertEqual(100, get_batch_end(lengths, 0, 1024 * 1024 * 1024))
+
+    def test_backs_off_on_memory_error(self):
+        texts = get_texts()
+        encoder = FakeEncoder(max_padded_tokens=50)
+        vectors = encode_in_length_sorted_batches(texts, encoder, get_lengths(texts), memory_budget=1024 * 1024 * 1024)
+
+        np.testing.assert_array_equal(vectors, FakeEncoder()(texts))
+        self.assertTrue(all(len(batch) * max(len(text.split()) for text in batch) <= 50 for batch in encoder.batches))
+
+    def test_backs_off_on_torch_out_of_memory_error(self):
+        texts = get_texts()
+        error = RuntimeError("[enforce fail at alloc_cpu.cpp:117] . DefaultCPUAllocator: can't allocate memory: you "
+                             "tried to allocate 12884901888 bytes. Error code 12 (Cannot allocate memory)")
+        encoder = FakeEncoder(max_padded_tokens=50, error=error)
+        vectors = encode_in_length_sorted_batches(texts, encoder, get_lengths(texts), memory_budget=1024 * 1024 * 1024)
+
+        np.testing.assert_array_equal(vectors, FakeEncoder()(texts))
+        self.assertTrue(all(len(batch) * max(len(text.split()) for text in batch) <= 50 for batch in encoder.batches))
+
+    def test_other_errors_are_raised(self):
+        texts = get_texts()
+        self.assertTrue(is_out_of_memory_error(RuntimeError("CUDA out of memory. Tried to allocate 2.00 GiB")))
+        self.assertFalse(is_out_of_memory_error(RuntimeError("Expected all tensors to be on the same device")))
+        with self.assertRaises(RuntimeError):
+            encode_in_length_sorted_batches(texts, FakeEncoder(max_padded_tokens=50, error=RuntimeError("bad input")),
+                                            get_lengths(texts), memory_budget=1024 * 1024 * 1024)
+
+    def test_single_text_memory_error_is_raised(self):
+        texts = get_texts()
+        with self.assertRaises(MemoryError):
+            encode_in_length_sorted_batches(texts, FakeEncoder(max_padded_tokens=5), get_lengths(texts),
+                                            memory_budget=1024 * 1024 * 1024)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.ann_index import IvfIndex, get_top_k_idxs
+from harmony.matching.catalogue_index import CatalogueIndex
+
+
+def make_catalogue_index(num_questions=2000, num_dimensions=32, num_topics=40):
+    rng = np.random.default_rng(1)
+    topic_centres = rng.normal(size=(num_topics, num_dimensions))
+    embeddings = topic_centres[rng.integers(0, num_topics, num_questions)] + rng.normal(
+        scale=0.3, size=(num_questions, num_dimensions))
+    return CatalogueIndex(
+        all_questions=[f"question {i}" for i in range(num_questions)],
+        all_instruments=[{"instrument_name": "instrument", "metadata": {"source": "test"}}],
+        instrument_idx_to_question_idx=[list(range(num_questions))],
+        embeddings=embeddings,
+    ), rng.normal(size=(20, num_dimensions)) + topic_centres[:20]
+
+
+class TestAnnIndex(unittest.TestCase):
+
+    def test_top_k_ties_give_distinct_idxs(self):
+        top = get_top_k_idxs(np.array([[0.5, 0.9, 0.5, 0.9, 0.1]]), 4)
+
+        self.assertEqual([[1, 3, 0, 2]], top.tolist())
+
+    def test_exact_search(self):
+        catalogue_index, queries = make_catalogue_index()
+
+        idxs, similarities = catalogue_index.search(queries, 10)
+
+        expected = np.argsort(-catalogue_index.cosine_similarities(queries), axis=1, kind="stable")[:, :10]
+        self.assertEqual(expected.tolist(), [i.tolist() for i in idxs])
+        self.assertTrue(all(np.all(np.diff(s) <= 0) for s in similarities))
+
+    def test_probing_all_lists_is_exact(self):
+        catalogue_index, queries = make_catalogue_index()
+        ann_index = catalogue_index.build_ann_index()
+
+        exact_idxs, _ = catalogue_index.search(queries, 10)
+        ann_idxs, _ = catalogue_index.search(queries, 10, n_probe=ann_index.n_lists)
+
+        self.assertEqual([i.tolist() for i in exact_idxs], [i.tolist() for i in ann_idxs])
+
+    def test_recall(self):
+        catalogue_index, queries = make_catalogue_index()
+        catalogue_index.build_ann_index()
+
+        exact_idxs, _ = catalogue_index.search(queries, 10)
+        ann_idxs, _ = catalogue_index.search(queries, 10, n_probe=8)
+
+        recall = np.mean([len(set(e) & set(a)) / len(e) for e, a in zip(exact_idxs, ann_idxs)])
+        self.assertGreater(recall, 0.9)
+
+    def test_save_and_load(self):
+        catalogue_index, queries = make_catalogue_index()
+        catalogue_index.build_ann_index()
+
+        with tempfile.TemporaryDirectory() as folder:
+            catalogue_index.save(folder)
+            loaded = CatalogueIndex.load(folder)
+
+            self.assertIsInstance(loaded.ann_index, IvfIndex)
+            self.assertEqual([i.tolist() for i in catalogue_index.search(queries, 5, n_probe=4)[0]],
+                             [i.tolist() for i in loaded.search(queries, 5, n_probe=4)[0]])
+
+            del loaded
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import asyncio
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.async_matcher import amatch_instruments_with_function
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+
+class AsyncVectoriser:
+    def __init__(self):
+        self.texts = []
+        self.num_in_flight = 0
+        self.max_num_in_flight = 0
+
+    async def __call__(self, texts):
+        self.texts.extend(texts)
+        self.num_in_flight += 1
+        self.max_num_in_flight = max(self.max_num_in_flight, self.num_in_flight)
+        await asyncio.sleep(0.01)
+        self.num_in_flight -= 1
+        return vectorise(texts).tolist()
+
+
+def make_instruments():
+    return [
+        Instrument(instrument_name="A", questions=[
+            Question(question_text=f"I feel anxious {i}", options=["Not at all", "Several days"]) for i in range(20)
+        ]),
+        Instrument(instrument_name="B", questions=[
+            Question(question_text=f"I cannot sleep {i}", options=["Yes", "No"]) for i in range(15)
+        ]),
+    ]
+
+
+class TestAsyncMatcher(unittest.TestCase):
+
+    def test_same_result_as_sync(self):
+        expected = match_instruments_with_function(make_instruments(), "sleep", vectorise, topics=["sleep"])
+
+        vectoriser = AsyncVectoriser()
+        actual = asyncio.run(amatch_instruments_with_function(make_instruments(), "sleep", vectoriser,
+                                                              topics=["sleep"], batch_size=8, max_concurrency=3))
+
+        self.assertTrue(np.array_equal(expected.similarity_with_polarity, actual.similarity_with_polarity))
+        self.assertTrue(np.array_equal(expected.query_similarity, actual.query_similarity))
+        self.assertTrue(np.array_equal(expected.response_options_similarity, actual.response_options_similarity))
+        self.assertEqual(list(expected.new_vectors_dict), list(actual.new_vectors_dict))
+        self.assertEqual([c.item_ids for c in expected.clusters], [c.item_ids for c in actual.clusters])
+        self.assertEqual([q.topics for q in expected.questions], [q.topics for q in actual.questions])
+        self.assertEqual([s.f1 for s in expected.instrument_to_instrument_similarities],
+                         [s.f1 for s in actual.instrument_to_instrument_similarities])
+
+        # Each text is encoded once, with several batches in flight but never more than allowed
+        self.assertEqual(len(set(vectoriser.texts)), len(vectoriser.texts))
+        self.assertTrue(1 < vectoriser.max_num_in_flight <= 3)
+
+    def test_uses_cache(self):
+        texts_cached_vectors = {f"I feel anxious {i}": vectorise([f"I feel anxious {i}"])[0].tolist()
+                                for i in range(20)}
+        vectoriser = AsyncVectoriser()
+        asyncio.run(amatch_instruments_with_function(make_instruments(), None, vectoriser, is_negate=False,
+                                                     texts_cached_vectors=texts_cached_vectors))
+        self.assertFalse(set(vectoriser.texts) & set(texts_cached_vectors))
+
+    def test_vectoriser_error(self):
+        async def failing_vectoriser(texts):
+            raise RuntimeError("model unavailable")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(amatch_instruments_with_function(make_instruments(), None, failing_vectoriser))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.catalogue_index import CatalogueIndex
+from harmony.matching.matcher import match_query_with_catalogue_instruments
+
+
+def make_catalogue_data():
+    return {
+        "all_questions": ["I feel anxious", "I feel sad", "I sleep badly"],
+        "all_embeddings_concatenated": np.array([
+            [3., 0., 0.],
+            [0., 2., 0.],
+            [0., 1., 1.]
+        ]),
+        "all_instruments": [
+            {"instrument_name": "GAD-7", "questions": [{"question_text": "I feel anxious"}],
+             "metadata": {"source": "harmony"}},
+            {"instrument_name": "PHQ-9", "questions": [{"question_text": "I feel sad"},
+                                                       {"question_text": "I sleep badly"}],
+             "metadata": {"source": "harmony"}},
+        ],
+        "instrument_idx_to_question_idx": [[0], [1, 2]],
+    }
+
+
+class TestCatalogueIndex(unittest.TestCase):
+
+    def test_embeddings_are_normalised_float32(self):
+        catalogue_index = CatalogueIndex.from_catalogue_data(make_catalogue_data())
+
+        self.assertEqual(np.float32, catalogue_index.embeddings.dtype)
+        self.assertTrue(np.allclose(np.linalg.norm(catalogue_index.embeddings, axis=1), 1.))
+
+    def test_cosine_similarities(self):
+        catalogue_index = CatalogueIndex.from_catalogue_data(make_catalogue_data())
+
+        similarities = catalogue_index.cosine_similarities(np.array([[0., 5., 0.]]))
+
+        self.assertTrue(np.allclose([[0., 1., np.sqrt(0.5)]], similarities))
+
+    def test_save_and_load_memory_mapped(self):
+        catalogue_index = CatalogueIndex.from_catalogue_data(make_catalogue_data())
+
+        with tempfile.TemporaryDirectory() as folder:
+            catalogue_index.save(folder)
+            loaded = CatalogueIndex.load(folder)
+
+            self.assertIsInstance(loaded.embeddings, np.memmap)
+            self.assertTrue(np.array_equal(catalogue_index.embeddings, loaded.embeddings))
+            self.assertEqual(catalogue_index.all_questions, loaded.all_questions)
+            self.assertEqual(catalogue_index.all_instruments, loaded.all_instruments)
+            self.assertEqual(catalogue_index.question_idx_to_instrument_idxs.tolist(),
+                             loaded.question_idx_to_instrument_idxs.tolist())
+
+            response = match_query_with_catalogue_instruments("sad", loaded, lambda texts: np.array([[0., 1., 0.]]),
+                                                              {}, max_results=1)
+            self.assertEqual(["PHQ-9"], [i.instrument_name for i in response["instruments"]])
+
+            del loaded, response
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.catalogue_index import get_catalogue_index
+from harmony.matching.matcher import match_questions_with_catalogue_instruments
+from harmony.schemas.requests.text import Question
+from harmony.schemas.text_vector import TextVector
+
+
+def make_catalogue_data():
+    return {
+        "all_questions": ["I feel anxious", "I feel sad", "I sleep badly", "I eat too much"],
+        "all_embeddings_concatenated": np.array([
+            [1., 0., 0., 0.],
+            [0., 1., 0., 0.],
+            [0., 0., 1., 0.],
+            [0., 0., 0., 1.]
+        ]),
+        "all_instruments": [
+            {"instrument_name": "GAD-7", "metadata": {"source": "harmony", "url": "https://example.com/gad7"}},
+            {"instrument_name": "PHQ-9", "metadata": {"source": "harmony", "sweep_id": "1"}},
+            {"instrument_name": "PHQ-9", "metadata": {"source": "harmony", "sweep_id": "2"}},
+        ],
+        "instrument_idx_to_question_idx": [[0], [1, 2, 2], [1, 2, 3]],
+    }
+
+
+class TestCatalogueInvertedIndex(unittest.TestCase):
+
+    def test_inverted_index(self):
+        catalogue_index = get_catalogue_index(make_catalogue_data())
+
+        self.assertEqual([0, 1, 3, 5, 6], catalogue_index.question_idx_to_instrument_idxs_indptr.tolist())
+        self.assertEqual([0, 1, 2, 1, 2, 2], catalogue_index.question_idx_to_instrument_idxs.tolist())
+        self.assertEqual([1, 2], catalogue_index.get_instrument_idxs_for_question(2).tolist())
+        self.assertEqual([1, 2, 3], catalogue_index.instrument_idx_to_num_questions.tolist())
+
+    def test_inverted_index_is_built_once(self):
+        catalogue_data = make_catalogue_data()
+        first = get_catalogue_index(catalogue_data)
+        second = get_catalogue_index(catalogue_data)
+
+        self.assertIs(first, second)
+        self.assertNotIn("catalogue_index", catalogue_data)
+
+    def test_inverted_index_is_rebuilt_for_new_embeddings(self):
+        catalogue_data = make_catalogue_data()
+        first = get_catalogue_index(catalogue_data)
+        catalogue_data["all_embeddings_concatenated"] = np.array(catalogue_data["all_embeddings_concatenated"]) * 2
+        self.assertIsNot(first, get_catalogue_index(catalogue_data))
+
+    def test_match_questions_with_catalogue_instruments(self):
+        catalogue_data = make_catalogue_data()
+        questions = [Question(question_text="sad"), Question(question_text="sleep"), Question(question_text="worry")]
+        text_vectors = [
+            TextVector(text="sad", vector=[0.1, 0.9, 0., 0.], is_negated=False, is_query=False),
+            TextVector(text="sleep", vector=[0., 0.2, 0.8, 0.], is_negated=False, is_query=False),
+            TextVector(text="worry", vector=[0.7, 0., 0., 0.1], is_negated=False, is_query=False),
+        ]
+
+        top_instruments = match_questions_with_catalogue_instruments(
+            questions=questions,
+            catalogue_data=catalogue_data,
+            all_instruments_text_vectors=text_vectors,
+            questions_are_from_one_instrument=True,
+        )
+
+        self.assertEqual(["PHQ-9", "PHQ-9", "GAD-7"], [i.instrument_name for i in top_instruments])
+        self.assertEqual(["1", "2", ""], [i.sweep for i in top_instruments])
+        self.assertEqual(2, top_instruments[0].metadata["num_matched_questions"])
+        self.assertEqual(2, top_instruments[0].metadata["num_ref_instrument_questions"])
+        self.assertEqual(3, top_instruments[1].metadata["num_ref_instrument_questions"])
+        self.assertAlmostEqual(
+            np.mean([0.9 / np.linalg.norm([0.1, 0.9]), 0.8 / np.linalg.norm([0.2, 0.8])]),
+            top_instruments[0].metadata["mean_cosine_similarity"]
+        )
+
+        # The instruments with the same name are only listed once per question
+        self.assertEqual("I feel sad", questions[0].closest_catalogue_question_match.question)
+        self.assertEqual(["PHQ-9"],
+                         [i.instrument_name for i in questions[0].closest_catalogue_question_match.seen_in_instruments])
+        self.assertEqual(["GAD-7"],
+                         [i.instrument_name for i in questions[2].closest_catalogue_question_match.seen_in_instruments])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+sys.path.append("../src")
+
+from harmony.matching.generate_cluster_topics import ClassTfidfKeywordExtractor, generate_cluster_topics, \
+    get_top_k_per_row
+from harmony.schemas.requests.text import Question
+from harmony.schemas.responses.text import HarmonyCluster
+
+
+def make_cluster(cluster_id, texts):
+    items = [Question(question_no=str(i), question_text=text) for i, text in enumerate(texts)]
+    return HarmonyCluster(cluster_id=cluster_id, centroid_id=0, centroid=items[0],
+                          item_ids=list(range(len(items))), items=items, text_description="", keywords=[])
+
+
+class TestClassTfidfKeywords(unittest.TestCase):
+
+    def test_top_k_per_row(self):
+        scores = csr_matrix(np.array([[0.1, 0.5, 0., 0.3],
+                                      [0., 0., 0., 0.],
+                                      [0.2, 0.2, 0.2, 0.9]]))
+        top = get_top_k_per_row(scores, 2)
+        self.assertEqual([0.5, 0.3], scores[0].toarray()[0][top[0]].tolist())
+        self.assertEqual([1, 3], top[0].tolist())
+        self.assertEqual([], top[1].tolist())
+        # Ties go to the lower column
+        self.assertEqual([3, 0], top[2].tolist())
+        self.assertEqual([3, 0, 1, 2], get_top_k_per_row(scores, 10)[2].tolist())
+
+    def test_scores_match_dense_formula(self):
+        cluster_texts = [["anxious nervous anxious", "worry"], ["worry worry sleep"], ["sleep tired"]]
+        extractor = ClassTfidfKeywordExtractor().fit(cluster_texts)
+        vocabulary = extractor.vocabulary_.tolist()
+        self.assertEqual(["anxious", "nervous", "sleep", "tired", "worry"], vocabulary)
+
+        counts = np.array([[2, 1, 0, 0, 1],
+                           [0, 0, 1, 0, 2],
+                           [0, 0, 1, 1, 0]], dtype=float)
+        expected = counts / counts.sum(axis=1, keepdims=True) * \
+            np.log(1 + counts.sum() / len(counts) / counts.sum(axis=0))
+        self.assertTrue(np.allclose(expected, extractor.scores_.toarray()))
+
+        self.assertEqual([["anxious", "nervous"], ["worry", "sleep"], ["tired", "sleep"]],
+                         extractor.get_keywords(2))
+
+    def test_keywords_come_from_own_cluster_and_skip_stopwords(self):
+        cluster_texts = [["I feel nervous and anxious", "Feeling nervous about the future"],
+                         ["Trouble relaxing", "Trouble sleeping at night"]]
+        keywords = ClassTfidfKeywordExtractor(stopwords={"and", "about", "the", "at"}).fit(cluster_texts) \
+            .get_keywords(10)
+        self.assertEqual("nervous", keywords[0][0])
+        self.assertEqual("trouble", keywords[1][0])
+        self.assertEqual({"feel", "nervous", "anxious", "feeling", "future"}, set(keywords[0]))
+        self.assertEqual({"trouble", "relaxing", "sleeping", "night"}, set(keywords[1]))
+
+    def test_no_words(self):
+        keywords = ClassTfidfKeywordExtractor().fit([["1 2 3"], [], ["?"]]).get_keywords(5)
+        self.assertEqual([[], [], []], keywords)
+
+    def test_generate_cluster_topics(self):
+        clusters = [make_cluster(0, ["Feeling nervous, anxious or on edge",
+                                     "Feeling afraid, as if something awful might happen"]),
+                    make_cluster(1, ["Trouble relaxing", "Being so restless that it is hard to sit still"])]
+        topics = generate_cluster_topics(clusters, top_k_topics=3)
+        self.assertEqual(2, len(topics))
+        for keywords in topics:
+            self.assertEqual(3, len(keywords))
+        self.assertIn("feeling", topics[0])
+        self.assertNotIn("the", topics[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
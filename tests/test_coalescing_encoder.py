@@ -0,0 +1,120 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.coalescing_encoder import CoalescingEncoder
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+
+class SlowVectoriser:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        time.sleep(0.02)
+        return vectorise(texts)
+
+
+class TestCoalescingEncoder(unittest.TestCase):
+
+    def test_coalesces_concurrent_callers(self):
+        vectoriser = SlowVectoriser()
+        results = {}
+        with CoalescingEncoder(vectoriser, max_batch_size=256, max_wait_seconds=0.05) as encoder:
+            def call(caller_idx):
+                texts = [f"text {caller_idx} {i}" for i in range(4)] + ["shared text"]
+                results[caller_idx] = (texts, encoder(texts))
+
+            threads = [threading.Thread(target=call, args=(caller_idx,)) for caller_idx in range(16)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(16, len(results))
+        for texts, vectors in results.values():
+            self.assertTrue(np.allclose(vectorise(texts), vectors))
+        self.assertLess(len(vectoriser.batches), 16)
+        # Each distinct text is encoded once per batch
+        for batch in vectoriser.batches:
+            self.assertEqual(len(set(batch)), len(batch))
+
+    def test_max_batch_size(self):
+        vectoriser = SlowVectoriser()
+        with CoalescingEncoder(vectoriser, max_batch_size=10, max_wait_seconds=1) as encoder:
+            futures = [encoder.submit([f"text {i} {j}" for j in range(5)]) for i in range(6)]
+            for future in futures:
+                self.assertEqual((5, 8), future.result(timeout=5).shape)
+        self.assertTrue(all(len(batch) <= 10 for batch in vectoriser.batches))
+
+    def test_deadline(self):
+        with CoalescingEncoder(vectorise, max_batch_size=1000, max_wait_seconds=0.01) as encoder:
+            start_time = time.monotonic()
+            vectors = encoder(["a lonely text"])
+            self.assertLess(time.monotonic() - start_time, 1)
+        self.assertTrue(np.allclose(vectorise(["a lonely text"]), vectors))
+
+    def test_error(self):
+        def failing_vectoriser(texts):
+            if "bad text" in texts:
+                raise RuntimeError("model unavailable")
+            return vectorise(texts)
+
+        with CoalescingEncoder(failing_vectoriser) as encoder:
+            with self.assertRaises(RuntimeError):
+                encoder(["bad text"])
+            # The encoder keeps working after an error
+            self.assertEqual((1, 8), encoder(["good text"]).shape)
+            self.assertEqual((0, 0), encoder([]).shape)
+
+    def test_closed(self):
+        encoder = CoalescingEncoder(vectorise)
+        encoder.close()
+        with self.assertRaises(RuntimeError):
+            encoder(["text"])
+
+    def test_as_vectorisation_function(self):
+        instrument = Instrument(questions=[Question(question_text=f"I feel anxious {i}") for i in range(5)])
+        expected = match_instruments_with_function([instrument], None, vectorise)
+        with CoalescingEncoder(vectorise) as encoder:
+            actual = match_instruments_with_function([instrument], None, encoder)
+        self.assertTrue(np.array_equal(expected.similarity_with_polarity, actual.similarity_with_polarity))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+sys.path.append("../src")
+
+from harmony.matching.matcher import create_full_text_vectors, vectorise_texts
+from harmony.schemas.text_vector import TextVector
+from tests.fake_vectorisers import CountingVectoriser, vectorise
+
+
+class TestDeduplicatedEncoding(unittest.TestCase):
+
+    def test_each_unique_text_is_encoded_once(self):
+        vectoriser = CountingVectoriser()
+        questions = ["I feel nervous", "I feel nervous", "Not at all", "I feel nervous"]
+
+        text_vectors, new_vectors_dict = create_full_text_vectors(questions, "I feel nervous", vectoriser, {},
+                                                                  is_negate=False)
+
+        self.assertEqual([["I feel nervous", "Not at all"]], vectoriser.calls)
+        self.assertEqual(["I feel nervous", "Not at all"], list(new_vectors_dict))
+        self.assertEqual(9, len(text_vectors))
+        nervous, not_at_all = vectorise(["I feel nervous", "Not at all"]).tolist()
+        self.assertEqual([nervous] * 4 + [not_at_all] * 2 + [nervous] * 3,
+                         [text_vector.vector for text_vector in text_vectors])
+
+    def test_cached_texts_are_not_encoded(self):
+        vectoriser = CountingVectoriser()
+
+        text_vectors, new_vectors_dict = create_full_text_vectors(
+            ["I feel nervous", "I am happy"], None, vectoriser, {"I feel nervous": [0.] * 8}, is_negate=True)
+
+        self.assertEqual([["never I feel nervous", "I am happy", "I am not happy"]], vectoriser.calls)
+        self.assertEqual([0.] * 8, text_vectors[0].vector)
+
+    def test_vectorise_texts_batches(self):
+        vectoriser = CountingVectoriser()
+        text_vectors = [TextVector(text=text, vector=[], is_negated=False, is_query=False) for text in
+                        ["a", "bb", "a"]]
+
+        vectorise_texts(text_vectors, vectoriser)
+
+        self.assertEqual([["a", "bb"]], vectoriser.calls)
+        a, bb = vectorise(["a", "bb"]).tolist()
+        self.assertEqual([a, bb, a], [text_vector.vector for text_vector in text_vectors])
+
+
+if __name__ == '__main__':
+    unittest.main()
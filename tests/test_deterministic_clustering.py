@@ -56,6 +56,17 @@ class TestDeterministicClustering(unittest.TestCase):
         clusters = find_clusters_deterministic(questions, item_to_item_similarity_matrix)
         self.assertEqual(1, len(clusters))
 
+    def test_clusters_are_unchanged(self):
+        questions = create_instrument_from_list([f"Question {i}" for i in range(12)], []).questions
+        vectors = np.random.RandomState(1).normal(size=(12, 3))
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        item_to_item_similarity_matrix = np.round(vectors @ vectors.T, 2)
+        np.fill_diagonal(item_to_item_similarity_matrix, 1)
+        clusters = find_clusters_deterministic(questions, item_to_item_similarity_matrix)
+        self.assertEqual([(8, [0, 9, 8, 2]), (6, [4, 6, 3, 1]), (5, [5, 10]), (7, [7, 11])],
+                         [(cluster.centroid_id, cluster.item_ids) for cluster in clusters])
+        self.assertEqual(list(range(4)), [cluster.cluster_id for cluster in clusters])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,131 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import importlib.util
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.examples import example_instruments
+from harmony.matching.embedding_backend import get_default_embedding_backend, get_onnx_model_dir, \
+    get_onnx_quantisation_config, load_sentence_transformer
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.schemas.enums.embedding_backend import EmbeddingBackend
+
+sentence_transformer_path = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+is_onnx_available = importlib.util.find_spec("onnxruntime") is not None and importlib.util.find_spec(
+    "optimum") is not None
+
+
+class TestEmbeddingBackend(unittest.TestCase):
+
+    def test_onnx_model_dir(self):
+        with mock.patch.dict(os.environ, {"HARMONY_ONNX_PATH": "/tmp/harmony_onnx"}):
+            self.assertEqual("/tmp/harmony_onnx/sentence-transformers_paraphrase-multilingual-MiniLM-L12-v2",
+                             get_onnx_model_dir(sentence_transformer_path))
+
+    def test_quantisation_config(self):
+        with mock.patch.dict(os.environ, {"HARMONY_ONNX_QUANTISATION_CONFIG": "avx2"}):
+            self.assertEqual("avx2", get_onnx_quantisation_config())
+        with mock.patch.dict(os.environ, {"HARMONY_ONNX_QUANTISATION_CONFIG": ""}):
+            self.assertIn(get_onnx_quantisation_config(), ["arm64", "avx2", "avx512", "avx512_vnni"])
+
+    def test_quantisation_config_from_cpu_flags(self):
+        flags_to_config = [
+            ({"sse4_2", "avx2", "avx512f", "avx512_vnni"}, "avx512_vnni"),
+            ({"avx2", "avx512f", "avx512vnni"}, "avx512_vnni"),
+            ({"avx2", "avx512f"}, "avx512"),
+            ({"avx2"}, "avx2"),
+            (set(), "avx2"),
+        ]
+        with mock.patch.dict(os.environ, {"HARMONY_ONNX_QUANTISATION_CONFIG": ""}), \
+                mock.patch("platform.machine", return_value="x86_64"):
+            for flags, config in flags_to_config:
+                with mock.patch("harmony.matching.embedding_backend.get_cpu_flags", return_value=frozenset(flags)):
+                    self.assertEqual(config, get_onnx_quantisation_config())
+            with mock.patch("platform.machine", return_value="aarch64"):
+                self.assertEqual("arm64", get_onnx_quantisation_config())
+            with mock.patch.dict(os.environ, {"HARMONY_ONNX_QUANTISATION_CONFIG": "avx1024"}), \
+                    mock.patch("harmony.matching.embedding_backend.get_cpu_flags", return_value=frozenset({"avx2"})):
+                with self.assertWarns(UserWarning):
+                    self.assertEqual("avx2", get_onnx_quantisation_config())
+
+    def test_default_backend_from_environment(self):
+        with mock.patch.dict(os.environ, {"HARMONY_EMBEDDING_BACKEND": ""}):
+            self.assertEqual(EmbeddingBackend.torch, get_default_embedding_backend())
+        with mock.patch.dict(os.environ, {"HARMONY_EMBEDDING_BACKEND": "ONNX_int8"}):
+            self.assertEqual(EmbeddingBackend.onnx_int8, get_default_embedding_backend())
+        with mock.patch.dict(os.environ, {"HARMONY_EMBEDDING_BACKEND": "tensorrt"}):
+            with self.assertWarns(UserWarning):
+                self.assertEqual(EmbeddingBackend.torch, get_default_embedding_backend())
+
+    def test_invalid_backend(self):
+        with self.assertRaises(ValueError):
+            load_sentence_transformer(sentence_transformer_path, "tensorflow")
+
+
+@unittest.skipUnless(is_onnx_available, "optimum and onnxruntime are not installed (pip install harmonydata[onnx])")
+class TestOnnxBackendParity(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.instruments = [example_instruments["GAD-7 English"], example_instruments["GAD-7 Portuguese"]]
+        cls.texts = [question.question_text for instrument in cls.instruments for question in instrument.questions]
+        cls.torch_model = load_sentence_transformer(sentence_transformer_path, EmbeddingBackend.torch)
+
+    def assert_parity(self, backend, min_cosine_similarity, max_similarity_difference):
+        model = load_sentence_transformer(sentence_transformer_path, backend)
+
+        torch_vectors = self.torch_model.encode(self.texts, convert_to_numpy=True)
+        vectors = model.encode(self.texts, convert_to_numpy=True)
+        self.assertEqual(torch_vectors.shape, vectors.shape)
+        cosine_similarities = np.sum(torch_vectors * vectors, axis=1) / (
+                np.linalg.norm(torch_vectors, axis=1) * np.linalg.norm(vectors, axis=1))
+        self.assertGreater(np.min(cosine_similarities), min_cosine_similarity)
+
+        torch_match = match_instruments_with_function(
+            self.instruments, None, lambda texts: self.torch_model.encode(texts, convert_to_numpy=True))
+        match = match_instruments_with_function(self.instruments, None,
+                                                lambda texts: model.encode(texts, convert_to_numpy=True))
+        self.assertLess(np.max(np.abs(torch_match.similarity_with_polarity - match.similarity_with_polarity)),
+                        max_similarity_difference)
+
+    def test_onnx_parity(self):
+        self.assert_parity(EmbeddingBackend.onnx, 0.999, 0.01)
+
+    def test_onnx_int8_parity(self):
+        self.assert_parity(EmbeddingBackend.onnx_int8, 0.95, 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.embedding_cache import LruEmbeddingCache, SqliteEmbeddingCache
+from harmony.matching.matcher import create_full_text_vectors
+from tests.fake_vectorisers import CountingVectoriser, vectorise
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def test_lru_cache_evicts_to_byte_budget(self):
+        # Each vector of 4 float32s is 16 bytes
+        cache = LruEmbeddingCache("model", max_bytes=32)
+        cache["a"] = [1., 2., 3., 4.]
+        cache["b"] = [5., 6., 7., 8.]
+        self.assertEqual([1., 2., 3., 4.], cache["a"])
+
+        cache["c"] = [9., 10., 11., 12.]
+
+        self.assertEqual(2, len(cache))
+        self.assertEqual(32, cache.num_bytes)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+
+    def test_keys_are_normalised_text_per_model(self):
+        cache = LruEmbeddingCache("model")
+        cache["I feel  nervous "] = [1., 2.]
+
+        self.assertEqual([1., 2.], cache.get("I feel nervous"))
+        self.assertIsNone(LruEmbeddingCache("other model").get("I feel nervous"))
+
+    def test_sqlite_cache_persists(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "embeddings.db")
+            cache = SqliteEmbeddingCache("model", path)
+            cache.update({"a": np.array([1., 2.]), "b": np.array([3., 4.])})
+            cache.close()
+
+            cache = SqliteEmbeddingCache("model", path)
+            self.assertEqual(2, len(cache))
+            self.assertEqual([3., 4.], cache["b"])
+            self.assertIsNone(cache.get("c"))
+            self.assertEqual(0, len(SqliteEmbeddingCache("other model", path)))
+            cache.close()
+
+    def test_create_full_text_vectors_fills_cache(self):
+        cache = LruEmbeddingCache("model")
+        vectoriser = CountingVectoriser()
+
+        create_full_text_vectors(["I feel nervous", "I sleep well"], None, vectoriser, cache, is_negate=True)
+        self.assertEqual(4, len(cache))
+
+        vectoriser = CountingVectoriser()
+        text_vectors, new_vectors_dict = create_full_text_vectors(["I feel nervous"], "sleep", vectoriser, cache,
+                                                                  is_negate=True)
+        self.assertEqual(["sleep"], vectoriser.texts)
+        self.assertEqual(["sleep"], list(new_vectors_dict))
+        # The cache stores float32 vectors
+        np.testing.assert_allclose(vectorise(["I feel nervous"])[0], text_vectors[0].vector, rtol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
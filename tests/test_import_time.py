@@ -0,0 +1,76 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.append("../src")
+
+src_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# Seconds that a bare `import harmony` may take. Loading any model at import time takes far longer than this.
+IMPORT_TIME_BUDGET = float(os.environ.get("HARMONY_IMPORT_TIME_BUDGET", 10))
+
+import_harmony_script = """
+import json, sys, time
+start_time = time.perf_counter()
+import harmony
+import_time = time.perf_counter() - start_time
+print(json.dumps({"import_time": import_time, "modules": [m for m in sys.modules if m.split(".")[0] in
+                  ("torch", "transformers", "sentence_transformers")]}))
+"""
+
+
+def import_harmony_in_new_process() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = src_folder + os.pathsep + env.get("PYTHONPATH", "")
+    # Fail rather than download if anything tries to fetch a model at import time
+    env["HF_HUB_OFFLINE"] = "1"
+    env["TRANSFORMERS_OFFLINE"] = "1"
+    result = subprocess.run([sys.executable, "-c", import_harmony_script], env=env, capture_output=True, text=True,
+                            timeout=600)
+    if result.returncode != 0:
+        raise AssertionError("import harmony failed:\n" + result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_does_not_load_models(self):
+        self.assertEqual([], import_harmony_in_new_process()["modules"])
+
+    def test_import_time_budget(self):
+        import_time = import_harmony_in_new_process()["import_time"]
+        self.assertLess(import_time, IMPORT_TIME_BUDGET,
+                        f"import harmony took {import_time:.1f} s, over the budget of {IMPORT_TIME_BUDGET} s")
+
+
+if __name__ == '__main__':
+    unittest.main()
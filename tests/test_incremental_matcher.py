@@ -0,0 +1,152 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.incremental_matcher import update_match_result_with_function, get_updated_instruments
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import CountingVectoriser
+
+
+def make_instrument(name, question_texts):
+    return Instrument(instrument_id=name, instrument_name=name,
+                      questions=[Question(question_text=text, options=["Yes", "No"]) for text in question_texts])
+
+
+def make_instruments():
+    return [
+        make_instrument("A", ["I feel anxious", "I sleep badly", "I am not happy"]),
+        make_instrument("B", ["I feel nervous", "I cannot sleep"]),
+        make_instrument("C", ["I worry a lot", "I feel down", "I have no appetite", "I am tired"]),
+    ]
+
+
+def match(instruments, vectoriser):
+    return match_instruments_with_function(instruments, "sleep problems", vectoriser,
+                                           clustering_algorithm="deterministic")
+
+
+class TestIncrementalMatcher(unittest.TestCase):
+
+    def assert_same_match(self, expected, actual):
+        self.assertEqual([q.question_text for q in expected.questions], [q.question_text for q in actual.questions])
+        self.assertTrue(np.allclose(expected.similarity_with_polarity, actual.similarity_with_polarity, atol=1e-6))
+        self.assertTrue(np.allclose(expected.query_similarity, actual.query_similarity))
+        self.assertTrue(np.allclose(expected.response_options_similarity, actual.response_options_similarity))
+        self.assertEqual(
+            [(s.instrument_1_idx, s.instrument_2_idx, s.instrument_1_name, s.instrument_2_name)
+             for s in expected.instrument_to_instrument_similarities],
+            [(s.instrument_1_idx, s.instrument_2_idx, s.instrument_1_name, s.instrument_2_name)
+             for s in actual.instrument_to_instrument_similarities])
+        self.assertTrue(np.allclose([s.f1 for s in expected.instrument_to_instrument_similarities],
+                                    [s.f1 for s in actual.instrument_to_instrument_similarities]))
+        self.assertEqual([c.item_ids for c in expected.clusters], [c.item_ids for c in actual.clusters])
+
+    def test_add_instrument(self):
+        instruments = make_instruments()
+        match_result = match(instruments[:2], CountingVectoriser())
+
+        vectoriser = CountingVectoriser()
+        updated = update_match_result_with_function(match_result, instruments[:2], vectoriser,
+                                                    added_instruments=[instruments[2]], query="sleep problems",
+                                                    clustering_algorithm="deterministic")
+
+        # Only the added questions (and their negations) are encoded
+        encoded_questions = set(vectoriser.texts)
+        self.assertTrue(encoded_questions)
+        self.assertFalse(encoded_questions & {q.question_text for i in instruments[:2] for q in i.questions})
+        self.assertNotIn("yes; no", encoded_questions)
+
+        self.assert_same_match(match(make_instruments(), CountingVectoriser()), updated)
+
+    def test_update_updated_match(self):
+        instruments = make_instruments()
+        match_result = match(instruments[:1], CountingVectoriser())
+        updated = update_match_result_with_function(match_result, instruments[:1], CountingVectoriser(),
+                                                    added_instruments=[instruments[1]], query="sleep problems",
+                                                    clustering_algorithm="deterministic")
+        for text in ["I feel anxious", "I feel nervous", "yes; no"]:
+            self.assertIn(text, updated.new_vectors_dict)
+
+        vectoriser = CountingVectoriser()
+        updated_again = update_match_result_with_function(updated, instruments[:2], vectoriser,
+                                                          added_instruments=[instruments[2]], query="sleep problems",
+                                                          clustering_algorithm="deterministic")
+
+        # Neither the questions of the first match nor those added by the first update are encoded again
+        encoded_questions = set(vectoriser.texts)
+        self.assertTrue(encoded_questions)
+        self.assertFalse(encoded_questions & {q.question_text for i in instruments[:2] for q in i.questions})
+        self.assertLessEqual(set(updated.new_vectors_dict), set(updated_again.new_vectors_dict))
+
+        self.assert_same_match(match(make_instruments(), CountingVectoriser()), updated_again)
+
+    def test_remove_instrument(self):
+        instruments = make_instruments()
+        match_result = match(instruments, CountingVectoriser())
+
+        vectoriser = CountingVectoriser()
+        updated = update_match_result_with_function(match_result, instruments, vectoriser,
+                                                    removed_instrument_ids=["B"], query="sleep problems",
+                                                    clustering_algorithm="deterministic")
+        # The response options were encoded in the earlier match, so nothing is encoded
+        self.assertEqual([], vectoriser.texts)
+
+        expected_instruments = get_updated_instruments(make_instruments(), removed_instrument_ids=["B"])
+        self.assertEqual(["A", "C"], [instrument.instrument_id for instrument in expected_instruments])
+        self.assert_same_match(match(expected_instruments, CountingVectoriser()), updated)
+
+    def test_add_and_remove_instruments(self):
+        instruments = make_instruments()
+        match_result = match(instruments[:2], CountingVectoriser())
+        updated = update_match_result_with_function(match_result, instruments[:2], CountingVectoriser(),
+                                                    added_instruments=[instruments[2]], removed_instrument_ids=["A"],
+                                                    query="sleep problems", clustering_algorithm="deterministic")
+        self.assert_same_match(match(make_instruments()[1:], CountingVectoriser()), updated)
+
+    def test_tags_added_questions_with_topics(self):
+        instruments = make_instruments()
+        match_result = match(instruments[:1], CountingVectoriser())
+        updated = update_match_result_with_function(match_result, instruments[:1], CountingVectoriser(),
+                                                    added_instruments=instruments[1:2], topics=["sleep"])
+        self.assertEqual(["sleep"], updated.questions[-1].topics)
+
+    def test_wrong_instruments(self):
+        instruments = make_instruments()
+        match_result = match(instruments[:2], CountingVectoriser())
+        with self.assertRaises(ValueError):
+            update_match_result_with_function(match_result, instruments, CountingVectoriser())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+from collections import Counter
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.mhc_index import MhcIndex
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+
+def get_group_topics_reference(item_idxs, group_idxs, mhc_all_metadatas):
+    ctrs = {}
+    for item_idx, group_idx in zip(item_idxs, group_idxs):
+        if item_idx < 0:
+            continue
+        if group_idx not in ctrs:
+            ctrs[group_idx] = Counter()
+        for topic in mhc_all_metadatas[item_idx]["topics"]:
+            ctrs[group_idx][topic] += 1
+    group_topics = {}
+    for group_idx, counts in ctrs.items():
+        max_count = max(counts.values())
+        group_topics[group_idx] = [topic for topic, topic_count in counts.items() if topic_count > max_count / 2]
+    return group_topics
+
+
+class TestMhcIndex(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(1)
+        self.mhc_questions = [Question(question_text=f"mhc question {i}") for i in range(30)]
+        self.mhc_questions[3] = Question.model_construct(question_text="ab")
+        self.mhc_all_metadatas = [{"topics": [f"topic {t}" for t in random_state.choice(8, random_state.randint(0, 4),
+                                                                                        replace=False)]}
+                                  for _ in range(30)]
+        self.mhc_embeddings = random_state.normal(size=(30, 16))
+        self.mhc_index = MhcIndex(self.mhc_questions, self.mhc_all_metadatas, self.mhc_embeddings)
+        self.vectors = random_state.normal(size=(200, 16))
+
+    def test_nearest_items_skip_invalid_questions(self):
+        item_idxs, strengths = self.mhc_index.get_nearest_items(self.vectors)
+        similarities = self.vectors @ self.mhc_embeddings.T / np.outer(np.linalg.norm(self.vectors, axis=1),
+                                                                       np.linalg.norm(self.mhc_embeddings, axis=1))
+        similarities[:, 3] = -np.inf
+        np.testing.assert_array_equal(np.argmax(similarities, axis=1), item_idxs)
+        np.testing.assert_allclose(np.max(similarities, axis=1), strengths, atol=1e-5)
+
+    def test_no_valid_questions(self):
+        mhc_index = MhcIndex([Question.model_construct(question_text="")], [{"topics": ["a"]}], np.ones((1, 16)))
+        item_idxs, _ = mhc_index.get_nearest_items(self.vectors[:2])
+        self.assertEqual([-1, -1], item_idxs.tolist())
+
+    def test_group_topics_match_counter_voting(self):
+        random_state = np.random.RandomState(2)
+        item_idxs = random_state.randint(-1, 30, size=200)
+        group_idxs = random_state.randint(0, 7, size=200)
+        expected = get_group_topics_reference(item_idxs, group_idxs, self.mhc_all_metadatas)
+        actual = self.mhc_index.get_group_topics(item_idxs, group_idxs, 7)
+        for group_idx in range(7):
+            self.assertEqual(expected.get(group_idx, []), actual[group_idx])
+
+    def test_match_with_prebuilt_index(self):
+        instruments = [Instrument(instrument_id=instrument_id, questions=[Question(question_text=text) for text in texts])
+                       for instrument_id, texts in [("a", ["I feel nervous", "I feel anxious"]),
+                                                    ("b", ["I sleep badly", "I feel happy", "I am tired"])]]
+        mhc_embeddings = vectorise([q.question_text for q in self.mhc_questions])
+        from_raw = match_instruments_with_function(instruments, None, vectorise, is_negate=False,
+                                                   mhc_questions=self.mhc_questions,
+                                                   mhc_all_metadatas=self.mhc_all_metadatas,
+                                                   mhc_embeddings=mhc_embeddings)
+        topics_auto = [q.topics_auto for q in from_raw.questions]
+        from_index = match_instruments_with_function(
+            instruments, None, vectorise, is_negate=False,
+            mhc_index=MhcIndex(self.mhc_questions, self.mhc_all_metadatas, mhc_embeddings)
+        )
+        self.assertEqual(topics_auto, [q.topics_auto for q in from_index.questions])
+        self.assertTrue(all(q.nearest_match_from_mhc_auto is not None for q in from_index.questions))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.models import ModelRegistry, get_memory_budget_from_environment, get_model_size_bytes
+
+MB = 1024 * 1024
+
+
+def make_loader(size_mb, loads):
+    def load():
+        loads.append(size_mb)
+        return np.zeros(int(size_mb * MB), dtype=np.uint8)
+
+    return load
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.loads = []
+        self.registry = ModelRegistry()
+        for name, size_mb in [("small", 1), ("medium", 2), ("large", 3)]:
+            self.registry.register(name, make_loader(size_mb, self.loads))
+
+    def test_lazy_load_once(self):
+        self.assertEqual([], self.loads)
+        self.assertFalse(self.registry.is_loaded("small"))
+        model = self.registry.get("small")
+        self.assertIs(model, self.registry.get("small"))
+        self.assertEqual([1], self.loads)
+        stats = self.registry.get_stats()["models"]["small"]
+        self.assertEqual((True, MB, 1, 1), (stats["is_loaded"], stats["size"], stats["num_loads"], stats["num_hits"]))
+
+    def test_unknown_model(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("missing")
+
+    def test_lru_eviction(self):
+        self.registry.set_memory_budget(4 * MB)
+        self.registry.get("small")
+        self.registry.get("medium")
+        self.registry.get("small")  # medium is now the least recently used
+        self.registry.get("large")
+        self.assertEqual(["small", "large"], list(self.registry.models))
+        self.assertEqual(4 * MB, self.registry.get_total_size())
+        self.assertEqual(1, self.registry.get_stats()["models"]["medium"]["num_evictions"])
+
+        # An evicted model is loaded again when it is needed
+        self.registry.get("medium")
+        self.assertEqual([1, 2, 3, 2], self.loads)
+        self.assertLessEqual(self.registry.get_total_size(), 4 * MB)
+
+    def test_model_larger_than_budget_is_kept(self):
+        self.registry.set_memory_budget(2 * MB)
+        self.registry.get("large")
+        self.assertTrue(self.registry.is_loaded("large"))
+
+    def test_lowering_budget_evicts(self):
+        self.registry.warm_up()
+        self.assertEqual(6 * MB, self.registry.get_total_size())
+        self.registry.set_memory_budget(3 * MB)
+        self.assertEqual(["large"], list(self.registry.models))
+
+    def test_warm_up(self):
+        self.assertEqual(["small", "medium"], self.registry.warm_up(["small", "medium"]))
+        self.assertEqual([1, 2], self.loads)
+
+    def test_unload_and_events(self):
+        events = []
+        self.registry.add_event_listener(lambda event, name, size: events.append((event, name, size)))
+        self.registry.set_memory_budget(3 * MB)
+        self.registry.get("medium")
+        self.registry.get("large")
+        self.assertTrue(self.registry.unload("large"))
+        self.assertFalse(self.registry.unload("large"))
+        self.assertEqual([("load", "medium", 2 * MB), ("load", "large", 3 * MB), ("evict", "medium", 2 * MB),
+                          ("unload", "large", 3 * MB)], events)
+        self.assertEqual(0, self.registry.get_total_size())
+
+    def test_concurrent_get_loads_once(self):
+        threads = [threading.Thread(target=self.registry.get, args=("large",)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([3], self.loads)
+
+    def test_get_is_not_blocked_by_another_model_loading(self):
+        self.registry.get("small")
+        loading = threading.Event()
+        release = threading.Event()
+
+        def load_slowly():
+            loading.set()
+            release.wait(10)
+            return np.zeros(MB, dtype=np.uint8)
+
+        self.registry.register("slow", load_slowly)
+        thread = threading.Thread(target=self.registry.get, args=("slow",))
+        thread.start()
+        self.assertTrue(loading.wait(10))
+        try:
+            # Both a loaded model and a model which needs loading are available while "slow" is loading
+            self.assertIsNotNone(self.registry.get("small"))
+            self.assertIsNotNone(self.registry.get("medium"))
+            self.assertFalse(self.registry.is_loaded("slow"))
+        finally:
+            release.set()
+            thread.join()
+        self.assertTrue(self.registry.is_loaded("slow"))
+        self.assertEqual(1, self.registry.get_stats()["models"]["slow"]["num_loads"])
+
+    def test_memory_budget_from_environment(self):
+        with mock.patch.dict(os.environ, {"HARMONY_MODEL_MEMORY_BUDGET_MB": "1.5"}):
+            self.assertEqual(int(1.5 * MB), get_memory_budget_from_environment())
+        with mock.patch.dict(os.environ, {"HARMONY_MODEL_MEMORY_BUDGET_MB": "2GB"}):
+            with self.assertWarns(UserWarning):
+                self.assertIsNone(get_memory_budget_from_environment())
+
+    def test_model_size(self):
+        self.assertEqual(30, get_model_size_bytes((np.zeros(10, dtype=np.uint8), np.zeros(5, dtype=np.float32))))
+        self.assertEqual(0, get_model_size_bytes("tokeniser"))
+
+
+if __name__ == '__main__':
+    unittest.main()
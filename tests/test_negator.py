@@ -29,7 +29,7 @@ import sys
 import unittest
 
 sys.path.append("../src")
-from harmony.matching.negator import negate
+from harmony.matching.negator import negate, negate_many, negate_with_rules
 
 
 class TestNegation(unittest.TestCase):
@@ -79,6 +79,23 @@ class TestNegation(unittest.TestCase):
     def test_simple_example_it(self):
         text = "mi sento depresso"
         self.assertEqual("non mi sento depresso", negate(text, "it"))
+
+    def test_negate_many(self):
+        texts = ["I feel depressed", "I never feel depressed", "", "I feel depressed"]
+        negated_texts, is_unchanged = negate_many(texts, "en")
+        self.assertEqual(["never I feel depressed", "I feel depressed", "", "never I feel depressed"], negated_texts)
+        self.assertEqual([False, False, True, False], is_unchanged)
+
+    def test_negate_many_unknown_language_uses_english(self):
+        self.assertEqual(negate_many(["I am happy"], "en"), negate_many(["I am happy"], "xx"))
+        self.assertEqual(["I am not happy"], negate_many(["I am happy"], "xx")[0])
+
+    def test_negation_is_memoised(self):
+        negate_with_rules.cache_clear()
+        for _ in range(3):
+            negate("I sometimes feel tired", "en")
+        self.assertEqual(1, negate_with_rules.cache_info().misses)
+        self.assertEqual(2, negate_with_rules.cache_info().hits)
     #
     # def test_simple_example_fr(self):
     #     text = "je me sens deprimé"
@@ -0,0 +1,86 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+sys.path.append("../src")
+
+import numpy as np
+
+from harmony.matching.polarity_similarity import get_similarity_with_polarity
+
+
+def cosine_similarity(vec1, vec2):
+    return np.dot(vec1, vec2.T) / np.outer(np.linalg.norm(vec1, axis=1), np.linalg.norm(vec2, axis=1))
+
+
+def get_similarity_with_polarity_reference(vectors_pos, vectors_neg):
+    pairwise_similarity = cosine_similarity(vectors_pos, vectors_pos)
+    pairwise_similarity_neg_mean = np.mean(
+        [cosine_similarity(vectors_neg, vectors_pos), cosine_similarity(vectors_pos, vectors_neg)], axis=0
+    )
+    similarity_difference = pairwise_similarity - pairwise_similarity_neg_mean
+    similarity_polarity = np.sign(similarity_difference)
+    similarity_polarity[np.abs(similarity_difference) < 1e-3] = 1
+    return np.max([pairwise_similarity, pairwise_similarity_neg_mean], axis=0) * similarity_polarity
+
+
+class TestPolaritySimilarity(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(1)
+        self.vectors_pos = random_state.normal(size=(37, 16))
+        # Negations are close to the original text but point partly the other way
+        self.vectors_neg = self.vectors_pos * 0.3 - random_state.normal(size=(37, 16))
+
+    def test_matches_reference(self):
+        expected = get_similarity_with_polarity_reference(self.vectors_pos, self.vectors_neg)
+        for tile_size in [1, 5, 16, 37, 1024]:
+            actual = get_similarity_with_polarity(self.vectors_pos, self.vectors_neg, tile_size=tile_size)
+            self.assertEqual(np.float32, actual.dtype)
+            np.testing.assert_allclose(expected, actual, atol=1e-5)
+
+    def test_result_is_symmetric_with_negative_polarities(self):
+        actual = get_similarity_with_polarity(self.vectors_pos, self.vectors_neg, tile_size=8)
+        np.testing.assert_array_equal(actual, actual.T)
+        self.assertTrue(np.any(actual < 0))
+
+    def test_writes_into_preallocated_output(self):
+        out = np.zeros((37, 37), dtype=np.float32)
+        actual = get_similarity_with_polarity(self.vectors_pos, self.vectors_neg, tile_size=10, out=out)
+        self.assertIs(out, actual)
+        np.testing.assert_allclose(get_similarity_with_polarity_reference(self.vectors_pos, self.vectors_neg), out,
+                                   atol=1e-5)
+
+    def test_mismatched_shapes(self):
+        with self.assertRaises(ValueError):
+            get_similarity_with_polarity(self.vectors_pos, self.vectors_neg[:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.catalogue_index import CatalogueIndex
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.process_pool_encoder import ProcessPoolEncoder
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+
+def vectorise_float32(texts):
+    return vectorise(texts, dtype=np.float32)
+
+
+def get_thread_count(texts):
+    return np.array([[int(os.environ["OMP_NUM_THREADS"]), os.getpid()] for _ in texts])
+
+
+def fail(texts):
+    raise ValueError("cannot encode")
+
+
+class TestProcessPoolEncoder(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.encoder = ProcessPoolEncoder(vectorise_float32, num_workers=2, threads_per_worker=1, shard_size=7)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.encoder.close()
+
+    def test_vectors_are_in_order(self):
+        texts = [f"text {i}" for i in range(100)]
+        vectors = self.encoder(texts)
+        self.assertEqual(np.float32, vectors.dtype)
+        np.testing.assert_array_equal(vectorise_float32(texts), vectors)
+
+    def test_empty(self):
+        self.assertEqual(0, len(self.encoder([])))
+
+    def test_match_instruments(self):
+        instruments = [Instrument(questions=[Question(question_text="I feel sad"),
+                                             Question(question_text="I feel nervous")]),
+                       Instrument(questions=[Question(question_text="I am anxious"),
+                                             Question(question_text="I sleep badly")])]
+        match_result = match_instruments_with_function(instruments, None, self.encoder)
+        expected_match_result = match_instruments_with_function(instruments, None, vectorise_float32)
+        np.testing.assert_allclose(expected_match_result.similarity_with_polarity,
+                                   match_result.similarity_with_polarity)
+
+    def test_catalogue_build(self):
+        questions = ["I feel sad", "I feel nervous", "I sleep badly"]
+        catalogue_index = CatalogueIndex.from_questions(questions, [{"instrument_name": "A", "metadata": {}}],
+                                                        [[0, 1, 2]], self.encoder)
+        np.testing.assert_allclose(CatalogueIndex.from_questions(questions, [{"instrument_name": "A", "metadata": {}}],
+                                                                 [[0, 1, 2]], vectorise_float32).embeddings,
+                                   catalogue_index.embeddings)
+
+    def test_threads_per_worker(self):
+        with ProcessPoolEncoder(get_thread_count, num_workers=2, threads_per_worker=3, shard_size=1) as encoder:
+            thread_counts = encoder([f"text {i}" for i in range(10)])
+        self.assertTrue(np.all(thread_counts[:, 0] == 3))
+
+    def test_worker_error_is_raised(self):
+        with ProcessPoolEncoder(fail, num_workers=1) as encoder:
+            with self.assertRaises(ValueError):
+                encoder(["text"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.catalogue_index import CatalogueIndex
+from harmony.matching.embedding_cache import LruEmbeddingCache, SqliteEmbeddingCache
+from harmony.matching.quantisation import QuantisedVectors, quantise_vectors, dequantise_vectors
+
+
+def make_catalogue_index(embeddings, quantisation):
+    num_questions = len(embeddings)
+    return CatalogueIndex(
+        all_questions=[f"question {i}" for i in range(num_questions)],
+        all_instruments=[{"instrument_name": f"instrument {i}", "metadata": {}} for i in range(num_questions // 10)],
+        instrument_idx_to_question_idx=[list(range(i * 10, i * 10 + 10)) for i in range(num_questions // 10)],
+        embeddings=embeddings,
+        quantisation=quantisation,
+    )
+
+
+class TestQuantisation(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(1)
+        centres = random_state.normal(size=(20, 32))
+        self.embeddings = (centres[random_state.randint(0, 20, size=2000)]
+                           + 0.5 * random_state.normal(size=(2000, 32))).astype(np.float32)
+        self.queries = self.embeddings[:50] + 0.3 * random_state.normal(size=(50, 32))
+
+    def test_int8_round_trip(self):
+        values, scales = quantise_vectors(self.embeddings, "int8")
+        self.assertEqual(np.int8, values.dtype)
+        self.assertEqual((2000,), scales.shape)
+        max_abs = np.max(np.abs(self.embeddings), axis=1, keepdims=True)
+        self.assertTrue(np.all(np.abs(dequantise_vectors(values, scales) - self.embeddings) <= max_abs / 254 + 1e-6))
+
+    def test_zero_vector(self):
+        values, scales = quantise_vectors(np.zeros((1, 4)), "int8")
+        np.testing.assert_array_equal(np.zeros((1, 4)), dequantise_vectors(values, scales))
+
+    def test_tiled_dot_matches_dequantised_dot(self):
+        for quantisation in ["float16", "int8"]:
+            quantised = QuantisedVectors.quantise(self.embeddings, quantisation)
+            np.testing.assert_allclose(self.queries.astype(np.float32) @ quantised.dequantise().T,
+                                       quantised.dot(self.queries, tile_size=300), rtol=1e-4, atol=1e-4)
+            np.testing.assert_array_equal(quantised.dequantise()[[3, 1, 4]], quantised[[3, 1, 4]])
+
+    def test_catalogue_search_recall(self):
+        exact_index = make_catalogue_index(self.embeddings, "float32")
+        exact_idxs, _ = exact_index.search(self.queries, 10)
+        for quantisation, expected_ratio in [("float16", 2), ("int8", 4)]:
+            catalogue_index = make_catalogue_index(self.embeddings, quantisation)
+            self.assertLessEqual(catalogue_index.embeddings.nbytes * expected_ratio,
+                                 exact_index.embeddings.nbytes * 1.2)
+            idxs, similarities = catalogue_index.search(self.queries, 10)
+            recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(exact_idxs, idxs)])
+            self.assertGreaterEqual(recall, 0.95)
+            np.testing.assert_allclose(exact_index.cosine_similarities(self.queries),
+                                       catalogue_index.cosine_similarities(self.queries), atol=0.02)
+
+    def test_save_and_load_quantised_catalogue(self):
+        catalogue_index = make_catalogue_index(self.embeddings, "int8")
+        catalogue_index.build_ann_index()
+        with tempfile.TemporaryDirectory() as folder:
+            catalogue_index.save(folder)
+            loaded = CatalogueIndex.load(folder)
+            self.assertIsInstance(loaded.embeddings, QuantisedVectors)
+            self.assertEqual("int8", loaded.embeddings.quantisation)
+            self.assertIsInstance(loaded.embeddings.values, np.memmap)
+            np.testing.assert_array_equal(catalogue_index.cosine_similarities(self.queries),
+                                          loaded.cosine_similarities(self.queries))
+            self.assertEqual([list(a) for a in catalogue_index.search(self.queries, 5, n_probe=4)[0]],
+                             [list(a) for a in loaded.search(self.queries, 5, n_probe=4)[0]])
+
+    def test_quantised_caches(self):
+        vector = self.embeddings[0]
+        lru_cache = LruEmbeddingCache("model", quantisation="int8")
+        lru_cache["text"] = vector
+        self.assertEqual(32 + 4, lru_cache.num_bytes)
+        np.testing.assert_allclose(vector, lru_cache.get_many(["text"])[0], atol=np.max(np.abs(vector)) / 200)
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.db")
+            float16_cache = SqliteEmbeddingCache("model", path, quantisation="float16")
+            float16_cache["text"] = vector
+            float16_cache.close()
+            # A float32 cache on the same file still reads the float16 rows
+            float32_cache = SqliteEmbeddingCache("model", path)
+            self.assertEqual(np.float32, float32_cache.get_many(["text"])[0].dtype)
+            np.testing.assert_allclose(vector, float32_cache.get_many(["text"])[0], rtol=1e-3, atol=1e-3)
+            float32_cache.close()
+
+    def test_sqlite_cache_created_before_quantisation(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.db")
+            connection = sqlite3.connect(path)
+            connection.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, model_name TEXT NOT NULL, "
+                               "vector BLOB NOT NULL)")
+            connection.commit()
+            connection.close()
+            cache = SqliteEmbeddingCache("model", path, quantisation="int8")
+            cache["text"] = [1., 2., 3.]
+            np.testing.assert_allclose([1., 2., 3.], cache["text"], atol=0.02)
+            cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
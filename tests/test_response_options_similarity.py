@@ -0,0 +1,115 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.embedding_cache import LruEmbeddingCache
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.response_options_similarity import ResponseOptionsSimilarity, get_response_options_similarity, \
+    normalise_response_options
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import CountingVectoriser
+
+phq_options = ["Not at all", "Several days", "More than half the days", "Nearly every day"]
+yes_no_options = ["Yes", "No"]
+
+
+def make_questions():
+    questions = [Question(question_text=f"Question {i}", options=list(phq_options)) for i in range(8)]
+    questions[2].options = ["not at all ", "Several  days", "More than half the days", "NEARLY EVERY DAY"]
+    questions[4].options = list(yes_no_options)
+    questions[5].options = []
+    questions[7].options = list(yes_no_options)
+    return questions
+
+
+class TestResponseOptionsSimilarity(unittest.TestCase):
+
+    def test_normalise(self):
+        self.assertEqual("not at all; several days",
+                         normalise_response_options(["  Not at all ", "Several\tdays", ""]))
+        self.assertEqual(normalise_response_options(phq_options), normalise_response_options(make_questions()[2].options))
+
+    def test_encodes_unique_options_once(self):
+        vectoriser = CountingVectoriser()
+        sim = get_response_options_similarity(make_questions(), vectoriser)
+        self.assertEqual(2, len(vectoriser.texts))
+        self.assertEqual((7, 7), sim.shape)
+        self.assertEqual((2, 2), sim.unique_similarity.shape)
+        self.assertEqual([0, 0, 0, 0, 1, 0, 1], list(sim.option_idxs))
+
+    def test_lazy_view_matches_dense(self):
+        sim = get_response_options_similarity(make_questions(), CountingVectoriser())
+        dense = sim.to_dense()
+        self.assertTrue(np.allclose(np.asarray(sim), dense))
+        self.assertTrue(np.allclose(np.diag(dense), 1))
+        self.assertTrue(np.allclose(dense, dense.T))
+        self.assertEqual(dense[1, 4], sim[1, 4])
+        self.assertTrue(np.array_equal(dense[3], sim[3]))
+        self.assertTrue(np.array_equal(dense[2:5, 1:6], sim[2:5, 1:6]))
+        self.assertTrue(np.array_equal(dense[:, 4], sim[:, 4]))
+
+    def test_no_options(self):
+        sim = get_response_options_similarity([Question(question_text="A question")], CountingVectoriser())
+        self.assertEqual(0, len(sim))
+        self.assertEqual(0, sim.size)
+
+    def test_match_instruments(self):
+        instrument = Instrument(questions=make_questions())
+        dense = match_instruments_with_function([instrument], None, CountingVectoriser(), is_negate=False)
+        compact = match_instruments_with_function([instrument], None, CountingVectoriser(), is_negate=False,
+                                                  compact_response_options=True)
+        self.assertIsInstance(dense.response_options_similarity, np.ndarray)
+        self.assertIsInstance(compact.response_options_similarity, ResponseOptionsSimilarity)
+        self.assertTrue(np.allclose(dense.response_options_similarity, compact.response_options_similarity.to_dense()))
+
+    def test_match_instruments_caches_options(self):
+        instrument = Instrument(questions=make_questions())
+        first = match_instruments_with_function([instrument], None, CountingVectoriser(), is_negate=False)
+        options = [normalise_response_options(phq_options), normalise_response_options(yes_no_options)]
+        for option in options:
+            self.assertIn(option, first.new_vectors_dict)
+
+        vectoriser = CountingVectoriser()
+        second = match_instruments_with_function([instrument], None, vectoriser, is_negate=False,
+                                                 texts_cached_vectors=first.new_vectors_dict)
+        self.assertEqual([], vectoriser.texts)
+        self.assertTrue(np.allclose(first.response_options_similarity, second.response_options_similarity))
+
+        cache = LruEmbeddingCache("model")
+        match_instruments_with_function([instrument], None, CountingVectoriser(), is_negate=False,
+                                        texts_cached_vectors=cache)
+        self.assertEqual(2, sum(option in cache for option in options))
+
+
+if __name__ == '__main__':
+    unittest.main()
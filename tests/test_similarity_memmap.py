@@ -0,0 +1,146 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import gc
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.append("../src")
+
+from harmony.matching.deterministic_clustering import find_clusters_deterministic
+from harmony.matching.generate_crosswalk_table import generate_crosswalk_table
+from harmony.matching.instrument_to_instrument_similarity import get_instrument_similarity
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.polarity_similarity import get_similarity_with_polarity
+from harmony.matching.similarity_matrix import ValidatedSimilarityMatrix, create_similarity_memmap, \
+    iter_row_blocks, validate_similarity_matrix
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+texts = ["I feel nervous", "I feel anxious", "I worry a lot", "I sleep badly", "I feel happy",
+         "I am often tired", "I have trouble sleeping", "I enjoy my life"]
+
+
+class TestSimilarityMemmap(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.instruments = [
+            Instrument(instrument_name="A", questions=[Question(question_no=str(i), question_text=text)
+                                                       for i, text in enumerate(texts[:3])]),
+            Instrument(instrument_name="B", questions=[Question(question_no=str(i), question_text=text)
+                                                       for i, text in enumerate(texts[3:])])
+        ]
+        vectors = vectorise(texts)
+        self.similarity = get_similarity_with_polarity(vectors, vectors + vectorise(texts[::-1]))
+        path = os.path.join(self.folder, "similarity.npy")
+        get_similarity_with_polarity(vectors, vectors + vectorise(texts[::-1]),
+                                     out=create_similarity_memmap(len(texts), path)).flush()
+        self.similarity_memmap = np.load(path, mmap_mode="r")
+
+    def test_iter_row_blocks(self):
+        blocks = list(iter_row_blocks(self.similarity_memmap, block_size=3))
+        self.assertEqual([(0, 3), (3, 6), (6, 8)], [(start, end) for start, end, _ in blocks])
+        np.testing.assert_array_equal(self.similarity, np.concatenate([block for _, _, block in blocks]))
+
+    def test_validate_similarity_matrix(self):
+        validate_similarity_matrix(self.similarity_memmap, block_size=3)
+        asymmetric = np.array(self.similarity)
+        asymmetric[7, 0] = 0.123
+        with self.assertRaises(AssertionError):
+            validate_similarity_matrix(asymmetric, block_size=3)
+        for row, column, value in [(7, 1, 1.5), (1, 7, -1.5), (6, 6, 0.5)]:
+            invalid = np.array(self.similarity)
+            invalid[row, column] = value
+            invalid[column, row] = value
+            with self.assertRaises(AssertionError):
+                validate_similarity_matrix(invalid, block_size=3)
+
+    def test_validated_similarity_matrix_is_not_checked_again(self):
+        questions = self.instruments[0].questions + self.instruments[1].questions
+        asymmetric = np.array(self.similarity)
+        asymmetric[7, 0] = 0.123
+        with self.assertRaises(AssertionError):
+            find_clusters_deterministic(questions, asymmetric)
+        with self.assertRaises(AssertionError):
+            generate_crosswalk_table(self.instruments, asymmetric)
+        self.assertEqual(len(questions), len(sum([cluster.item_ids for cluster in find_clusters_deterministic(
+            questions, ValidatedSimilarityMatrix(asymmetric))], [])))
+        self.assertEqual(len(generate_crosswalk_table(self.instruments, asymmetric, validate=False)),
+                         len(generate_crosswalk_table(self.instruments, ValidatedSimilarityMatrix(asymmetric))))
+
+    def test_temporary_memmap_is_deleted(self):
+        memmap = create_similarity_memmap(4)
+        path = memmap.filename
+        block = memmap[1:3]
+        del memmap
+        gc.collect()
+        # A view of the memmap keeps the file
+        self.assertTrue(os.path.exists(path))
+        del block
+        gc.collect()
+        self.assertFalse(os.path.exists(path))
+
+    def test_iter_row_blocks_keeps_float32(self):
+        self.assertTrue(all(block.dtype == np.float32 for _, _, block in iter_row_blocks(self.similarity_memmap)))
+
+    def test_crosswalk_from_memmap(self):
+        for is_enforce_one_to_one in [False, True]:
+            expected = generate_crosswalk_table(self.instruments, self.similarity,
+                                                is_enforce_one_to_one=is_enforce_one_to_one)
+            actual = generate_crosswalk_table(self.instruments, self.similarity_memmap,
+                                              is_enforce_one_to_one=is_enforce_one_to_one)
+            self.assertEqual(15 if not is_enforce_one_to_one else 3, len(actual))
+            self.assertTrue(expected.equals(actual))
+
+    def test_instrument_similarity_from_memmap(self):
+        self.assertEqual(get_instrument_similarity(self.instruments, self.similarity),
+                         get_instrument_similarity(self.instruments, self.similarity_memmap))
+
+    def test_deterministic_clusters_from_memmap(self):
+        questions = self.instruments[0].questions + self.instruments[1].questions
+        expected = find_clusters_deterministic(questions, self.similarity, threshold=0.1)
+        actual = find_clusters_deterministic(questions, self.similarity_memmap, threshold=0.1)
+        self.assertEqual([cluster.item_ids for cluster in expected], [cluster.item_ids for cluster in actual])
+
+    def test_match_instruments_with_memmap_output(self):
+        path = os.path.join(self.folder, "match_similarity.npy")
+        match_response = match_instruments_with_function(self.instruments, None, vectorise, is_negate=False,
+                                                         clustering_algorithm="deterministic",
+                                                         similarity_memmap_path=path)
+        self.assertIsInstance(match_response.similarity_with_polarity, np.memmap)
+        self.assertEqual((8, 8), match_response.similarity_with_polarity.shape)
+        np.testing.assert_allclose(np.ones(8), np.diag(np.load(path)), atol=1e-5)
+        self.assertEqual(1, len(match_response.instrument_to_instrument_similarities))
+
+
+if __name__ == '__main__':
+    unittest.main()
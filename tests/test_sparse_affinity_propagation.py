@@ -0,0 +1,170 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.cluster import AffinityPropagation
+from sklearn.metrics import adjusted_rand_score
+
+sys.path.append("../src")
+
+from harmony.matching.incremental_matcher import update_match_result_with_function
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.sparse_affinity_propagation_clustering import SparseAffinityPropagation, \
+    cluster_questions_sparse_affinity_propagation, estimate_median_similarity, get_top_k_neighbours
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+
+def get_similarity_matrix(num_items: int, num_centres: int, seed: int = 0) -> np.ndarray:
+    random_state = np.random.RandomState(seed)
+    centres = random_state.normal(size=(num_centres, 16))
+    vectors = centres[random_state.randint(num_centres, size=num_items)] + 0.5 * random_state.normal(
+        size=(num_items, 16))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    similarity = np.abs(vectors @ vectors.T)
+    np.fill_diagonal(similarity, 1)
+    return similarity
+
+
+class TestSparseAffinityPropagation(unittest.TestCase):
+
+    def test_top_k_neighbours(self):
+        similarity = np.array([[1, 0.2, -0.9, 0.5], [0.2, 1, 0.1, 0.3], [-0.9, 0.1, 1, 0.4], [0.5, 0.3, 0.4, 1]])
+        for matrix in [similarity, csr_matrix(similarity)]:
+            rows, cols, sims = get_top_k_neighbours(matrix, 2)
+            self.assertEqual([0, 0, 1, 1, 2, 2, 3, 3], rows.tolist())
+            self.assertEqual([2, 3, 3, 0, 0, 3, 0, 2], cols.tolist())
+            np.testing.assert_allclose([0.9, 0.5, 0.3, 0.2, 0.9, 0.4, 0.5, 0.4], sims)
+
+    def test_same_as_scikit_learn_on_the_full_graph(self):
+        similarity = get_similarity_matrix(300, 15)
+        preference = estimate_median_similarity(similarity)
+        expected = AffinityPropagation(affinity="precomputed", random_state=1, max_iter=200, preference=preference)
+        expected.fit(similarity)
+        actual = SparseAffinityPropagation(preference=preference).fit(*get_top_k_neighbours(similarity, 299), 300)
+        self.assertTrue(actual.converged_)
+        self.assertEqual(expected.n_iter_, actual.n_iter_)
+        self.assertEqual(len(expected.cluster_centers_indices_), len(actual.cluster_centers_indices_))
+        self.assertEqual(1, adjusted_rand_score(expected.labels_, actual.labels_))
+
+    def test_top_k_graph_converges(self):
+        similarity = get_similarity_matrix(1000, 40)
+        affinity_propagation = SparseAffinityPropagation()
+        questions = [Question(question_text=f"Question {i}") for i in range(1000)]
+        clusters = cluster_questions_sparse_affinity_propagation(questions, similarity, top_k=20,
+                                                                 affinity_propagation=affinity_propagation)
+        self.assertTrue(affinity_propagation.converged_)
+        self.assertEqual(affinity_propagation.n_iter_, len(affinity_propagation.num_exemplars_history_))
+        self.assertEqual(len(clusters), affinity_propagation.num_exemplars_history_[-1])
+        self.assertEqual(list(range(1000)), sorted(sum([cluster.item_ids for cluster in clusters], [])))
+        for cluster in clusters:
+            self.assertIn(cluster.centroid_id, cluster.item_ids)
+
+    def test_warm_start(self):
+        similarity = get_similarity_matrix(1100, 40)
+        preference = estimate_median_similarity(similarity)
+        earlier = SparseAffinityPropagation(preference=preference).fit(*get_top_k_neighbours(similarity[:1000, :1000],
+                                                                                             30), 1000)
+        graph = get_top_k_neighbours(similarity, 30)
+        cold = SparseAffinityPropagation(preference=preference).fit(*graph, 1100)
+        warm = SparseAffinityPropagation(preference=preference).fit(*graph, 1100,
+                                                                    initial_exemplars=earlier.cluster_centers_indices_)
+        self.assertTrue(warm.converged_)
+        self.assertLess(warm.n_iter_, cold.n_iter_)
+        self.assertGreater(adjusted_rand_score(cold.labels_, warm.labels_), 0.9)
+
+    def test_sparse_matrix(self):
+        similarity = get_similarity_matrix(200, 10)
+        similarity[similarity < 0.5] = 0
+        questions = [Question(question_text=f"Question {i}") for i in range(200)]
+        clusters = cluster_questions_sparse_affinity_propagation(questions, csr_matrix(similarity))
+        self.assertEqual(list(range(200)), sorted(sum([cluster.item_ids for cluster in clusters], [])))
+
+    def test_single_question(self):
+        clusters = cluster_questions_sparse_affinity_propagation([Question(question_text="I feel sad")], np.ones((1, 1)))
+        self.assertEqual([[0]], [cluster.item_ids for cluster in clusters])
+
+    def test_isolated_rows_in_sparse_matrix(self):
+        similarity = get_similarity_matrix(100, 5)
+        similarity[similarity < 0.5] = 0
+        similarity[[7, 42], :] = 0
+        similarity[:, [7, 42]] = 0
+        similarity[[7, 42], [7, 42]] = 1
+        questions = [Question(question_text=f"Question {i}") for i in range(100)]
+        clusters = cluster_questions_sparse_affinity_propagation(questions, csr_matrix(similarity))
+        self.assertEqual(list(range(100)), sorted(sum([cluster.item_ids for cluster in clusters], [])))
+        self.assertIn([7], [cluster.item_ids for cluster in clusters])
+        self.assertIn([42], [cluster.item_ids for cluster in clusters])
+
+    def test_no_neighbours(self):
+        similarity = get_similarity_matrix(20, 3)
+        questions = [Question(question_text=f"Question {i}") for i in range(20)]
+        clusters = cluster_questions_sparse_affinity_propagation(questions, similarity, top_k=0)
+        self.assertEqual([[i] for i in range(20)], [cluster.item_ids for cluster in clusters])
+
+    def test_match_with_sparse_similarity_output(self):
+        instruments = [Instrument(instrument_id="a", questions=[Question(question_text=text) for text in
+                                                                ["I feel sad", "I feel nervous", "I worry a lot"]])]
+        for kwargs in [dict(similarity_output="threshold", similarity_threshold=0.99),
+                       dict(similarity_output="topk", similarity_top_k=1)]:
+            match_result = match_instruments_with_function(instruments, None, vectorise,
+                                                           clustering_algorithm="sparse_affinity_propagation",
+                                                           **kwargs)
+            self.assertEqual(list(range(3)),
+                             sorted(sum([cluster.item_ids for cluster in match_result.clusters], [])))
+
+        single_instrument = Instrument(instrument_id="b", questions=[Question(question_text="I feel tired")])
+        match_result = match_instruments_with_function([single_instrument], None, vectorise,
+                                                       clustering_algorithm="sparse_affinity_propagation")
+        self.assertEqual([[0]], [cluster.item_ids for cluster in match_result.clusters])
+
+    def test_match_and_update(self):
+        instruments = [
+            Instrument(instrument_id="a", questions=[Question(question_text=text) for text in
+                                                     ["I feel sad", "I feel nervous", "I worry a lot"]]),
+            Instrument(instrument_id="b", questions=[Question(question_text=text) for text in
+                                                     ["I am anxious", "I sleep badly", "I feel down"]])
+        ]
+        match_result = match_instruments_with_function(instruments, None, vectorise,
+                                                       clustering_algorithm="sparse_affinity_propagation")
+        self.assertEqual(list(range(6)), sorted(sum([cluster.item_ids for cluster in match_result.clusters], [])))
+
+        added_instrument = Instrument(instrument_id="c", questions=[Question(question_text="I feel tired")])
+        updated_match_result = update_match_result_with_function(match_result, instruments, vectorise,
+                                                                 added_instruments=[added_instrument],
+                                                                 removed_instrument_ids=["a"],
+                                                                 clustering_algorithm="sparse_affinity_propagation")
+        self.assertEqual(list(range(4)),
+                         sorted(sum([cluster.item_ids for cluster in updated_match_result.clusters], [])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+import numpy as np
+from scipy.sparse import issparse
+
+sys.path.append("../src")
+
+from harmony.matching.deterministic_clustering import find_clusters_deterministic
+from harmony.matching.generate_crosswalk_table import generate_crosswalk_table
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.polarity_similarity import get_similarity_with_polarity, get_sparse_similarity_with_polarity
+from harmony.matching.similarity_matrix import to_match_response, to_sparse_similarity_matrix, \
+    validate_similarity_matrix
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import vectorise
+
+
+class TestSparseSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(1)
+        self.vectors_pos = random_state.normal(size=(50, 8))
+        self.vectors_neg = self.vectors_pos * 0.3 - random_state.normal(size=(50, 8))
+        self.dense = get_similarity_with_polarity(self.vectors_pos, self.vectors_neg)
+
+    def test_top_k(self):
+        sparse = get_sparse_similarity_with_polarity(self.vectors_pos, self.vectors_neg, top_k=5, block_size=7)
+        validate_similarity_matrix(sparse)
+        for row_idx in range(50):
+            expected_neighbours = set(np.argsort(-np.abs(self.dense[row_idx]), kind="stable")[:5].tolist())
+            stored_neighbours = set(sparse[row_idx].indices.tolist())
+            # Each question keeps its own top 5, plus any question that picked it
+            self.assertTrue(expected_neighbours.issubset(stored_neighbours))
+            self.assertIn(row_idx, stored_neighbours)
+        np.testing.assert_allclose(self.dense[sparse.nonzero()], sparse.data, atol=1e-5)
+        self.assertLess(sparse.nnz, 10 * 50)
+
+    def test_threshold(self):
+        sparse = get_sparse_similarity_with_polarity(self.vectors_pos, self.vectors_neg, threshold=0.5, block_size=7)
+        validate_similarity_matrix(sparse)
+        np.testing.assert_array_equal(np.abs(self.dense) >= 0.5, sparse.toarray() != 0)
+
+    def test_consumers_accept_sparse(self):
+        sparse = get_sparse_similarity_with_polarity(self.vectors_pos[:8], self.vectors_neg[:8], threshold=0.3)
+        questions = [Question(question_no=str(i), question_text=f"question {i}") for i in range(8)]
+        instruments = [Instrument(instrument_name="A", questions=questions[:4]),
+                       Instrument(instrument_name="B", questions=questions[4:])]
+        crosswalk = generate_crosswalk_table(instruments, sparse)
+        dense_crosswalk = generate_crosswalk_table(instruments, sparse.toarray(), threshold=0.3)
+        self.assertTrue(crosswalk.equals(dense_crosswalk))
+        clusters = find_clusters_deterministic(questions, sparse, threshold=0.3)
+        dense_clusters = find_clusters_deterministic(questions, sparse.toarray(), threshold=0.3)
+        self.assertEqual([cluster.item_ids for cluster in dense_clusters], [cluster.item_ids for cluster in clusters])
+
+    def test_serialisable(self):
+        sparse = get_sparse_similarity_with_polarity(self.vectors_pos, self.vectors_neg, top_k=3)
+        serialised = to_sparse_similarity_matrix(sparse)
+        self.assertEqual([50, 50], serialised.shape)
+        self.assertEqual(sparse.nnz, len(serialised.data))
+        self.assertEqual(51, len(serialised.indptr))
+
+    def test_match_instruments_with_top_k_output(self):
+        instruments = [Instrument(instrument_name="A", questions=[Question(question_text=text) for text in
+                                                                  ["I feel nervous", "I feel anxious", "I am tired"]]),
+                       Instrument(instrument_name="B", questions=[Question(question_text=text) for text in
+                                                                  ["I sleep badly", "I feel happy"]])]
+        match_response = match_instruments_with_function(instruments, None, vectorise, is_negate=False,
+                                                         clustering_algorithm="deterministic",
+                                                         similarity_output="topk", similarity_top_k=2)
+        self.assertTrue(issparse(match_response.similarity_with_polarity))
+        self.assertEqual((5, 5), match_response.similarity_with_polarity.shape)
+        self.assertEqual(1, len(match_response.instrument_to_instrument_similarities))
+
+        api_response = to_match_response(match_response, instruments)
+        self.assertEqual([], api_response.matches)
+        self.assertEqual(match_response.similarity_with_polarity.nnz, len(api_response.sparse_matches.data))
+        self.assertEqual([5, 5], api_response.sparse_matches.shape)
+        api_response.model_dump_json()
+
+        dense_match_response = match_instruments_with_function(instruments, None, vectorise, is_negate=False)
+        dense_api_response = to_match_response(dense_match_response, instruments)
+        self.assertIsNone(dense_api_response.sparse_matches)
+        np.testing.assert_allclose(dense_match_response.similarity_with_polarity, dense_api_response.matches)
+
+    def test_invalid_similarity_output(self):
+        with self.assertRaises(ValueError):
+            match_instruments_with_function([Instrument(questions=[Question(question_text="I feel nervous")])],
+                                            None, vectorise, similarity_output="everything")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+'''
+MIT License
+
+Copyright (c) 2023 Ulster University (https://www.ulster.ac.uk).
+Project: Harmony (https://harmonydata.ac.uk)
+Maintainer: Thomas Wood (https://fastdatascience.com)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+
+'''
+
+import sys
+import unittest
+
+sys.path.append("../src")
+
+from harmony.matching.matcher import match_instruments_with_function
+from harmony.matching.topic_tagger import TopicTagger, load_lang_to_stopwords
+from harmony.schemas.requests.text import Instrument, Question
+from tests.fake_vectorisers import CountingVectoriser, get_fake_vector
+
+# Words that should be tagged with a topic get a vector close to that topic's vector
+word_to_topic = {"sleep": "sleep", "asleep": "sleep", "tired": "sleep", "nervous": "anxiety", "worry": "anxiety",
+                 "eat": "appetite"}
+
+
+def get_topic_aware_vector(text, size):
+    vector = get_fake_vector(text, size)
+    topic = word_to_topic.get(text.lower().strip(".,?"))
+    if topic is not None:
+        vector = get_fake_vector(topic, size) + 0.1 * vector
+    return vector
+
+
+def make_vectoriser():
+    return CountingVectoriser(size=32, get_vector=get_topic_aware_vector)
+
+
+questions = [Question(question_text="I find it hard to fall asleep"), Question(question_text="I feel nervous"),
+             Question(question_text="I am tired and I worry"), Question(question_text="The weather is nice"),
+             Question(question_text="I sleep badly and I am tired")]
+
+
+class TestTopicTagger(unittest.TestCase):
+
+    def test_tags(self):
+        topic_tagger = TopicTagger(["anxiety", "sleep", "appetite"], make_vectoriser())
+        self.assertEqual([["sleep"], ["anxiety"], ["anxiety", "sleep"], [], ["sleep"]], topic_tagger.tag(questions))
+
+    def test_encodes_topics_and_unique_words_in_one_call(self):
+        vectoriser = make_vectoriser()
+        topic_tagger = TopicTagger(["anxiety", "sleep", "appetite"], vectoriser)
+        topic_tagger.tag(questions)
+        self.assertEqual(1, len(vectoriser.calls))
+        self.assertEqual(["anxiety", "sleep", "appetite"], vectoriser.calls[0][:3])
+        words = vectoriser.calls[0][3:]
+        self.assertEqual(len(set(words)), len(words))
+
+        # The topics are not encoded again
+        topic_tagger.tag(questions[:1])
+        self.assertEqual(2, len(vectoriser.calls))
+        self.assertNotIn("anxiety", vectoriser.calls[1])
+
+    def test_stopwords_loaded_once(self):
+        self.assertIs(load_lang_to_stopwords(), load_lang_to_stopwords())
+        self.assertIn("en", load_lang_to_stopwords())
+
+    def test_no_topics_for_empty_questions(self):
+        topic_tagger = TopicTagger(["sleep"], make_vectoriser())
+        self.assertEqual([[], []], topic_tagger.tag([Question.model_construct(question_text=""),
+                                                     Question.model_construct(question_text="  ")]))
+
+    def test_match_instruments_tags_topics(self):
+        instrument = Instrument(questions=[Question(question_text=q.question_text) for q in questions])
+        match_response = match_instruments_with_function([instrument], None, make_vectoriser(), is_negate=False,
+                                                         topics=["anxiety", "sleep", "appetite"])
+        self.assertEqual([["sleep"], ["anxiety"], ["anxiety", "sleep"], [], ["sleep"]],
+                         [question.topics for question in match_response.questions])
+
+
+if __name__ == '__main__':
+    unittest.main()